@@ -2,7 +2,9 @@ import streamlit as st
 import httpx
 import json
 import os
-from typing import Dict, Any, List
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List
 import uuid
 
 # Set page title and configuration
@@ -22,22 +24,87 @@ if "session_id" not in st.session_state:
 # App configuration
 MCP_SERVER_URL = os.environ.get("MCP_SERVER_URL", "http://localhost:8000")
 API_ENDPOINT = f"{MCP_SERVER_URL}/api/chat"
+STREAM_ENDPOINT = f"{MCP_SERVER_URL}/api/chat/stream"
+SESSION_ENDPOINT = f"{MCP_SERVER_URL}/api/session"
+PROBE_INTERVAL = 0.5  # Minimum seconds between reachability probes
+
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    """Get a shared HTTP client that keeps connections alive across reruns."""
+    return httpx.Client(timeout=30.0)
+
+@st.cache_data(ttl=30)
+def test_server(url: str) -> int:
+    """Check whether the MCP server is reachable, caching the status code briefly."""
+    return get_http_client().get(url).status_code
+
+def ensure_session(settings: Dict[str, Any]) -> None:
+    """Register NiFi connection settings with the server when they change.
+    
+    Credentials are sent once per session instead of with every chat message.
+    """
+    session = {"session_id": st.session_state.session_id, **settings}
+    if st.session_state.get("_registered_session") == session:
+        return
+    
+    response = get_http_client().post(SESSION_ENDPOINT, json=session)
+    response.raise_for_status()
+    st.session_state._registered_session = session
+
+@contextmanager
+def open_chat_stream(payload: Dict[str, Any], settings: Dict[str, Any]) -> Iterator[httpx.Response]:
+    """Open the chat stream, registering the session again if the server no longer knows it.
+    
+    The server answers 404 for a session it lost, e.g. after a restart or once
+    it evicted the session, rather than silently using its default NiFi client.
+    """
+    ensure_session(settings)
+    with get_http_client().stream("POST", STREAM_ENDPOINT, json=payload) as response:
+        if response.status_code != 404:
+            yield response
+            return
+    
+    st.session_state.pop("_registered_session", None)
+    ensure_session(settings)
+    with get_http_client().stream("POST", STREAM_ENDPOINT, json=payload) as response:
+        yield response
+
+def stream_response(response: httpx.Response, result: Dict[str, Any]):
+    """Yield response text deltas from an NDJSON stream, collecting the final result."""
+    for line in response.iter_lines():
+        if not line:
+            continue
+        chunk = json.loads(line)
+        if "delta" in chunk:
+            yield chunk["delta"]
+        elif "result" in chunk:
+            result.update(chunk["result"])
+
+def probe_server(url: str) -> int:
+    """Probe the MCP server, reusing the last outcome if probed again too soon.
+    
+    Unlike test_server's cache, this also debounces failed probes, which
+    raise and are therefore never cached by st.cache_data.
+    """
+    now = time.monotonic()
+    last_probe = st.session_state.get("_last_probe")
+    if last_probe and last_probe["url"] == url and now - last_probe["ts"] < PROBE_INTERVAL:
+        if last_probe["error"]:
+            raise ConnectionError(last_probe["error"])
+        return last_probe["status_code"]
+    
+    probe = {"url": url, "ts": now, "status_code": None, "error": None}
+    st.session_state._last_probe = probe
+    try:
+        probe["status_code"] = test_server(url)
+    except Exception as e:
+        probe["error"] = str(e)
+        raise
+    return probe["status_code"]
 
 # Custom styling
 st.markdown("""
 <style>
-.user-message {
-    background-color: #e6f7ff;
-    padding: 10px;
-    border-radius: 10px;
-    margin-bottom: 10px;
-}
-.assistant-message {
-    background-color: #f0f0f0;
-    padding: 10px;
-    border-radius: 10px;
-    margin-bottom: 10px;
-}
 .small-font {
     font-size: 12px;
     color: #888;
@@ -79,11 +146,11 @@ with st.sidebar:
     if st.button("Test Connection"):
         with st.spinner("Testing connection..."):
             try:
-                response = httpx.get(f"{server_url}")
-                if response.status_code == 200:
+                status_code = probe_server(server_url)
+                if status_code == 200:
                     st.success("Successfully connected to MCP server!")
                 else:
-                    st.error(f"Failed to connect to MCP server: {response.status_code}")
+                    st.error(f"Failed to connect to MCP server: {status_code}")
             except Exception as e:
                 st.error(f"Error connecting to MCP server: {str(e)}")
     
@@ -94,13 +161,15 @@ with st.sidebar:
         st.success("Chat history cleared!")
 
 # Display chat history
-for message in st.session_state.messages:
-    if message["role"] == "user":
-        st.markdown(f"<div class='user-message'><strong>You:</strong> {message['content']}</div>", unsafe_allow_html=True)
-    else:
-        st.markdown(f"<div class='assistant-message'><strong>Assistant:</strong> {message['content']}</div>", unsafe_allow_html=True)
-        if "action_taken" in message:
-            st.markdown(f"<div class='small-font'>Action: {message['action_taken']}</div>", unsafe_allow_html=True)
+def render_history():
+    """Render the chat history; Streamlit redraws it on every rerun of the script."""
+    for message in st.session_state.messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+            if "action_taken" in message:
+                st.caption(f"Action: {message['action_taken']}")
+
+render_history()
 
 # Input for new messages
 user_input = st.chat_input("Ask about your NiFi instance...")
@@ -110,61 +179,65 @@ if user_input:
     st.session_state.messages.append({"role": "user", "content": user_input})
     
     # Display user message (this will be updated when the page refreshes)
-    st.markdown(f"<div class='user-message'><strong>You:</strong> {user_input}</div>", unsafe_allow_html=True)
+    with st.chat_message("user"):
+        st.markdown(user_input)
     
     # Send request to MCP server
     with st.spinner("Thinking..."):
         try:
-            payload = {
-                "query": user_input,
-                "session_id": st.session_state.session_id,
-                "user_id": "streamlit_user",
-                "context": {
-                    "nifi_url": nifi_url,
-                    "auth_type": auth_type.lower() if auth_type != "None" else "none"
-                }
+            settings = {
+                "nifi_url": nifi_url,
+                "auth_type": auth_type.lower() if auth_type != "None" else "none",
+                "ssl_verify": verify_ssl
             }
             
             if auth_type == "Basic":
-                payload["context"]["username"] = username
-                payload["context"]["password"] = password
+                settings["username"] = username
+                settings["password"] = password
             elif auth_type == "Token":
-                payload["context"]["token"] = token
+                settings["token"] = token
             
-            response = httpx.post(
-                API_ENDPOINT,
-                json=payload,
-                timeout=30.0
-            )
+            payload = {
+                "query": user_input,
+                "session_id": st.session_state.session_id,
+                "user_id": "streamlit_user"
+            }
             
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Add assistant message to chat history
-                assistant_message = {
-                    "role": "assistant",
-                    "content": result.get("response", "I encountered an error processing your request.")
-                }
-                
-                # Include action information if available
-                if result.get("action_taken"):
-                    assistant_message["action_taken"] = result.get("action_taken")
-                
-                st.session_state.messages.append(assistant_message)
-                
-                # Display assistant message
-                st.markdown(f"<div class='assistant-message'><strong>Assistant:</strong> {assistant_message['content']}</div>", unsafe_allow_html=True)
-                
-                if debug_mode and "context_updates" in result:
-                    with st.expander("Debug Information"):
-                        st.json(result.get("context_updates", {}))
-            else:
-                error_msg = f"Error from server: {response.status_code}"
-                st.error(error_msg)
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": f"I'm sorry, I encountered an error: {error_msg}"
-                })
+            with open_chat_stream(payload, settings) as response:
+                if response.status_code == 200:
+                    result = {}
+                    
+                    # Render the assistant message as it streams in
+                    with st.chat_message("assistant"):
+                        streamed = st.write_stream(stream_response(response, result))
+                        
+                        # Add assistant message to chat history
+                        assistant_message = {
+                            "role": "assistant",
+                            "content": result.get("response", streamed) or "I encountered an error processing your request."
+                        }
+                        
+                        # Include action information if available
+                        if result.get("action_taken"):
+                            assistant_message["action_taken"] = result.get("action_taken")
+                            st.caption(f"Action: {assistant_message['action_taken']}")
+                    
+                    st.session_state.messages.append(assistant_message)
+                    
+                    if debug_mode and "context_updates" in result:
+                        with st.expander("Debug Information"):
+                            latency_ms = result["context_updates"].get("latency_ms")
+                            if latency_ms:
+                                st.caption("Latency per stage (ms)")
+                                st.bar_chart(latency_ms)
+                            st.json(result.get("context_updates", {}))
+                else:
+                    error_msg = f"Error from server: {response.status_code}"
+                    st.error(error_msg)
+                    st.session_state.messages.append({
+                        "role": "assistant", 
+                        "content": f"I'm sorry, I encountered an error: {error_msg}"
+                    })
         except Exception as e:
             error_msg = f"Failed to communicate with the MCP server: {str(e)}"
             st.error(error_msg)
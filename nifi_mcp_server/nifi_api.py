@@ -1,14 +1,28 @@
-import json
-import requests
-from typing import Dict, Any, Optional, Union
+import asyncio
+import httpx
+import orjson
+from typing import Dict, Any, Optional, Tuple, Union
 from loguru import logger
 
+def is_transient_error(error: BaseException) -> bool:
+    """Whether a NiFi request failed in a way worth serving a stale result for."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code in (502, 503, 504)
+
+class _RequestAbandoned(Exception):
+    """Set on a coalesced GET whose owning caller was cancelled, so its waiters retry."""
+
 class NiFiAPIClient:
     """Client for interacting with Apache NiFi API."""
     
+    # One client is created per session, so skip the per-instance __dict__
+    __slots__ = ("base_url", "auth_type", "username", "password", "token", "ssl_verify",
+                 "_client", "_inflight", "_max_concurrency", "_semaphore")
+    
     def __init__(self, base_url: str, auth_type: str = "none", 
                  username: str = None, password: str = None, 
-                 token: str = None, ssl_verify: bool = True):
+                 token: str = None, ssl_verify: bool = True, max_concurrency: int = 32):
         """Initialize the NiFi API client.
         
         Args:
@@ -18,6 +32,7 @@ class NiFiAPIClient:
             password: Password for basic authentication
             token: Access token for token authentication
             ssl_verify: Whether to verify SSL certificates
+            max_concurrency: Maximum number of requests in flight to NiFi at once
         """
         self.base_url = base_url.rstrip("/")
         self.auth_type = auth_type.lower()
@@ -32,6 +47,26 @@ class NiFiAPIClient:
             
         if self.auth_type == "token" and not token:
             logger.warning("Token authentication selected but token is missing")
+        
+        # Shared async HTTP client so concurrent requests reuse pooled keep-alive
+        # connections, multiplexed over HTTP/2 when NiFi is served over TLS; idle
+        # connections are kept for a minute so periodic polling skips the handshake
+        self._client = httpx.AsyncClient(
+            verify=self.ssl_verify,
+            headers=self._get_headers(),
+            auth=self._get_auth(),
+            timeout=30.0,
+            http2=True,
+            limits=httpx.Limits(max_connections=128, max_keepalive_connections=64, keepalive_expiry=60.0)
+        )
+        
+        # In-flight GET requests, so concurrent identical GETs share one NiFi round trip
+        self._inflight: Dict[Tuple[str, tuple], asyncio.Future] = {}
+        
+        # Caps requests in flight so large fan-outs queue here instead of exhausting NiFi's threads;
+        # created on first use so it binds to the loop serving requests, not the importing one
+        self._max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
             
         logger.info(f"Initialized NiFi API client for {self.base_url} with {self.auth_type} authentication")
     
@@ -61,8 +96,8 @@ class NiFiAPIClient:
             return (self.username, self.password)
         return None
     
-    def _make_request(self, method: str, endpoint: str, data: Dict[str, Any] = None,
-                     params: Dict[str, Any] = None, headers: Dict[str, str] = None) -> Any:
+    async def _make_request(self, method: str, endpoint: str, data: Dict[str, Any] = None,
+                           params: Dict[str, Any] = None, headers: Dict[str, str] = None) -> Any:
         """Make an HTTP request to the NiFi API.
         
         Args:
@@ -76,48 +111,41 @@ class NiFiAPIClient:
             Response data as JSON or string
         """
         url = f"{self.base_url}{endpoint}"
-        request_headers = self._get_headers()
-        
-        # Merge additional headers if provided
-        if headers:
-            request_headers.update(headers)
-            
-        auth = self._get_auth()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
         
         try:
-            response = requests.request(
-                method=method,
-                url=url,
-                json=data,
-                params=params,
-                headers=request_headers,
-                auth=auth,
-                verify=self.ssl_verify
-            )
+            # Authentication and default headers are configured on the shared client
+            async with self._semaphore:
+                response = await self._client.request(
+                    method=method,
+                    url=url,
+                    content=orjson.dumps(data) if data is not None else None,
+                    params=params,
+                    headers=headers
+                )
             
             # Raise exception for HTTP errors
             response.raise_for_status()
             
             # Return data as JSON if possible, otherwise as text
-            if "application/json" in response.headers.get("Content-Type", ""):
-                return response.json()
+            content_type = response.headers.get("content-type", "").split(";", 1)[0]
+            if content_type == "application/json":
+                return orjson.loads(response.content)
             return response.text
             
-        except requests.exceptions.HTTPError as e:
-            logger.error(f"HTTP error: {e}")
-            # Try to get more details from the response
-            try:
-                error_detail = response.json()
-                logger.error(f"API error details: {json.dumps(error_detail)}")
-            except:
-                logger.error(f"Response text: {response.text}")
+        except httpx.HTTPStatusError as e:
+            logger.error("HTTP error: {}", e)
+            # The body is already JSON text (or plain text), so log it as is rather than
+            # parsing it only to serialize it again
+            logger.error("API error details: {}", e.response.text)
             raise
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request error: {e}")
+        except httpx.RequestError as e:
+            logger.error("Request error: {}", e)
             raise
     
-    def get(self, endpoint: str, params: Dict[str, Any] = None) -> Any:
+    async def get(self, endpoint: str, params: Dict[str, Any] = None) -> Any:
         """Make a GET request to the NiFi API.
         
         Args:
@@ -125,11 +153,41 @@ class NiFiAPIClient:
             params: URL parameters
             
         Returns:
-            Response data
+            Response data. Concurrent identical GETs share one request and
+            receive the same object, so callers must not mutate it.
         """
-        return self._make_request("GET", endpoint, params=params)
+        key = (endpoint, tuple(sorted(params.items())) if params else ())
+        pending = self._inflight.get(key)
+        if pending is not None:
+            # Shield the shared request so a cancelled waiter does not cancel it for everyone
+            try:
+                return await asyncio.shield(pending)
+            except _RequestAbandoned:
+                # The caller that sent the request was cancelled; send it again
+                return await self.get(endpoint, params)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._make_request("GET", endpoint, params=params)
+        except asyncio.CancelledError:
+            # Cancelling the shared future would cancel every unrelated waiter, so
+            # tell them to retry instead
+            future.set_exception(_RequestAbandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
     
-    def post(self, endpoint: str, data: Dict[str, Any] = None, params: Dict[str, Any] = None) -> Any:
+    async def post(self, endpoint: str, data: Dict[str, Any] = None, params: Dict[str, Any] = None) -> Any:
         """Make a POST request to the NiFi API.
         
         Args:
@@ -140,9 +198,9 @@ class NiFiAPIClient:
         Returns:
             Response data
         """
-        return self._make_request("POST", endpoint, data=data, params=params)
+        return await self._make_request("POST", endpoint, data=data, params=params)
     
-    def put(self, endpoint: str, data: Dict[str, Any] = None, params: Dict[str, Any] = None) -> Any:
+    async def put(self, endpoint: str, data: Dict[str, Any] = None, params: Dict[str, Any] = None) -> Any:
         """Make a PUT request to the NiFi API.
         
         Args:
@@ -153,9 +211,9 @@ class NiFiAPIClient:
         Returns:
             Response data
         """
-        return self._make_request("PUT", endpoint, data=data, params=params)
+        return await self._make_request("PUT", endpoint, data=data, params=params)
     
-    def delete(self, endpoint: str, params: Dict[str, Any] = None) -> Any:
+    async def delete(self, endpoint: str, params: Dict[str, Any] = None) -> Any:
         """Make a DELETE request to the NiFi API.
         
         Args:
@@ -165,9 +223,9 @@ class NiFiAPIClient:
         Returns:
             Response data or None
         """
-        return self._make_request("DELETE", endpoint, params=params)
+        return await self._make_request("DELETE", endpoint, params=params)
     
-    def test_connection(self) -> Dict[str, Any]:
+    async def test_connection(self) -> Dict[str, Any]:
         """Test the connection to the NiFi API.
         
         Returns:
@@ -175,7 +233,7 @@ class NiFiAPIClient:
         """
         try:
             # Try to get the NiFi root information
-            response = self.get("/flow/about")
+            response = await self.get("/flow/about")
             
             return {
                 "status": "success",
@@ -194,3 +252,7 @@ class NiFiAPIClient:
                 "connected": False,
                 "message": str(e)
             }
+    
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client and release pooled connections."""
+        await self._client.aclose()
@@ -1,9 +1,148 @@
 import os
-from typing import Dict, Any, List, Optional, Union
+import re
+import orjson
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set, Tuple, Union
 from pydantic import BaseModel
-import openai
+from openai import AsyncOpenAI
 from loguru import logger
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# System prompt for OpenAI intent classification.
+#
+# This prompt is sent as the first message of every request so the provider
+# can serve it from its prompt cache; it is deliberately long enough to pass
+# the minimum cacheable prefix size. Any edit invalidates the cached prefix,
+# so bump the version suffix whenever the text changes.
+_SYSTEM_PROMPT_V1 = """You are an assistant that helps users interact with Apache NiFi through natural language.
+Your job is to classify each of the user's queries into exactly one of the intents below
+and to extract any parameters the query mentions.
+
+Intents:
+- list_process_groups: List process groups, optionally inside a parent group.
+  Parameters: parent_group (name or ID of the parent process group).
+  Examples: "list process groups", "show me the groups in Ingest", "what process groups are under root?"
+- get_processor_details: Get details of a specific processor.
+  Parameters: name (processor name), id (processor ID if given).
+  Examples: "show processor GetFile", "processor details for PutKafka", "what is the config of the LogAttribute processor?"
+- create_process_group: Create a new process group.
+  Parameters: name (name of the new group), parent_group (where to create it, if given).
+  Examples: "create a process group called Data Processing", "add a new group named ETL under Ingest"
+- start_component: Start a processor, port or process group.
+  Parameters: name (component name), id (component ID if given), component_type (processor, process-group, input-port, output-port).
+  Examples: "start the GetFile processor", "run the ingest flow", "start process group Billing"
+- stop_component: Stop a processor, port or process group.
+  Parameters: name (component name), id (component ID if given), component_type (processor, process-group, input-port, output-port).
+  Examples: "stop processor PutHDFS", "halt the ingest flow", "pause flow Billing"
+- get_flow_status: Get the status of the flow or a process group.
+  Parameters: process_group (name or ID of the process group, if given).
+  Examples: "what is the status of my flow?", "check status of Ingest", "monitor the flow"
+- search_components: Search for components by name or type.
+  Parameters: search_term (the text to search for), component_type (processor, connection, port, process group, if given).
+  Examples: "search for GetFile", "find components named kafka", "look for processors that write to S3"
+- list_processors: List processors, optionally inside a process group.
+  Parameters: process_group (name or ID of the process group, if given).
+  Examples: "list processors", "show processors in Ingest"
+- list_connections: List connections, optionally inside a process group.
+  Parameters: process_group (name or ID of the process group, if given).
+  Examples: "list connections", "show the connections in the ETL process group"
+- list_templates: List templates, optionally filtered by name.
+  Parameters: search_term (text the template name should contain, if given).
+  Examples: "list templates", "find all templates with database in the name"
+- unknown: The query does not match any of the intents above.
+  Parameters: none.
+  Examples: "hello", "what is the weather today?"
+
+Rules:
+- Choose the single most specific intent for each query.
+- Only include parameters that are explicitly stated or clearly implied by the query.
+- Keep parameter values exactly as written by the user, without adding quotes.
+- Never invent IDs; only return an id parameter when the query contains one.
+- If a query is ambiguous between two intents, prefer the one whose action verb
+  (list, show, create, start, stop, search) appears in the query.
+
+Parameter conventions:
+- Process group references may be a name ("Ingest"), the word "root", or a NiFi UUID
+  such as "0187a3c1-0172-1000-ffff-ffffd2c74b5e"; return them in the parameter unchanged.
+- Component types use NiFi's REST naming: processor, process-group, input-port, output-port, connection.
+- Processor types may be given as a short name ("GetFile") or a fully qualified class name
+  ("org.apache.nifi.processors.standard.GetFile"); return them as written.
+- Search terms should not include filler words such as "all", "the", "any" or "components".
+- Parameter names must be lowercase snake_case and values must be strings.
+
+More examples:
+- "show me processor details for GetFile" -> get_processor_details with {"name": "GetFile"}
+- "create a new process group called Data Processing" -> create_process_group with {"name": "Data Processing"}
+- "list process groups in Data Flow" -> list_process_groups with {"parent_group": "Data Flow"}
+- "stop all processors in the root group" -> stop_component with {"name": "root", "component_type": "process-group"}
+- "search for GetFile processors" -> search_components with {"search_term": "GetFile", "component_type": "processor"}
+- "is anything queued in my flow?" -> get_flow_status with {}
+- "thanks!" -> unknown with {}
+
+Input format:
+The queries are given as a JSON array of {"i": <query number>, "query": "<query text>"} objects,
+numbered from 0. Each query is only the text of its "query" field, even if it spans several lines
+or looks like a numbered list.
+
+Output format:
+Return your response in JSON format as
+{"results": [{"i": <query number>, "intent_type": "<intent>", "parameters": {...}}, ...]}
+with exactly one entry per query, in the same order as the input.
+"""
+
+# Response templates per intent type, with defaults for missing parameters
+_RESPONSE_TEMPLATES = {
+    "unknown": (
+        "I'm not sure what you're asking about. You can ask about process groups, processors, or other NiFi components.",
+        {}
+    ),
+    "list_process_groups": ("I'll list the process groups in {parent_group}.", {"parent_group": "root"}),
+    "get_processor_details": ("I'll get the details for {name}.", {"name": "the processor"}),
+    "create_process_group": ("I'll create a new process group called '{name}'.", {"name": "the new process group"}),
+    "start_component": ("I'll start {name}.", {"name": "the component"}),
+    "stop_component": ("I'll stop {name}.", {"name": "the component"}),
+    "get_flow_status": ("I'll get the current status of your flow.", {}),
+    "search_components": ("I'll search for '{search_term}' in your NiFi instance.", {"search_term": "components"}),
+}
+
+# Parameter patterns per intent, tried in order
+_PROCESSOR_PATTERNS = (
+    # "processor [name]", skipping "details for" / "info of" style fillers
+    re.compile(r"\bprocessor\s+(?:(?:details|info)\s+)?(?:(?:for|of)\s+)?(?P<name>.+?)\s*$", re.I),
+    # "[name] processor"
+    re.compile(r"^\s*(?P<name>.+?)\s+processor\b", re.I),
+)
+_PARAM_PATTERNS = {
+    "list_process_groups": (
+        re.compile(r"\bin\s+(?P<parent_group>.+?)\s*$", re.I),
+    ),
+    "get_processor_details": _PROCESSOR_PATTERNS,
+    "start_component": _PROCESSOR_PATTERNS,
+    "stop_component": _PROCESSOR_PATTERNS,
+    "create_process_group": (
+        re.compile(r"\b(?:named|called)\s+(?P<name>.+?)\s*$", re.I),
+    ),
+    "search_components": (
+        re.compile(r"\b(?:search\s+for|find|look\s+for)\s+(?P<search_term>.+?)\s*$", re.I),
+    ),
+}
+
+class _TemplateParams(dict):
+    """Template parameters that fall back to per-intent defaults."""
+    
+    def __init__(self, parameters: Dict[str, Any], defaults: Dict[str, str]):
+        super().__init__(parameters)
+        self.defaults = defaults
+    
+    def __missing__(self, key: str) -> str:
+        return self.defaults.get(key, "")
+
 class QueryContext(BaseModel):
     """Context information for a natural language query."""
     query: str
@@ -30,12 +169,23 @@ class QueryResult(BaseModel):
 class NLProcessor:
     """Processor for natural language queries to Apache NiFi."""
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-3.5-turbo"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-3.5-turbo",
+                 batch_window: float = 0.075, max_batch: int = 8,
+                 intent_cache_size: int = 1024, local_model: Optional[str] = None,
+                 local_model_url: str = "http://localhost:11434/v1", simple_cache_size: int = 128,
+                 max_concurrent_batches: int = 4):
         """Initialize the NLP processor.
         
         Args:
             api_key: OpenAI API key (defaults to OPENAI_API_KEY environment variable)
             model: OpenAI model to use
+            batch_window: Seconds to wait for more queries before sending a batch
+            max_batch: Maximum number of queries classified per OpenAI request
+            intent_cache_size: Maximum number of OpenAI classifications kept in the LRU cache
+            local_model: Name of a local model (e.g. served by Ollama) tried before OpenAI
+            local_model_url: OpenAI-compatible base URL of the local model server
+            simple_cache_size: Maximum number of keyword-based detections kept in the LRU cache
+            max_concurrent_batches: Maximum number of classification requests in flight at once
         """
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
         if not self.api_key:
@@ -43,19 +193,112 @@ class NLProcessor:
         
         self.model = model
         
+        # Persistent async OpenAI client so connections stay warm across calls
+        self._openai = AsyncOpenAI(api_key=self.api_key) if self.api_key else None
+        
+        # Optional local model, used first so OpenAI only sees queries it cannot classify
+        self.local_model = local_model
+        self._local = AsyncOpenAI(base_url=local_model_url, api_key="local") if local_model else None
+        if local_model:
+            logger.info(f"Using local model {local_model} at {local_model_url} for intent detection")
+        
+        # Micro-batching of OpenAI intent classification
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._batch_queue: Optional[asyncio.Queue] = None
+        self._batch_task: Optional[asyncio.Task] = None
+        self._inflight_batches: Set[asyncio.Task] = set()
+        
+        # Cap on concurrent classification requests, so bursts do not run into rate limits;
+        # the semaphore is created per event loop
+        self.max_concurrent_batches = max_concurrent_batches
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+        self._batch_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # LRU cache of OpenAI classifications keyed on the normalized query
+        self.intent_cache_size = intent_cache_size
+        self._intent_cache: "OrderedDict[str, QueryIntent]" = OrderedDict()
+        
+        # LRU cache of keyword-based detections keyed on the exact query, since
+        # extracted parameters keep the query's case
+        self.simple_cache_size = simple_cache_size
+        self._simple_cache: "OrderedDict[str, QueryIntent]" = OrderedDict()
+        
         # Intent mappings for common NiFi operations
         self.intent_mappings = {
-            "list_process_groups": ["list process groups", "show process groups", "get process groups"],
+            "list_process_groups": ["list process groups", "show process groups", "get process groups",
+                                    "list all process groups", "show all process groups"],
             "get_processor_details": ["processor details", "show processor", "get processor info"],
             "create_process_group": ["create process group", "new process group", "add process group"],
             "start_component": ["start processor", "start component", "run processor", "run flow", "start flow"],
             "stop_component": ["stop processor", "stop component", "halt processor", "stop flow", "pause flow"],
             "get_flow_status": ["flow status", "get status", "show status", "check status", "monitor flow"],
             "search_components": ["search for", "find components", "look for", "locate"],
-            "list_processors": ["list processors", "show processors", "get processors"],
-            "list_connections": ["list connections", "show connections", "get connections"],
-            "list_templates": ["list templates", "show templates", "get templates"],
+            "list_processors": ["list processors", "show processors", "get processors", "list all processors"],
+            "list_connections": ["list connections", "show connections", "get connections", "list all connections"],
+            "list_templates": ["list templates", "show templates", "get templates", "list all templates"],
         }
+        
+        # Phrases that identify their intent unambiguously, regardless of how
+        # long the surrounding query is; phrases of at least strong_phrase_len
+        # characters are treated the same way
+        self.strong_phrase_len = 12
+        self._strong_phrases = {
+            "run flow", "start flow", "stop flow", "pause flow",
+            "flow status", "get status", "show status",
+        }
+        
+        self._compile_intent_pattern()
+        
+        # Parameter patterns per intent, compiled once at import
+        self._param_patterns = _PARAM_PATTERNS
+    
+    def _compile_intent_pattern(self) -> None:
+        """Compile all intent phrases into a single matcher.
+        
+        Phrases are flattened into parallel lists ranked longest first (mapping
+        order breaks ties), so a lower rank always means a higher confidence.
+        Each phrase becomes capture group ``rank + 1`` inside a lookahead, so a
+        single scan reports the best phrase starting at every position,
+        including overlapping ones. When pyahocorasick is installed the phrases
+        are also built into an Aho-Corasick automaton, which finds every
+        occurrence in one pass however many phrases there are.
+        """
+        phrases = [
+            (phrase, intent_type)
+            for intent_type, intent_phrases in self.intent_mappings.items()
+            for phrase in intent_phrases
+        ]
+        # sorted() is stable, so equal-length phrases keep their mapping order
+        phrases.sort(key=lambda item: -len(item[0]))
+        
+        self._phrases = [phrase for phrase, _ in phrases]
+        self._phrase_intent = [intent_type for _, intent_type in phrases]
+        self._phrase_len = [len(phrase) for phrase in self._phrases]
+        self._phrase_strong = [
+            len(phrase) >= self.strong_phrase_len or phrase in self._strong_phrases
+            for phrase in self._phrases
+        ]
+        self._intent_re = re.compile(
+            "(?=(?:" + "|".join(f"({re.escape(phrase)})" for phrase in self._phrases) + "))"
+        )
+        
+        self._intent_automaton = None
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for rank, phrase in enumerate(self._phrases):
+                # A phrase listed under two intents keeps its best rank, as in the regex
+                if not automaton.exists(phrase):
+                    automaton.add_word(phrase, rank)
+            automaton.make_automaton()
+            self._intent_automaton = automaton
+    
+    def _best_phrase_rank(self, query_lower: str) -> int:
+        """Return the rank of the best intent phrase in a lowercased query, or -1 if none occurs."""
+        if self._intent_automaton is not None:
+            return min((rank for _, rank in self._intent_automaton.iter(query_lower)), default=-1)
+        # The lowest-ranked match is the longest phrase, i.e. the best confidence
+        return min((match.lastindex for match in self._intent_re.finditer(query_lower)), default=0) - 1
     
     async def process_query(self, context: QueryContext) -> QueryResult:
         """Process a natural language query.
@@ -67,23 +310,33 @@ class NLProcessor:
             QueryResult with detected intent and response
         """
         query = context.query.strip()
+        query_lower = query.lower()
+        
+        # Per-stage latency in milliseconds
+        latency_ms = {}
         
         try:
             # Basic intent detection without using OpenAI
-            intent = self._detect_intent_simple(query)
+            start = time.perf_counter()
+            intent = self._detect_intent_simple(query, query_lower)
+            latency_ms["simple"] = (time.perf_counter() - start) * 1000
             
             # If we have an API key, use OpenAI for more advanced processing
-            if self.api_key and intent.confidence < 0.8:
-                intent = await self._detect_intent_openai(query)
+            if (self._openai or self._local) and intent.confidence < 0.8:
+                start = time.perf_counter()
+                intent = await self._detect_intent_openai(query, query_lower)
+                latency_ms["openai"] = (time.perf_counter() - start) * 1000
             
             # Generate a response based on the detected intent
+            start = time.perf_counter()
             response = self._generate_response(query, intent)
+            latency_ms["respond"] = (time.perf_counter() - start) * 1000
             
             return QueryResult(
                 original_query=query,
                 detected_intent=intent,
                 response=response,
-                context_updates={}
+                context_updates={"latency_ms": latency_ms}
             )
         except Exception as e:
             logger.error(f"Error processing query: {str(e)}")
@@ -93,27 +346,34 @@ class NLProcessor:
                 error=str(e)
             )
     
-    def _detect_intent_simple(self, query: str) -> QueryIntent:
+    def _detect_intent_simple(self, query: str, query_lower: Optional[str] = None) -> QueryIntent:
         """Simple keyword-based intent detection.
         
         Args:
             query: The natural language query
+            query_lower: The query already lowercased, if the caller has it
             
         Returns:
             QueryIntent with the detected intent type and parameters
         """
-        query_lower = query.lower()
-        best_intent = None
-        best_confidence = 0.0
-        
-        # Check each intent mapping for matches
-        for intent_type, phrases in self.intent_mappings.items():
-            for phrase in phrases:
-                if phrase in query_lower:
-                    confidence = len(phrase) / len(query_lower)
-                    if confidence > best_confidence:
-                        best_confidence = confidence
-                        best_intent = intent_type
+        cached = self._simple_cache.get(query)
+        if cached is not None:
+            self._simple_cache.move_to_end(query)
+            return cached.model_copy(deep=True)
+        
+        intent = self._detect_intent_keywords(query, query_lower)
+        self._simple_cache[query] = intent.model_copy(deep=True)
+        if len(self._simple_cache) > self.simple_cache_size:
+            self._simple_cache.popitem(last=False)
+        return intent
+    
+    def _detect_intent_keywords(self, query: str, query_lower: Optional[str] = None) -> QueryIntent:
+        """Match a query against the intent phrases, uncached; see _detect_intent_simple."""
+        if query_lower is None:
+            query_lower = query.lower()
+        
+        best_rank = self._best_phrase_rank(query_lower)
+        best_intent = self._phrase_intent[best_rank] if best_rank >= 0 else None
         
         # If no intent matched, default to search
         if not best_intent:
@@ -122,69 +382,251 @@ class NLProcessor:
         # Extract basic parameters based on the intent type
         parameters = self._extract_parameters(query, best_intent)
         
+        # Unambiguous phrases are trusted outright so OpenAI is not consulted
+        if self._phrase_strong[best_rank]:
+            confidence = 1.0
+        else:
+            confidence = self._phrase_len[best_rank] / len(query_lower)
+        
         return QueryIntent(
             intent_type=best_intent,
-            confidence=best_confidence,
+            confidence=confidence,
             parameters=parameters
         )
     
-    async def _detect_intent_openai(self, query: str) -> QueryIntent:
+    async def _detect_intent_openai(self, query: str, query_lower: Optional[str] = None) -> QueryIntent:
         """Use OpenAI to detect the intent of a query.
         
+        Queries are queued and classified in micro-batches so that concurrent
+        chat requests share a single OpenAI round-trip.
+        
         Args:
             query: The natural language query
+            query_lower: The query already lowercased, if the caller has it
             
         Returns:
             QueryIntent with the detected intent type and parameters
         """
-        if not self.api_key:
-            return self._detect_intent_simple(query)
+        if query_lower is None:
+            query_lower = query.lower()
+        
+        if not (self._openai or self._local):
+            return self._detect_intent_simple(query, query_lower)
+        
+        # Serve repeated queries from the cache without calling OpenAI
+        cached = self._cached_intent(query)
+        if cached is not None:
+            return cached
         
         try:
-            openai.api_key = self.api_key
-            
-            system_message = """
-            You are an assistant that helps users interact with Apache NiFi through natural language.
-            Your job is to classify the user's query into one of these intents:
-            - list_process_groups: List process groups
-            - get_processor_details: Get details of a specific processor
-            - create_process_group: Create a new process group
-            - start_component: Start a component
-            - stop_component: Stop a component
-            - get_flow_status: Get the status of the flow
-            - search_components: Search for components
-            - unknown: If the query doesn't match any of the above
+            # Start the batch loop lazily, once an event loop is running
+            if self._batch_task is None or self._batch_task.done():
+                self._batch_queue = asyncio.Queue()
+                self._batch_task = asyncio.create_task(self._batch_loop())
             
-            Also extract any relevant parameters from the query, like names, IDs, or other qualifiers.
-            Return your response in JSON format with 'intent_type' and 'parameters' fields.
-            """
+            future = asyncio.get_running_loop().create_future()
+            await self._batch_queue.put((query, future))
+            return self._resolve_classification(query, query_lower, await future)
+        except Exception as e:
+            logger.error(f"Error with OpenAI intent detection: {str(e)}")
+            # Fall back to simple intent detection
+            return self._detect_intent_simple(query, query_lower)
+    
+    async def detect_intents_batch(self, queries: List[str]) -> List[QueryIntent]:
+        """Detect the intents of several queries with as few model requests as possible.
+        
+        Cached queries are answered straight away; the others are packed up to
+        max_batch per prompt and the prompts are sent concurrently, within the
+        max_concurrent_batches cap. Queries in a batch whose request fails fall
+        back to simple intent detection.
+        
+        Args:
+            queries: The natural language queries to classify
             
-            messages = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": query}
-            ]
+        Returns:
+            The detected intents, in the order of the queries
+        """
+        lowered = [query.lower() for query in queries]
+        if not (self._openai or self._local):
+            return [self._detect_intent_simple(query, query_lower) for query, query_lower in zip(queries, lowered)]
+        
+        intents: List[Optional[QueryIntent]] = [self._cached_intent(query) for query in queries]
+        
+        # Classify each distinct uncached query once
+        pending: Dict[str, int] = {}
+        for position, (intent, query) in enumerate(zip(intents, queries)):
+            if intent is None:
+                pending.setdefault(query.strip(), position)
+        positions = list(pending.values())
+        chunks = [positions[i:i + self.max_batch] for i in range(0, len(positions), self.max_batch)]
+        
+        async def classify(chunk: List[int]) -> Dict[int, Dict[str, Any]]:
+            async with self._batch_limiter():
+                return await self._classify_batch([queries[position] for position in chunk])
+        
+        results = await asyncio.gather(*(classify(chunk) for chunk in chunks), return_exceptions=True)
+        
+        resolved: Dict[str, QueryIntent] = {}
+        for chunk, parsed in zip(chunks, results):
+            if isinstance(parsed, Exception):
+                logger.error(f"Error with OpenAI batch intent detection: {str(parsed)}")
+                parsed = {}
+            for index, position in enumerate(chunk):
+                query, query_lower = queries[position], lowered[position]
+                try:
+                    resolved[query.strip()] = self._resolve_classification(query, query_lower, parsed.get(index))
+                except Exception as e:
+                    logger.error(f"Error with OpenAI batch intent detection: {str(e)}")
+                    resolved[query.strip()] = self._detect_intent_simple(query, query_lower)
+        
+        return [
+            intent if intent is not None else resolved[query.strip()].model_copy(deep=True)
+            for intent, query in zip(intents, queries)
+        ]
+    
+    def _cached_intent(self, query: str) -> Optional[QueryIntent]:
+        """Get a copy of the cached model classification of a query, if any.
+        
+        Entries are keyed on the query with its case intact, since the cached
+        parameters are copied from the query as written.
+        """
+        cache_key = query.strip()
+        cached = self._intent_cache.get(cache_key)
+        if cached is None:
+            return None
+        self._intent_cache.move_to_end(cache_key)
+        return cached.model_copy(deep=True)
+    
+    def _resolve_classification(self, query: str, query_lower: str,
+                                parsed: Optional[Dict[str, Any]]) -> QueryIntent:
+        """Turn a model classification of a query into an intent, caching it.
+        
+        A query the model left out of its reply, or classified as unknown, gets
+        simple intent detection instead, which is not cached.
+        """
+        if parsed is None or parsed.get("intent_type", "unknown") == "unknown":
+            if parsed is None:
+                logger.warning("OpenAI returned no classification for a query, using simple detection")
+            return self._detect_intent_simple(query, query_lower)
+        
+        intent = QueryIntent(
+            intent_type=parsed["intent_type"],
+            confidence=0.9,  # High confidence for OpenAI results
+            parameters=parsed.get("parameters", {})
+        )
+        
+        self._intent_cache[query.strip()] = intent.model_copy(deep=True)
+        if len(self._intent_cache) > self.intent_cache_size:
+            self._intent_cache.popitem(last=False)
+        
+        return intent
+    
+    async def _batch_loop(self) -> None:
+        """Collect queued queries and classify them in batches."""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            # Wait for the first query, then gather more until the window closes
+            batch = [await self._batch_queue.get()]
+            deadline = loop.time() + self.batch_window
             
-            response = await openai.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                response_format={"type": "json_object"}
-            )
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._batch_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
             
-            result = response.choices[0].message.content
+            # Send the batch in the background so the next one can fill meanwhile
+            task = asyncio.create_task(self._dispatch_batch(batch))
+            self._inflight_batches.add(task)
+            task.add_done_callback(self._inflight_batches.discard)
+    
+    def _batch_limiter(self) -> asyncio.Semaphore:
+        """Get the semaphore capping concurrent classification requests on the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._batch_slots_loop is not loop:
+            self._batch_slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._batch_slots_loop = loop
+        return self._batch_slots
+    
+    async def _dispatch_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Classify one batch of queued queries and resolve their futures."""
+        try:
+            async with self._batch_limiter():
+                results = await self._classify_batch([query for query, _ in batch])
+            for index, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(results.get(index))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+    
+    async def _classify_batch(self, queries: List[str]) -> Dict[int, Dict[str, Any]]:
+        """Classify several queries, trying the local model before OpenAI.
+        
+        Queries the local model classifies as unknown, or all queries if the
+        local model fails, are escalated to OpenAI in a single request.
+        
+        Args:
+            queries: The natural language queries to classify
             
-            # Parse the JSON response
-            import json
-            parsed = json.loads(result)
+        Returns:
+            Dictionary mapping each query index to its parsed classification
+        """
+        results = {}
+        pending = list(range(len(queries)))
+        
+        if self._local:
+            try:
+                results = await self._request_classification(self._local, self.local_model, queries)
+                pending = [i for i in pending if results.get(i, {}).get("intent_type", "unknown") == "unknown"]
+            except Exception as e:
+                if not self._openai:
+                    raise
+                logger.warning(f"Local model intent detection failed, using OpenAI: {str(e)}")
+        
+        if pending and self._openai:
+            escalated = await self._request_classification(self._openai, self.model, [queries[i] for i in pending])
+            for index, query_index in enumerate(pending):
+                if index in escalated:
+                    results[query_index] = escalated[index]
+        
+        return results
+    
+    async def _request_classification(self, client: AsyncOpenAI, model: str,
+                                      queries: List[str]) -> Dict[int, Dict[str, Any]]:
+        """Classify several queries with a single chat completion request.
+        
+        Args:
+            client: OpenAI-compatible client to send the request with
+            model: Model to use
+            queries: The natural language queries to classify
             
-            return QueryIntent(
-                intent_type=parsed.get("intent_type", "unknown"),
-                confidence=0.9,  # High confidence for OpenAI results
-                parameters=parsed.get("parameters", {})
-            )
-        except Exception as e:
-            logger.error(f"Error with OpenAI intent detection: {str(e)}")
-            # Fall back to simple intent detection
-            return self._detect_intent_simple(query)
+        Returns:
+            Dictionary mapping each query index to its parsed classification
+        """
+        messages = [
+            {"role": "system", "content": _SYSTEM_PROMPT_V1},
+            # A JSON array keeps each query's text, newlines included, bound to its number
+            {"role": "user", "content": orjson.dumps([{"i": i, "query": query} for i, query in enumerate(queries)]).decode()}
+        ]
+        
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format={"type": "json_object"}
+        )
+        
+        result = response.choices[0].message.content
+        
+        # Parse the JSON response
+        parsed = orjson.loads(result)
+        
+        return {item.get("i"): item for item in parsed.get("results", []) if isinstance(item, dict)}
     
     def _extract_parameters(self, query: str, intent_type: str) -> Dict[str, Any]:
         """Extract parameters from a query based on the intent type.
@@ -196,48 +638,13 @@ class NLProcessor:
         Returns:
             Dictionary of extracted parameters
         """
-        # Basic parameter extraction
-        params = {}
-        query_lower = query.lower()
+        # The first pattern for the intent that matches supplies the parameters
+        for pattern in self._param_patterns.get(intent_type, ()):
+            match = pattern.search(query)
+            if match:
+                return {key: value for key, value in match.groupdict().items() if value}
         
-        # Extract parameters based on intent type
-        if intent_type == "list_process_groups":
-            # Look for "in [group name]" pattern
-            if "in " in query_lower:
-                group_name = query[query_lower.find("in ") + 3:].strip()
-                params["parent_group"] = group_name
-        
-        elif intent_type in ["get_processor_details", "start_component", "stop_component"]:
-            # Look for "processor [name]" or "[name] processor" patterns
-            if "processor " in query_lower:
-                processor_name = query[query_lower.find("processor ") + 10:].strip()
-                params["name"] = processor_name
-            elif " processor" in query_lower:
-                processor_name = query[:query_lower.find(" processor")].strip()
-                params["name"] = processor_name
-        
-        elif intent_type == "create_process_group":
-            # Look for "named [name]" or "called [name]" patterns
-            if "named " in query_lower:
-                group_name = query[query_lower.find("named ") + 6:].strip()
-                params["name"] = group_name
-            elif "called " in query_lower:
-                group_name = query[query_lower.find("called ") + 7:].strip()
-                params["name"] = group_name
-        
-        elif intent_type == "search_components":
-            # Extract search terms
-            search_terms = []
-            for pattern in ["search for ", "find ", "look for "]:
-                if pattern in query_lower:
-                    term = query[query_lower.find(pattern) + len(pattern):].strip()
-                    search_terms.append(term)
-                    break
-            
-            if search_terms:
-                params["search_term"] = search_terms[0]
-        
-        return params
+        return {}
     
     def _generate_response(self, query: str, intent: QueryIntent) -> str:
         """Generate a response based on the detected intent.
@@ -249,39 +656,9 @@ class NLProcessor:
         Returns:
             A natural language response
         """
-        intent_type = intent.intent_type
-        parameters = intent.parameters
-        
-        # Generate different responses based on the intent type
-        if intent_type == "unknown":
-            return "I'm not sure what you're asking about. You can ask about process groups, processors, or other NiFi components."
-        
-        elif intent_type == "list_process_groups":
-            parent_group = parameters.get("parent_group", "root")
-            return f"I'll list the process groups in {parent_group}."
+        template = _RESPONSE_TEMPLATES.get(intent.intent_type)
+        if template is None:
+            return f"I'll help you with: {intent.intent_type.replace('_', ' ')}."
         
-        elif intent_type == "get_processor_details":
-            processor_name = parameters.get("name", "the processor")
-            return f"I'll get the details for {processor_name}."
-        
-        elif intent_type == "create_process_group":
-            group_name = parameters.get("name", "the new process group")
-            return f"I'll create a new process group called '{group_name}'."
-        
-        elif intent_type == "start_component":
-            component_name = parameters.get("name", "the component")
-            return f"I'll start {component_name}."
-        
-        elif intent_type == "stop_component":
-            component_name = parameters.get("name", "the component")
-            return f"I'll stop {component_name}."
-        
-        elif intent_type == "get_flow_status":
-            return "I'll get the current status of your flow."
-        
-        elif intent_type == "search_components":
-            search_term = parameters.get("search_term", "components")
-            return f"I'll search for '{search_term}' in your NiFi instance."
-        
-        else:
-            return f"I'll help you with: {intent_type.replace('_', ' ')}." 
\ No newline at end of file
+        text, defaults = template
+        return text.format_map(_TemplateParams(intent.parameters, defaults))
@@ -0,0 +1,80 @@
+import httpx
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from .cache import TTLCache
+from .nifi_api import NiFiAPIClient
+from loguru import logger
+
+# Last known revision of each NiFi component, keyed on (NiFi URL, component ID), so a
+# mutation can send it straight away instead of first GETting the component. Component
+# IDs are UUIDs, so processors, ports, process groups and connections share one table.
+REVISIONS = TTLCache(maxsize=4096, ttl=300.0)
+
+# Status codes NiFi answers a mutation sent with an out-of-date revision with
+STALE_REVISION_STATUSES = (400, 409)
+
+def remember_revision(nifi_client: NiFiAPIClient, component_id: Optional[str],
+                      entity: Any) -> Optional[Dict[str, Any]]:
+    """Record the revision carried by a component entity and return it."""
+    revision = entity.get("revision") if isinstance(entity, dict) else None
+    if component_id and revision and "version" in revision:
+        REVISIONS.put((nifi_client.base_url, component_id), revision)
+    return revision
+
+def forget_revision(nifi_client: NiFiAPIClient, component_id: str) -> None:
+    """Drop the cached revision of a component, e.g. once it is deleted."""
+    REVISIONS.pop((nifi_client.base_url, component_id))
+
+def forget_revisions(nifi_client: NiFiAPIClient) -> None:
+    """Drop every cached revision of a NiFi instance, e.g. after a bulk state change."""
+    for key in REVISIONS.keys():
+        if key[0] == nifi_client.base_url:
+            REVISIONS.pop(key)
+
+async def get_revision(nifi_client: NiFiAPIClient, path: str, component_id: str) -> Tuple[Dict[str, Any], bool]:
+    """Get a component's revision, from the cache when known.
+
+    Args:
+        nifi_client: NiFi API client instance
+        path: API path of the component entity, fetched on a cache miss
+        component_id: ID of the component
+
+    Returns:
+        Tuple of the revision and whether it came from the cache
+    """
+    revision = REVISIONS.get((nifi_client.base_url, component_id))
+    if revision is not None:
+        return revision, True
+    current_info = await nifi_client.get(path)
+    return remember_revision(nifi_client, component_id, current_info) or {}, False
+
+async def send_with_revision(nifi_client: NiFiAPIClient, path: str, component_id: str,
+                             revision: Dict[str, Any], cached: bool,
+                             send: Callable[[Dict[str, Any]], Awaitable[Any]]) -> Any:
+    """Send a mutation with a component's revision.
+
+    A cached revision that NiFi rejects as stale (400 Bad Request, or 409 Conflict)
+    is forgotten, refetched and the mutation retried once. The revision NiFi returns with the updated entity
+    is remembered for the next mutation.
+
+    Args:
+        nifi_client: NiFi API client instance
+        path: API path of the component entity, fetched to refresh a stale revision
+        component_id: ID of the component
+        revision: Revision to send, as returned by get_revision
+        cached: Whether the revision came from the cache
+        send: Coroutine function sending the mutation with a given revision
+
+    Returns:
+        The NiFi response to the mutation
+    """
+    try:
+        response = await send(revision)
+    except httpx.HTTPStatusError as e:
+        if not cached or e.response.status_code not in STALE_REVISION_STATUSES:
+            raise
+        logger.debug("Cached revision for component {} was stale, refetching", component_id)
+        forget_revision(nifi_client, component_id)
+        revision, _ = await get_revision(nifi_client, path, component_id)
+        response = await send(revision)
+    remember_revision(nifi_client, component_id, response)
+    return response
@@ -1,19 +1,55 @@
 from fastapi import FastAPI, HTTPException, Request, Response, Depends
-import json
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import asyncio
+from dataclasses import dataclass, field, fields
+from contextlib import asynccontextmanager
+import orjson
 import yaml
 import os
-from typing import Dict, Any, List, Optional, Union
+import time
+from typing import Dict, Any, List, Optional, Union, AsyncIterator, Awaitable, Callable, Tuple
+from collections import OrderedDict
 from loguru import logger
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+try:
+    from yaml import CSafeLoader as YAMLSafeLoader
+except ImportError:
+    from yaml import SafeLoader as YAMLSafeLoader
 
 from .nifi_api import NiFiAPIClient
-from .nlp_processor import NLProcessor, QueryContext, QueryResult
+from .nlp_processor import NLProcessor, QueryContext, QueryIntent, QueryResult
+from .tools.process_groups import list_process_groups, get_process_group_details, create_process_group
+from .tools.flow_control import bulk_set_state, get_component_statuses, get_flow_status, start_component, stop_component
+from .tools.connections import fetch_connections, iter_connections_json
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bind the shared and per-session NiFi HTTP connection pools to the app lifetime."""
+    logger.info(f"NiFi MCP Server starting, using NiFi at {nifi_client.base_url}")
+    # Open the shared pool's first connection (TCP, TLS and HTTP/2 setup) in the background,
+    # so the first tool call does not pay for it and startup does not wait on NiFi
+    warmup = asyncio.ensure_future(nifi_client.test_connection())
+    yield
+    warmup.cancel()
+    await nifi_client.aclose()
+    async with session_lock:
+        clients = list(session_clients.values())
+        session_clients.clear()
+    for client in clients:
+        await client.aclose()
+    # Close replaced and evicted clients now instead of waiting out their grace period
+    for task, client in list(retired_clients.items()):
+        task.cancel()
+        await client.aclose()
 
 # MCP Server App
-app = FastAPI(title="NiFi MCP Server", description="Model Context Protocol Server for Apache NiFi")
+app = FastAPI(title="NiFi MCP Server", description="Model Context Protocol Server for Apache NiFi",
+              default_response_class=ORJSONResponse, lifespan=lifespan)
 
-# Configuration for NiFi connection and other settings
-CONFIG = {
+# Raw configuration from environment variables, overlaid with config.yaml below
+_config = {
     "nifi": {
         "url": os.environ.get("NIFI_URL", "http://localhost:8080/nifi-api"),
         "auth_type": os.environ.get("NIFI_AUTH_TYPE", "none"),
@@ -21,10 +57,15 @@ CONFIG = {
         "password": os.environ.get("NIFI_PASSWORD", ""),
         "token": os.environ.get("NIFI_TOKEN", ""),
         "ssl_verify": os.environ.get("NIFI_SSL_VERIFY", "true").lower() == "true",
+        "max_concurrency": int(os.environ.get("NIFI_MAX_CONCURRENCY", "32")),
     },
     "openai": {
         "api_key": os.environ.get("OPENAI_API_KEY", ""),
         "model": os.environ.get("OPENAI_MODEL", "gpt-3.5-turbo"),
+    },
+    "local_llm": {
+        "model": os.environ.get("LOCAL_LLM_MODEL", ""),
+        "url": os.environ.get("LOCAL_LLM_URL", "http://localhost:11434/v1"),
     }
 }
 
@@ -33,291 +74,544 @@ CONFIG_FILE = os.environ.get("NIFI_MCP_CONFIG", "config.yaml")
 if os.path.exists(CONFIG_FILE):
     try:
         with open(CONFIG_FILE, "r") as f:
-            file_config = yaml.safe_load(f)
-            # Update CONFIG with file values, preserving env var overrides
+            file_config = yaml.load(f, Loader=YAMLSafeLoader)
+            # Update config with file values, preserving env var overrides
             if file_config:
+                existing_env = os.environ
                 for section, values in file_config.items():
-                    if section not in CONFIG:
-                        CONFIG[section] = {}
+                    section_cfg = _config.setdefault(section, {})
+                    prefix = section.upper() + "_"
                     for key, value in values.items():
-                        if os.environ.get(f"{section.upper()}_{key.upper()}") is None:
-                            CONFIG[section][key] = value
+                        if prefix + key.upper() not in existing_env:
+                            section_cfg[key] = value
     except Exception as e:
         logger.error(f"Error loading config from {CONFIG_FILE}: {str(e)}")
 
+# Typed, immutable view of the configuration, built once at import
+@dataclass(frozen=True)
+class NiFiConfig:
+    url: str
+    auth_type: str
+    username: str
+    password: str = field(repr=False)
+    token: str = field(repr=False)
+    ssl_verify: bool
+    max_concurrency: int
+
+@dataclass(frozen=True)
+class OpenAIConfig:
+    api_key: str = field(repr=False)
+    model: str
+
+@dataclass(frozen=True)
+class LocalLLMConfig:
+    model: str
+    url: str
+
+@dataclass(frozen=True)
+class AppConfig:
+    nifi: NiFiConfig
+    openai: OpenAIConfig
+    local_llm: LocalLLMConfig
+
+def _config_section(cls: type, values: Dict[str, Any]) -> Any:
+    """Build a config section from its dict, ignoring keys the section does not define."""
+    return cls(**{f.name: values[f.name] for f in fields(cls)})
+
+CONFIG = AppConfig(
+    nifi=_config_section(NiFiConfig, _config["nifi"]),
+    openai=_config_section(OpenAIConfig, _config["openai"]),
+    local_llm=_config_section(LocalLLMConfig, _config["local_llm"])
+)
+
 # Initialize NiFi API client
 nifi_client = NiFiAPIClient(
-    base_url=CONFIG["nifi"]["url"],
-    auth_type=CONFIG["nifi"]["auth_type"],
-    username=CONFIG["nifi"]["username"],
-    password=CONFIG["nifi"]["password"],
-    token=CONFIG["nifi"]["token"],
-    ssl_verify=CONFIG["nifi"]["ssl_verify"]
+    base_url=CONFIG.nifi.url,
+    auth_type=CONFIG.nifi.auth_type,
+    username=CONFIG.nifi.username,
+    password=CONFIG.nifi.password,
+    token=CONFIG.nifi.token,
+    ssl_verify=CONFIG.nifi.ssl_verify,
+    max_concurrency=CONFIG.nifi.max_concurrency
 )
 
 # Initialize NLP processor
 nlp_processor = NLProcessor(
-    api_key=CONFIG["openai"]["api_key"],
-    model=CONFIG["openai"]["model"]
+    api_key=CONFIG.openai.api_key,
+    model=CONFIG.openai.model,
+    local_model=CONFIG.local_llm.model or None,
+    local_model_url=CONFIG.local_llm.url
 )
 
+# Per-session NiFi clients, registered once via /api/session and kept in LRU order
+MAX_SESSIONS = 256
+session_clients: "OrderedDict[str, NiFiAPIClient]" = OrderedDict()
+session_lock = asyncio.Lock()
+
+# Replaced or evicted session clients stay open this long, so chat requests that
+# already fetched them can finish, and are then closed by a background task
+SESSION_CLOSE_GRACE = 60.0
+retired_clients: Dict[asyncio.Task, NiFiAPIClient] = {}
+
 # Model for tool request
 class ToolRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
     name: str
     parameters: Dict[str, Any] = {}
 
 # Model for chat request
 class ChatRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
     query: str
     session_id: Optional[str] = None
     user_id: Optional[str] = None
     context: Optional[Dict[str, Any]] = None
 
+# Model for session registration request
+class SessionRequest(BaseModel):
+    session_id: str
+    nifi_url: str
+    auth_type: str = "none"
+    username: Optional[str] = None
+    password: Optional[str] = None
+    token: Optional[str] = None
+    ssl_verify: bool = True
+
 # Model for tool response
 class ToolResponse(BaseModel):
     status: str
     tool: str
     result: Any
 
+def json_body(model: type) -> Callable[[Request], Awaitable[BaseModel]]:
+    """Build a dependency that validates the raw request body straight into a model.
+    
+    Pydantic's model_validate_json parses and validates the bytes in one pass,
+    skipping FastAPI's separate json.loads and field-by-field body validation.
+    """
+    async def parse(request: Request) -> BaseModel:
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError([
+                {**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)
+            ])
+    return parse
+
+class UnknownSessionError(LookupError):
+    """Raised for a session ID with no registered NiFi client, e.g. after a restart."""
+
+async def get_nifi_client(session_id: Optional[str] = None) -> NiFiAPIClient:
+    """Get the NiFi client registered for a session, or the default client without one.
+    
+    Raises:
+        UnknownSessionError: If the session was never registered or has been evicted
+    """
+    if not session_id:
+        return nifi_client
+    async with session_lock:
+        client = session_clients.get(session_id)
+        if client is None:
+            raise UnknownSessionError(session_id)
+        session_clients.move_to_end(session_id)
+        return client
+
+def _retire_session_client(client: NiFiAPIClient) -> None:
+    """Close a session client after the grace period, once in-flight requests are done with it."""
+    async def close_later() -> None:
+        await asyncio.sleep(SESSION_CLOSE_GRACE)
+        await client.aclose()
+    
+    task = asyncio.create_task(close_later())
+    retired_clients[task] = client
+    task.add_done_callback(lambda done: retired_clients.pop(done, None))
+
+def _unknown_session_response(query: str, session_id: str) -> ORJSONResponse:
+    """Build the 404 response telling a client to register its session again."""
+    return ORJSONResponse(status_code=404, content={
+        "original_query": query,
+        "response": f"Unknown session: {session_id}",
+        "error": "unknown_session"
+    })
+
 @app.get("/")
 async def root():
     return {"message": "NiFi MCP Server", "status": "running"}
 
-@app.post("/mcp/tool")
-async def handle_tool_call(request: ToolRequest):
+# Tool handlers, each taking the raw tool parameters and calling the NiFi tools directly
+async def _tool_nifi_query(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Handle natural language query to NiFi."""
+    # Tool parameters are untyped, and the query context below skips validation
+    query = parameters.get("query", "")
+    if not isinstance(query, str):
+        raise ValueError("Query must be a string")
+    result = await process_natural_language_query(query)
+    return result.model_dump()
+
+async def _tool_process_groups_list(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Get process groups - directly use the NiFi API."""
+    return await list_process_groups(nifi_client, parameters.get("parent_id", "root"),
+                                     bool(parameters.get("prefetch_details", False)))
+
+async def _tool_process_group_details(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Get process group details."""
+    pg_id = parameters.get("pg_id")
+    if not pg_id:
+        raise ValueError("Process group ID is required")
+    return await get_process_group_details(nifi_client, pg_id)
+
+async def _tool_flow_status(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Get flow status."""
+    return await get_flow_status(nifi_client, parameters.get("pg_id", "root"))
+
+def _component_args(parameters: Dict[str, Any]) -> tuple:
+    """Extract the required component ID and type from tool parameters."""
+    component_id = parameters.get("component_id")
+    component_type = parameters.get("component_type")
+    if not component_id or not component_type:
+        raise ValueError("Component ID and type are required")
+    return component_id, component_type
+
+async def _tool_start_component(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Start a component."""
+    return await start_component(nifi_client, *_component_args(parameters))
+
+async def _tool_stop_component(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Stop a component."""
+    return await stop_component(nifi_client, *_component_args(parameters))
+
+async def _tool_component_statuses(parameters: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Get the status of several components in one call."""
+    components = parameters.get("components")
+    if not components:
+        raise ValueError("Components are required")
+    return await get_component_statuses(nifi_client, [_component_args(component) for component in components])
+
+async def _tool_bulk_set_state(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Start or stop several components of a process group in one call."""
+    pg_id = parameters.get("pg_id")
+    components = parameters.get("components")
+    state = parameters.get("state")
+    if not pg_id or not components or state not in ("RUNNING", "STOPPED"):
+        raise ValueError("Process group ID, components and a RUNNING or STOPPED state are required")
+    return await bulk_set_state(nifi_client, pg_id, [_component_args(component) for component in components], state)
+
+# Tool name -> handler, built once at import so dispatch is a single dict lookup
+TOOL_REGISTRY: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]] = {
+    "nifi_query": _tool_nifi_query,
+    "process_groups_list": _tool_process_groups_list,
+    "process_group_details": _tool_process_group_details,
+    "flow_status": _tool_flow_status,
+    "start_component": _tool_start_component,
+    "stop_component": _tool_stop_component,
+    "component_statuses": _tool_component_statuses,
+    "bulk_set_state": _tool_bulk_set_state,
+}
+
+@app.post("/mcp/tool", response_class=ORJSONResponse)
+async def handle_tool_call(request: ToolRequest = Depends(json_body(ToolRequest))):
     """Handle MCP tool calls from the client."""
     try:
-        logger.debug(f"Received tool call: {request.name}")
-        
-        # Route to appropriate tool handler based on tool name
-        if request.name == "nifi_query":
-            # Handle natural language query to NiFi
-            query = request.parameters.get("query", "")
-            result = await process_natural_language_query(query)
-            return {
-                "status": "success",
-                "tool": request.name,
-                "result": result.dict()
-            }
-        
-        elif request.name == "process_groups_list":
-            # Get process groups - directly use the NiFi API
-            parent_id = request.parameters.get("parent_id", "root")
-            from .tools.process_groups import list_process_groups
-            result = await list_process_groups(nifi_client, parent_id)
-            return {
-                "status": "success", 
-                "tool": request.name,
-                "result": result
-            }
-        
-        elif request.name == "process_group_details":
-            # Get process group details
-            pg_id = request.parameters.get("pg_id")
-            if not pg_id:
-                raise ValueError("Process group ID is required")
-            
-            from .tools.process_groups import get_process_group_details
-            result = await get_process_group_details(nifi_client, pg_id)
-            return {
-                "status": "success",
-                "tool": request.name,
-                "result": result
-            }
+        logger.debug("Received tool call: {}", request.name)
         
-        elif request.name == "flow_status":
-            # Get flow status
-            pg_id = request.parameters.get("pg_id", "root")
-            from .tools.flow_control import get_flow_status
-            result = await get_flow_status(nifi_client, pg_id)
-            return {
-                "status": "success",
-                "tool": request.name,
-                "result": result
-            }
-            
-        elif request.name == "start_component":
-            # Start a component
-            component_id = request.parameters.get("component_id")
-            component_type = request.parameters.get("component_type")
-            
-            if not component_id or not component_type:
-                raise ValueError("Component ID and type are required")
-                
-            from .tools.flow_control import start_component
-            result = await start_component(nifi_client, component_id, component_type)
-            return {
-                "status": "success",
-                "tool": request.name,
-                "result": result
-            }
-            
-        elif request.name == "stop_component":
-            # Stop a component
-            component_id = request.parameters.get("component_id")
-            component_type = request.parameters.get("component_type")
-            
-            if not component_id or not component_type:
-                raise ValueError("Component ID and type are required")
-                
-            from .tools.flow_control import stop_component
-            result = await stop_component(nifi_client, component_id, component_type)
-            return {
-                "status": "success",
-                "tool": request.name,
-                "result": result
-            }
-            
-        # Add more tool handlers here
-            
-        else:
+        handler = TOOL_REGISTRY.get(request.name)
+        if handler is None:
             # Unknown tool
-            return {
+            payload = {
                 "status": "error",
                 "tool": request.name,
                 "result": f"Unknown tool: {request.name}"
             }
+        else:
+            payload = {
+                "status": "success",
+                "tool": request.name,
+                "result": await handler(request.parameters)
+            }
     
     except Exception as e:
-        logger.error(f"Error processing tool call: {str(e)}")
-        return {
+        logger.exception("Error processing tool call")
+        payload = {
             "status": "error",
             "tool": request.name,
             "result": str(e)
         }
+    
+    # Serialize straight to orjson instead of running the payload through jsonable_encoder
+    return ORJSONResponse(content=payload)
 
-@app.post("/api/chat")
-async def chat_endpoint(request: ChatRequest):
+@app.post("/api/session")
+async def session_endpoint(request: SessionRequest):
+    """Register the NiFi connection settings for a chat session.
+    
+    The client created here is reused for every chat request with the same
+    session ID, so credentials are sent once instead of with every message.
+    """
+    client = NiFiAPIClient(
+        base_url=request.nifi_url,
+        auth_type=request.auth_type,
+        username=request.username,
+        password=request.password,
+        token=request.token,
+        ssl_verify=request.ssl_verify,
+        max_concurrency=CONFIG.nifi.max_concurrency
+    )
+    
+    async with session_lock:
+        stale = [session_clients.pop(request.session_id, None)]
+        session_clients[request.session_id] = client
+        while len(session_clients) > MAX_SESSIONS:
+            stale.append(session_clients.popitem(last=False)[1])
+    
+    for stale_client in stale:
+        if stale_client is not None:
+            _retire_session_client(stale_client)
+    
+    return {"status": "success", "session_id": request.session_id}
+
+@app.get("/api/connections/stream")
+async def stream_connections_endpoint(pg_id: str = "root", session_id: Optional[str] = None):
+    """Stream the connections of a process group as a JSON document."""
+    try:
+        client = await get_nifi_client(session_id)
+        connections = await fetch_connections(client, pg_id)
+    except Exception as e:
+        # Fail before streaming starts so the error is still a complete JSON response
+        logger.exception("Error listing connections")
+        return ORJSONResponse(content={"status": "error", "message": str(e)})
+    
+    return StreamingResponse(iter_connections_json(pg_id, connections), media_type="application/json")
+
+@app.post("/api/chat", response_class=ORJSONResponse)
+async def chat_endpoint(request: ChatRequest = Depends(json_body(ChatRequest))):
     """Handle natural language chat requests."""
     try:
         result = await process_natural_language_query(request.query, request.session_id, request.user_id)
-        return result.dict()
+        # Pydantic serializes the model straight to JSON bytes, with no intermediate dict
+        return Response(content=result.model_dump_json(), media_type="application/json")
+    except UnknownSessionError:
+        return _unknown_session_response(request.query, request.session_id)
     except Exception as e:
-        logger.error(f"Error processing chat request: {str(e)}")
-        return {
+        logger.exception("Error processing chat request")
+        return ORJSONResponse(content={
+            "original_query": request.query,
+            "response": f"Error: {str(e)}",
+            "error": str(e)
+        })
+
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest = Depends(json_body(ChatRequest))):
+    """Handle natural language chat requests, streaming the response as NDJSON.
+    
+    Each line is a JSON object: a first ``{"intent": {...}}`` line carries the
+    detected intent, ``{"delta": "..."}`` chunks carry the response text, and a
+    final ``{"result": {...}}`` line carries the full query result. An unknown
+    session ID is answered with a 404 before streaming starts.
+    """
+    try:
+        await get_nifi_client(request.session_id)
+    except UnknownSessionError:
+        return _unknown_session_response(request.query, request.session_id)
+    return StreamingResponse(stream_chat_response(request), media_type="application/x-ndjson")
+
+async def stream_chat_response(request: ChatRequest) -> AsyncIterator[bytes]:
+    """Yield NDJSON lines for a chat request.
+    
+    The detected intent is sent as soon as it is known, before the NiFi action
+    runs, so the client gets its first line without waiting for NiFi.
+    """
+    try:
+        client, query_result = await understand_query(request.query, request.session_id, request.user_id)
+        intent = query_result.detected_intent
+        yield orjson.dumps({"intent": intent.model_dump() if intent else None}) + b"\n"
+        result = (await execute_intent(query_result, client)).model_dump()
+    except Exception as e:
+        logger.exception("Error processing chat request")
+        result = {
             "original_query": request.query,
             "response": f"Error: {str(e)}",
             "error": str(e)
         }
+    
+    # Send the response text word by word so the client can render it incrementally
+    words = result.get("response", "").split(" ")
+    for index, word in enumerate(words):
+        delta = word if index == len(words) - 1 else word + " "
+        yield orjson.dumps({"delta": delta}) + b"\n"
+    
+    yield orjson.dumps({"result": result}) + b"\n"
+
+# Intent handlers, each executing the action for a detected intent against the session's client.
+# They return (action_taken, action_result, response_override); the shared post-processing in
+# process_natural_language_query turns these into the final QueryResult.
+IntentOutcome = Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]
+
+async def _intent_list_process_groups(intent: QueryIntent, client: NiFiAPIClient) -> IntentOutcome:
+    parent_id = intent.parameters.get("parent_group", "root")
+    # Convert name to ID if needed (simplified for now)
+    if parent_id != "root" and not parent_id.startswith("process-group-"):
+        parent_id = "root"  # For simplicity, use root if not an ID
+    
+    action_result = await list_process_groups(client, parent_id)
+    return f"Listed process groups in {parent_id}", action_result, None
+
+async def _intent_get_processor_details(intent: QueryIntent, client: NiFiAPIClient) -> IntentOutcome:
+    # This would need to search for the processor by name first
+    # TODO: Implement processor details lookup
+    return "Get processor details action", None, None
+
+async def _intent_create_process_group(intent: QueryIntent, client: NiFiAPIClient) -> IntentOutcome:
+    name = intent.parameters.get("name", "New Process Group")
+    parent_id = "root"  # Default to root for simplicity
+    
+    action_result = await create_process_group(
+        client, 
+        parent_id, 
+        name, 
+        position_x=100, 
+        position_y=100
+    )
+    return f"Created process group '{name}'", action_result, None
+
+async def _intent_get_flow_status(intent: QueryIntent, client: NiFiAPIClient) -> IntentOutcome:
+    pg_id = intent.parameters.get("process_group", "root")
+    
+    action_result = await get_flow_status(client, pg_id)
+    action_taken = f"Retrieved flow status for {pg_id}"
+    if action_result.get("status") != "success":
+        return action_taken, action_result, None
+    
+    # Enhance the response with results
+    status_info = action_result.get("component_status", {})
+    flow_info = action_result.get("flow_status", {})
+    
+    running = status_info.get("running", 0)
+    total = status_info.get("total", 0)
+    
+    queued = flow_info.get("queued", "0 B")
+    
+    response = f"Your flow has {running} of {total} components running. " + \
+               f"Currently {queued} of data is queued in the flow."
+    return action_taken, action_result, response
+
+def _missing_component(verb: str) -> IntentOutcome:
+    """Build the outcome for a start/stop request that names no component."""
+    return (
+        None,
+        {"status": "error", "message": f"No component name provided to {verb}"},
+        f"I need to know which component to {verb}. Please specify a processor or process group name."
+    )
+
+async def _intent_start_component(intent: QueryIntent, client: NiFiAPIClient) -> IntentOutcome:
+    # This is simplified - in a real implementation, you'd need to search for the component first
+    component_name = intent.parameters.get("name", "")
+    if not component_name:
+        return _missing_component("start")
+    
+    # For demo purposes, assume it's the root process group
+    action_result = await start_component(client, "root", "process-group")
+    return f"Started component '{component_name}'", action_result, None
+
+async def _intent_stop_component(intent: QueryIntent, client: NiFiAPIClient) -> IntentOutcome:
+    # This is simplified - in a real implementation, you'd need to search for the component first
+    component_name = intent.parameters.get("name", "")
+    if not component_name:
+        return _missing_component("stop")
+    
+    # For demo purposes, assume it's the root process group
+    action_result = await stop_component(client, "root", "process-group")
+    return f"Stopped component '{component_name}'", action_result, None
+
+# Intent type -> handler; add more action handlers here
+INTENT_HANDLERS: Dict[str, Callable[[QueryIntent, NiFiAPIClient], Awaitable[IntentOutcome]]] = {
+    "list_process_groups": _intent_list_process_groups,
+    "get_processor_details": _intent_get_processor_details,
+    "create_process_group": _intent_create_process_group,
+    "get_flow_status": _intent_get_flow_status,
+    "start_component": _intent_start_component,
+    "stop_component": _intent_stop_component,
+}
 
 async def process_natural_language_query(query: str, session_id: Optional[str] = None, 
                                        user_id: Optional[str] = None) -> QueryResult:
     """Process a natural language query and execute the appropriate action."""
-    # Create a query context
-    context = QueryContext(
+    client, result = await understand_query(query, session_id, user_id)
+    return await execute_intent(result, client)
+
+async def understand_query(query: str, session_id: Optional[str] = None,
+                           user_id: Optional[str] = None) -> Tuple[NiFiAPIClient, QueryResult]:
+    """Detect the intent of a natural language query without acting on it.
+    
+    Returns:
+        Tuple of the session's NiFi client and the query result so far
+    """
+    client = await get_nifi_client(session_id)
+    
+    # Create a query context; callers pass validated request fields (the chat
+    # models, or the nifi_query tool's checked query), so skip re-running
+    # Pydantic validation on them
+    context = QueryContext.model_construct(
         query=query,
-        nifi_url=CONFIG["nifi"]["url"],
+        nifi_url=client.base_url,
         session_id=session_id,
         user_id=user_id
     )
     
     # Process the query using the NLP processor
-    result = await nlp_processor.process_query(context)
+    return client, await nlp_processor.process_query(context)
+
+async def execute_intent(result: QueryResult, client: NiFiAPIClient) -> QueryResult:
+    """Execute the action for the intent detected in a query result."""
+    # Only intents with a registered handler lead to an action
+    intent = result.detected_intent
+    handler = INTENT_HANDLERS.get(intent.intent_type) if intent else None
+    if handler is None:
+        return result
     
-    # If we have a detected intent, execute the corresponding action
-    if result.detected_intent and result.detected_intent.intent_type != "unknown":
-        intent = result.detected_intent
-        action_result = None
+    action_start = time.perf_counter()
+    try:
+        action_taken, action_result, response_override = await handler(intent, client)
+        if action_taken:
+            result.action_taken = action_taken
         
-        try:
-            # Route to appropriate action handler
-            if intent.intent_type == "list_process_groups":
-                from .tools.process_groups import list_process_groups
-                parent_id = intent.parameters.get("parent_group", "root")
-                # Convert name to ID if needed (simplified for now)
-                if parent_id != "root" and not parent_id.startswith("process-group-"):
-                    parent_id = "root"  # For simplicity, use root if not an ID
-                
-                action_result = await list_process_groups(nifi_client, parent_id)
-                result.action_taken = f"Listed process groups in {parent_id}"
-            
-            elif intent.intent_type == "get_processor_details":
-                # This would need to search for the processor by name first
-                result.action_taken = "Get processor details action"
-                # TODO: Implement processor details lookup
-            
-            elif intent.intent_type == "create_process_group":
-                from .tools.process_groups import create_process_group
-                name = intent.parameters.get("name", "New Process Group")
-                parent_id = "root"  # Default to root for simplicity
-                
-                action_result = await create_process_group(
-                    nifi_client, 
-                    parent_id, 
-                    name, 
-                    position_x=100, 
-                    position_y=100
-                )
-                result.action_taken = f"Created process group '{name}'"
-            
-            elif intent.intent_type == "get_flow_status":
-                from .tools.flow_control import get_flow_status
-                pg_id = intent.parameters.get("process_group", "root")
-                
-                action_result = await get_flow_status(nifi_client, pg_id)
-                result.action_taken = f"Retrieved flow status for {pg_id}"
-                
-                # Enhance the response with results
-                if action_result.get("status") == "success":
-                    status_info = action_result.get("component_status", {})
-                    flow_info = action_result.get("flow_status", {})
-                    
-                    running = status_info.get("running", 0)
-                    total = status_info.get("total", 0)
-                    
-                    queued = flow_info.get("queued", "0 B")
-                    
-                    result.response = f"Your flow has {running} of {total} components running. " + \
-                                     f"Currently {queued} of data is queued in the flow."
-            
-            elif intent.intent_type == "start_component":
-                from .tools.flow_control import start_component
-                
-                # This is simplified - in a real implementation, you'd need to search for the component first
-                component_name = intent.parameters.get("name", "")
-                
-                if component_name:
-                    # For demo purposes, assume it's the root process group
-                    component_id = "root"
-                    component_type = "process-group"
-                    
-                    action_result = await start_component(nifi_client, component_id, component_type)
-                    result.action_taken = f"Started component '{component_name}'"
-                else:
-                    result.error = "No component name provided to start"
-                    result.response = "I need to know which component to start. Please specify a processor or process group name."
-            
-            elif intent.intent_type == "stop_component":
-                from .tools.flow_control import stop_component
-                
-                # This is simplified - in a real implementation, you'd need to search for the component first
-                component_name = intent.parameters.get("name", "")
-                
-                if component_name:
-                    # For demo purposes, assume it's the root process group
-                    component_id = "root"
-                    component_type = "process-group"
-                    
-                    action_result = await stop_component(nifi_client, component_id, component_type)
-                    result.action_taken = f"Stopped component '{component_name}'"
-                else:
-                    result.error = "No component name provided to stop"
-                    result.response = "I need to know which component to stop. Please specify a processor or process group name."
-            
-            # Add more action handlers as needed
-            
-            # Update the response with action results if available
+        # Update the response with action results if available
+        if action_result and action_result.get("status") == "error":
+            result.error = action_result.get("message", "Unknown error")
+            result.response = response_override or f"I encountered an error: {result.error}"
+        else:
             if action_result:
-                if action_result.get("status") == "error":
-                    result.error = action_result.get("message", "Unknown error")
-                    result.response = f"I encountered an error: {result.error}"
-                else:
-                    # Enhance the response with results
-                    result.context_updates["action_result"] = action_result
-        
-        except Exception as e:
-            logger.error(f"Error executing action: {str(e)}")
-            result.error = str(e)
-            result.response = f"I understood that you want to {intent.intent_type.replace('_', ' ')}, but I encountered an error: {str(e)}"
+                # Enhance the response with results
+                result.context_updates["action_result"] = action_result
+            if response_override:
+                result.response = response_override
+    
+    except Exception as e:
+        logger.exception("Error executing action")
+        result.error = str(e)
+        result.response = f"I understood that you want to {intent.intent_type.replace('_', ' ')}, but I encountered an error: {str(e)}"
+    
+    result.context_updates.setdefault("latency_ms", {})["action"] = (time.perf_counter() - action_start) * 1000
     
     return result
+
+if __name__ == "__main__":
+    import importlib.util
+    import uvicorn
+    
+    # Sessions, cached revisions and the TTL caches live in each worker process, so
+    # more than one worker is only safe without runtime session registration
+    options = {
+        "host": os.environ.get("MCP_SERVER_HOST", "0.0.0.0"),
+        "port": int(os.environ.get("MCP_SERVER_PORT", "8000")),
+        "workers": int(os.environ.get("MCP_SERVER_WORKERS", "1"))
+    }
+    
+    # Use the uvloop event loop and httptools parser when they are installed
+    if importlib.util.find_spec("uvloop"):
+        options["loop"] = "uvloop"
+    if importlib.util.find_spec("httptools"):
+        options["http"] = "httptools"
+    
+    uvicorn.run("nifi_mcp_server.server:app", **options)
@@ -1,9 +1,114 @@
-from typing import Dict, Any, List, Optional
+import asyncio
+import orjson
+from typing import Dict, Any, List, Optional, AsyncIterator
 from ..nifi_api import NiFiAPIClient
+from ..cache import TTLCache
+from ..revisions import forget_revision, get_revision, remember_revision, send_with_revision
+from .process_groups import invalidate_process_group_details
+from .search import invalidate_flow_cache
 from loguru import logger
 
 # Connection Tools
 
+# NiFi endpoint paths used by the connection tools
+PATH_PG_FLOW = "/flow/process-groups/{pg_id}".format
+PATH_PG_CONNECTIONS = "/process-groups/{pg_id}/connections".format
+PATH_CONN = "/connections/{cid}".format
+PATH_CONN_STATUS = "/connections/{cid}/status".format
+PATH_CONN_VERSION = "/connections/{cid}?version={version}".format
+PATH_CONN_DROP = "/connections/{cid}/drop-requests".format
+
+# Shared read-only default for missing nested objects
+_EMPTY: Dict[str, Any] = {}
+
+# Short-lived caches for read-only connection lookups, keyed on (NiFi URL, id).
+# Mutating tools below invalidate them on success.
+CONNECTION_CACHE = TTLCache(maxsize=256, ttl=5.0)
+CONNECTION_DETAILS_CACHE = TTLCache(maxsize=256, ttl=5.0)
+
+def invalidate_connection_cache(nifi_client: NiFiAPIClient, connection_id: str = None) -> None:
+    """Drop cached connection listings and, if given, one connection's details.
+    
+    Process group details count connections and queued flowfiles, so they are
+    dropped as well.
+    
+    Args:
+        nifi_client: NiFi API client instance the change was made through
+        connection_id: ID of the changed connection
+    """
+    # A change can show up in any process group listing, so drop them all
+    CONNECTION_CACHE.clear()
+    invalidate_process_group_details()
+    invalidate_flow_cache()
+    if connection_id:
+        CONNECTION_DETAILS_CACHE.pop((nifi_client.base_url, connection_id))
+
+def _extract_connection(conn: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the relevant fields of a connection entity from a process group flow."""
+    # Nested lookups fall back to a shared empty dict instead of allocating
+    # a fresh {} default for every .get call
+    get = conn.get
+    source = get("sourceConnectable") or _EMPTY
+    destination = get("destinationConnectable") or _EMPTY
+    status = get("status") or _EMPTY
+    return {
+        "id": get("id"),
+        "name": get("name"),
+        "source": {
+            "id": get("sourceId"),
+            "name": source.get("name"),
+            "type": get("sourceType"),
+            "group_name": get("sourceGroupName")
+        },
+        "destination": {
+            "id": get("destinationId"),
+            "name": destination.get("name"),
+            "type": get("destinationType"),
+            "group_name": get("destinationGroupName")
+        },
+        "selected_relationships": get("selectedRelationships", []),
+        "flow_files_count": status.get("flowFilesCount", 0),
+        "queued_size": status.get("queued", "0 B")
+    }
+
+async def fetch_connections(nifi_client: NiFiAPIClient, pg_id: str = "root") -> List[Dict[str, Any]]:
+    """Fetch the raw connection entities of a process group.
+    
+    Args:
+        nifi_client: NiFi API client instance
+        pg_id: ID of the parent process group (default: root)
+        
+    Returns:
+        List of NiFi connection entities
+    """
+    response = await nifi_client.get(PATH_PG_FLOW(pg_id=pg_id))
+    connections = response.get("processGroupFlow", {}).get("flow", {}).get("connections", [])
+    
+    # Flow listings carry each connection's revision, which primes the revision cache
+    for conn in connections:
+        remember_revision(nifi_client, conn.get("id"), conn)
+    return connections
+
+async def iter_connections_json(pg_id: str, connections: List[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Encode a connection listing as JSON one connection at a time.
+    
+    Produces the same document as list_connections without building the full
+    list or serialized string in memory.
+    
+    Args:
+        pg_id: ID of the parent process group
+        connections: Raw connection entities from fetch_connections
+        
+    Returns:
+        Async iterator of JSON byte chunks
+    """
+    yield b'{"status":"success","parent_id":' + orjson.dumps(pg_id) + b',"connections":['
+    count = 0
+    for conn in connections:
+        yield (b"," if count else b"") + orjson.dumps(_extract_connection(conn))
+        count += 1
+    yield b'],"count":' + str(count).encode() + b"}"
+
 async def list_connections(nifi_client: NiFiAPIClient, pg_id: str = "root") -> Dict[str, Any]:
     """List connections in a process group.
     
@@ -14,40 +119,25 @@ async def list_connections(nifi_client: NiFiAPIClient, pg_id: str = "root") -> D
     Returns:
         Dictionary with connection information
     """
+    cache_key = (nifi_client.base_url, pg_id)
+    cached = CONNECTION_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        response = nifi_client.get(f"/flow/process-groups/{pg_id}")
-        connections = response.get("processGroupFlow", {}).get("flow", {}).get("connections", [])
+        connections = await fetch_connections(nifi_client, pg_id)
         
         # Extract relevant information
-        result = [
-            {
-                "id": conn.get("id"),
-                "name": conn.get("name"),
-                "source": {
-                    "id": conn.get("sourceId"),
-                    "name": conn.get("sourceConnectable", {}).get("name"),
-                    "type": conn.get("sourceType"),
-                    "group_name": conn.get("sourceGroupName")
-                },
-                "destination": {
-                    "id": conn.get("destinationId"),
-                    "name": conn.get("destinationConnectable", {}).get("name"),
-                    "type": conn.get("destinationType"),
-                    "group_name": conn.get("destinationGroupName")
-                },
-                "selected_relationships": conn.get("selectedRelationships", []),
-                "flow_files_count": conn.get("status", {}).get("flowFilesCount", 0),
-                "queued_size": conn.get("status", {}).get("queued", "0 B")
-            }
-            for conn in connections
-        ]
+        result = [_extract_connection(conn) for conn in connections]
         
-        return {
+        result = {
             "status": "success",
             "parent_id": pg_id,
             "connections": result,
             "count": len(result)
         }
+        CONNECTION_CACHE.put(cache_key, result)
+        return result
     except Exception as e:
         logger.error(f"Error listing connections: {str(e)}")
         return {
@@ -65,15 +155,22 @@ async def get_connection_details(nifi_client: NiFiAPIClient, connection_id: str)
     Returns:
         Dictionary with detailed connection information
     """
+    cache_key = (nifi_client.base_url, connection_id)
+    cached = CONNECTION_DETAILS_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        response = nifi_client.get(f"/connections/{connection_id}")
+        # Fetch the connection and its status concurrently
+        response, status_response = await asyncio.gather(
+            nifi_client.get(PATH_CONN(cid=connection_id)),
+            nifi_client.get(PATH_CONN_STATUS(cid=connection_id))
+        )
+        remember_revision(nifi_client, connection_id, response)
         component = response.get("component", {})
-        
-        # Get status information
-        status_response = nifi_client.get(f"/connections/{connection_id}/status")
         status = status_response.get("connectionStatus", {})
         
-        return {
+        result = {
             "status": "success",
             "id": connection_id,
             "name": component.get("name"),
@@ -110,6 +207,8 @@ async def get_connection_details(nifi_client: NiFiAPIClient, connection_id: str)
                 "output_count": status.get("aggregateSnapshot", {}).get("output", "0")
             }
         }
+        CONNECTION_DETAILS_CACHE.put(cache_key, result)
+        return result
     except Exception as e:
         logger.error(f"Error getting connection details: {str(e)}")
         return {
@@ -159,7 +258,9 @@ async def create_connection(nifi_client: NiFiAPIClient, pg_id: str, source_id: s
             request_body["component"]["name"] = name
         
         # Make the API call
-        response = nifi_client.post(f"/process-groups/{pg_id}/connections", request_body)
+        response = await nifi_client.post(PATH_PG_CONNECTIONS(pg_id=pg_id), request_body)
+        invalidate_connection_cache(nifi_client)
+        remember_revision(nifi_client, response.get("id"), response)
         
         return {
             "status": "success",
@@ -199,11 +300,8 @@ async def update_connection(nifi_client: NiFiAPIClient, connection_id: str,
         Dictionary with update status
     """
     try:
-        # Get current connection info
-        current_info = nifi_client.get(f"/connections/{connection_id}")
-        component = current_info.get("component", {}).copy()
-        
-        # Update with new values if provided
+        # NiFi accepts partial component updates, so only send the fields being changed
+        component = {"id": connection_id}
         if selected_relationships is not None:
             component["selectedRelationships"] = selected_relationships
         
@@ -222,14 +320,13 @@ async def update_connection(nifi_client: NiFiAPIClient, connection_id: str,
         if load_balance_strategy is not None:
             component["loadBalanceStrategy"] = load_balance_strategy
         
-        # Prepare the request body
-        request_body = {
-            "component": component,
-            "revision": current_info.get("revision")
-        }
-        
-        # Make the API call
-        response = nifi_client.put(f"/connections/{connection_id}", request_body)
+        # Make the API call with the current revision
+        revision, cached = await get_revision(nifi_client, PATH_CONN(cid=connection_id), connection_id)
+        response = await send_with_revision(
+            nifi_client, PATH_CONN(cid=connection_id), connection_id, revision, cached,
+            lambda revision: nifi_client.put(PATH_CONN(cid=connection_id), {"component": component, "revision": revision})
+        )
+        invalidate_connection_cache(nifi_client, connection_id)
         
         return {
             "status": "success",
@@ -255,12 +352,13 @@ async def delete_connection(nifi_client: NiFiAPIClient, connection_id: str) -> D
         Dictionary with deletion status
     """
     try:
-        # Get current connection info to get the current revision
-        current_info = nifi_client.get(f"/connections/{connection_id}")
-        revision = current_info.get("revision", {})
+        # Get the current revision (unless cached) and queue status concurrently
+        (revision, cached), status = await asyncio.gather(
+            get_revision(nifi_client, PATH_CONN(cid=connection_id), connection_id),
+            nifi_client.get(PATH_CONN_STATUS(cid=connection_id))
+        )
         
         # Check if there are queued FlowFiles - can't delete a connection with queued data
-        status = nifi_client.get(f"/connections/{connection_id}/status")
         if status.get("connectionStatus", {}).get("aggregateSnapshot", {}).get("flowFilesCount", 0) > 0:
             return {
                 "status": "error",
@@ -268,7 +366,12 @@ async def delete_connection(nifi_client: NiFiAPIClient, connection_id: str) -> D
             }
         
         # Make the API call with the correct revision
-        nifi_client.delete(f"/connections/{connection_id}?version={revision.get('version', 0)}")
+        await send_with_revision(
+            nifi_client, PATH_CONN(cid=connection_id), connection_id, revision, cached,
+            lambda revision: nifi_client.delete(PATH_CONN_VERSION(cid=connection_id, version=revision.get('version', 0)))
+        )
+        invalidate_connection_cache(nifi_client, connection_id)
+        forget_revision(nifi_client, connection_id)
         
         return {
             "status": "success",
@@ -292,18 +395,13 @@ async def empty_connection_queue(nifi_client: NiFiAPIClient, connection_id: str)
         Dictionary with operation status
     """
     try:
-        # Get current connection info to get the current revision
-        current_info = nifi_client.get(f"/connections/{connection_id}")
-        revision = current_info.get("revision", {})
-        
-        # Prepare the request body
-        request_body = {
-            "id": connection_id,
-            "revision": revision
-        }
-        
-        # Make the API call
-        nifi_client.post(f"/connections/{connection_id}/drop-requests", request_body)
+        # Make the API call with the current revision
+        revision, cached = await get_revision(nifi_client, PATH_CONN(cid=connection_id), connection_id)
+        await send_with_revision(
+            nifi_client, PATH_CONN(cid=connection_id), connection_id, revision, cached,
+            lambda revision: nifi_client.post(PATH_CONN_DROP(cid=connection_id), {"id": connection_id, "revision": revision})
+        )
+        invalidate_connection_cache(nifi_client, connection_id)
         
         return {
             "status": "success",
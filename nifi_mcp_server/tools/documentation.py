@@ -1,9 +1,186 @@
-from typing import Dict, Any, List, Optional
-from ..nifi_api import NiFiAPIClient
+import asyncio
+import os
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Dict, Any, List, Optional, Tuple, Awaitable, Callable
+from ..nifi_api import NiFiAPIClient, is_transient_error
+from ..cache import TTLCache
 from loguru import logger
 
+try:
+    from diskcache import Cache as DiskCache
+except ImportError:
+    DiskCache = None
+
 # Documentation Tools
 
+# The type catalogs only change when bundles are installed, so NiFi's responses
+# are kept for a few minutes, keyed on (NiFi URL, path)
+DOCS_CACHE = TTLCache(maxsize=64, ttl=300.0)
+
+# Optional on-disk layer below DOCS_CACHE that survives restarts and is shared between
+# worker processes; enabled by pointing NIFI_MCP_DOCS_CACHE_DIR at a directory
+DOCS_DISK_TTL = 600.0
+DOCS_CACHE_DIR = os.path.expanduser(os.environ.get("NIFI_MCP_DOCS_CACHE_DIR", ""))
+DOCS_DISK_CACHE = None
+if DOCS_CACHE_DIR:
+    if DiskCache is None:
+        logger.warning("NIFI_MCP_DOCS_CACHE_DIR is set but diskcache is not installed; docs are cached in memory only")
+    else:
+        DOCS_DISK_CACHE = DiskCache(DOCS_CACHE_DIR)
+
+# Retries for documentation fetches that miss every cache layer
+FETCH_ATTEMPTS = 3
+FETCH_BACKOFF = 0.3
+
+async def _fetch_with_retry(fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """Run a NiFi fetch, retrying transient errors (see is_transient_error) with backoff."""
+    for attempt in range(1, FETCH_ATTEMPTS + 1):
+        try:
+            return await fetch()
+        except Exception as e:
+            if not is_transient_error(e) or attempt == FETCH_ATTEMPTS:
+                raise
+            logger.debug("Documentation fetch failed (attempt {}), retrying: {}", attempt, e)
+            await asyncio.sleep(FETCH_BACKOFF * 2 ** (attempt - 1))
+
+async def _get_docs(key: Tuple[str, ...], fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """Get a documentation value from memory, then disk, then NiFi.
+    
+    Args:
+        key: Cache key, starting with the NiFi URL so clusters never share entries
+        fetch: Coroutine function producing the value on a cache miss
+        
+    Returns:
+        The cached or freshly fetched value
+    """
+    value = DOCS_CACHE.get(key)
+    if value is not None:
+        return value
+    
+    if DOCS_DISK_CACHE is not None:
+        value = await asyncio.to_thread(DOCS_DISK_CACHE.get, key)
+    if value is None:
+        value = await _fetch_with_retry(fetch)
+        if DOCS_DISK_CACHE is not None:
+            await asyncio.to_thread(DOCS_DISK_CACHE.set, key, value, expire=DOCS_DISK_TTL)
+    
+    DOCS_CACHE.put(key, value)
+    return value
+
+async def _cached_get(nifi_client: NiFiAPIClient, path: str) -> Any:
+    """GET a documentation endpoint, serving repeat calls from the docs cache."""
+    return await _get_docs((nifi_client.base_url, path), lambda: nifi_client.get(path))
+
+# display_name is always set by _project_type, so the sort key can index directly
+_display_name = itemgetter("display_name")
+
+def _project_type(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Project a NiFi type entry down to the fields the listing tools return."""
+    get = entry.get
+    return {
+        "type": get("type"),
+        "bundle": get("bundle", {}),
+        "display_name": get("typeDescription", ""),
+        "tags": get("tags", []),
+        "restricted": get("restricted", False)
+    }
+
+async def _get_type_catalog(nifi_client: NiFiAPIClient, path: str,
+                            field: str) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+    """Get a projected type catalog together with its lowercased tag -> entries index.
+    
+    The catalog is projected down to the listed fields, sorted by display name and
+    indexed once per fetch, and only that is cached: the full NiFi entries (with their property descriptors)
+    are dropped right away, and tag filtering is a dict lookup rather than a scan.
+    
+    Args:
+        nifi_client: NiFi API client instance
+        path: Type listing endpoint (e.g., /flow/processor-types)
+        field: Response field holding the type entries
+        
+    Returns:
+        Tuple of the projected entries and the tag index; both are shared and
+        must not be mutated
+    """
+    async def fetch():
+        response = await nifi_client.get(path)
+        types = [_project_type(entry) for entry in response.get(field, [])]
+        # Sort by display name once; the tag index lists inherit this order
+        types.sort(key=_display_name)
+        tag_index: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in types:
+            for tag in {t.lower() for t in entry["tags"]}:
+                tag_index.setdefault(tag, []).append(entry)
+        return types, tag_index
+    
+    return await _get_docs((nifi_client.base_url, path, "catalog"), fetch)
+
+async def invalidate_docs_cache(nifi_client: NiFiAPIClient = None) -> Dict[str, Any]:
+    """Clear cached documentation, e.g. after installing new NiFi bundles.
+    
+    Args:
+        nifi_client: NiFi API client instance (unused; the whole cache is cleared)
+        
+    Returns:
+        Dictionary with the number of cleared entries
+    """
+    cleared = len(DOCS_CACHE)
+    DOCS_CACHE.clear()
+    if DOCS_DISK_CACHE is not None:
+        cleared += await asyncio.to_thread(DOCS_DISK_CACHE.clear)
+    return {
+        "status": "success",
+        "cleared": cleared
+    }
+
+@dataclass(frozen=True)
+class PropertyDoc:
+    """Documentation for one property of a NiFi component type.
+    
+    Slotted to keep large property listings compact; orjson serializes it
+    like the equivalent dict.
+    """
+    __slots__ = ("name", "display_name", "description", "default_value", "required",
+                 "sensitive", "dynamic", "supported_values", "expression_language_scope")
+    
+    name: Optional[str]
+    display_name: Optional[str]
+    description: Optional[str]
+    default_value: Optional[str]
+    required: bool
+    sensitive: bool
+    dynamic: bool
+    supported_values: List[Any]
+    expression_language_scope: Optional[str]
+
+def _extract_properties(descriptors: Dict[str, Dict[str, Any]]) -> List[PropertyDoc]:
+    """Extract property documentation from a type's property descriptors.
+    
+    Args:
+        descriptors: The type's propertyDescriptors mapping
+        
+    Returns:
+        List of property documentation records
+    """
+    properties = []
+    append = properties.append
+    for prop in descriptors.values():
+        get = prop.get
+        allowable = get("allowableValues") or {}
+        append(PropertyDoc(
+            get("name"),
+            get("displayName"),
+            get("description"),
+            get("defaultValue"),
+            get("required", False),
+            get("sensitive", False),
+            get("dynamic", False),
+            allowable.get("allowableValues", []),
+            get("expressionLanguageScope")
+        ))
+    return properties
+
 async def get_processor_docs(nifi_client: NiFiAPIClient, processor_type: str) -> Dict[str, Any]:
     """Get documentation for a specific processor type.
     
@@ -15,7 +192,7 @@ async def get_processor_docs(nifi_client: NiFiAPIClient, processor_type: str) ->
         Dictionary with processor documentation
     """
     try:
-        response = nifi_client.get(f"/flow/processor-types/{processor_type}")
+        response = await _cached_get(nifi_client, f"/flow/processor-types/{processor_type}")
         processor_types = response.get("processorTypes", [])
         
         if not processor_types:
@@ -31,20 +208,7 @@ async def get_processor_docs(nifi_client: NiFiAPIClient, processor_type: str) ->
             "description": processor_info.get("description", ""),
             "tags": processor_info.get("tags", []),
             "input_requirement": processor_info.get("inputRequirement", ""),
-            "properties": [
-                {
-                    "name": prop.get("name"),
-                    "display_name": prop.get("displayName"),
-                    "description": prop.get("description"),
-                    "default_value": prop.get("defaultValue"),
-                    "required": prop.get("required", False),
-                    "sensitive": prop.get("sensitive", False),
-                    "dynamic": prop.get("dynamic", False),
-                    "supported_values": prop.get("allowableValues", {}).get("allowableValues", []),
-                    "expression_language_scope": prop.get("expressionLanguageScope")
-                }
-                for prop in processor_info.get("propertyDescriptors", {}).values()
-            ],
+            "properties": _extract_properties(processor_info.get("propertyDescriptors", {})),
             "relationships": [
                 {
                     "name": rel.get("name"),
@@ -82,31 +246,14 @@ async def list_processor_types(nifi_client: NiFiAPIClient, tag: Optional[str] =
         Dictionary with processor type information
     """
     try:
-        response = nifi_client.get("/flow/processor-types")
-        processor_types = response.get("processorTypes", [])
+        processor_types, tag_index = await _get_type_catalog(nifi_client, "/flow/processor-types", "processorTypes")
         
         # Filter by tag if specified
         if tag:
-            tag_lower = tag.lower()
-            processor_types = [
-                pt for pt in processor_types
-                if any(t.lower() == tag_lower for t in pt.get("tags", []))
-            ]
+            processor_types = tag_index.get(tag.lower(), [])
         
-        # Extract relevant information
-        result = [
-            {
-                "type": pt.get("type"),
-                "bundle": pt.get("bundle", {}),
-                "display_name": pt.get("typeDescription", ""),
-                "tags": pt.get("tags", []),
-                "restricted": pt.get("restricted", False)
-            }
-            for pt in processor_types
-        ]
-        
-        # Sort by display name
-        result.sort(key=lambda x: x.get("display_name", ""))
+        # Already sorted by display name; copy the shared catalog list
+        result = list(processor_types)
         
         return {
             "status": "success",
@@ -132,7 +279,7 @@ async def get_controller_service_docs(nifi_client: NiFiAPIClient, service_type:
         Dictionary with controller service documentation
     """
     try:
-        response = nifi_client.get(f"/flow/controller-service-types/{service_type}")
+        response = await _cached_get(nifi_client, f"/flow/controller-service-types/{service_type}")
         service_types = response.get("controllerServiceTypes", [])
         
         if not service_types:
@@ -147,20 +294,7 @@ async def get_controller_service_docs(nifi_client: NiFiAPIClient, service_type:
         docs = {
             "description": service_info.get("description", ""),
             "tags": service_info.get("tags", []),
-            "properties": [
-                {
-                    "name": prop.get("name"),
-                    "display_name": prop.get("displayName"),
-                    "description": prop.get("description"),
-                    "default_value": prop.get("defaultValue"),
-                    "required": prop.get("required", False),
-                    "sensitive": prop.get("sensitive", False),
-                    "dynamic": prop.get("dynamic", False),
-                    "supported_values": prop.get("allowableValues", {}).get("allowableValues", []),
-                    "expression_language_scope": prop.get("expressionLanguageScope")
-                }
-                for prop in service_info.get("propertyDescriptors", {}).values()
-            ],
+            "properties": _extract_properties(service_info.get("propertyDescriptors", {})),
             "provided_api": service_info.get("providedApiImplementations", []),
             "dynamic_properties_allowed": service_info.get("supportsDynamicProperties", False),
             "restricted": service_info.get("restricted", False),
@@ -190,31 +324,14 @@ async def list_controller_service_types(nifi_client: NiFiAPIClient, tag: Optiona
         Dictionary with controller service type information
     """
     try:
-        response = nifi_client.get("/flow/controller-service-types")
-        service_types = response.get("controllerServiceTypes", [])
+        service_types, tag_index = await _get_type_catalog(nifi_client, "/flow/controller-service-types", "controllerServiceTypes")
         
         # Filter by tag if specified
         if tag:
-            tag_lower = tag.lower()
-            service_types = [
-                st for st in service_types
-                if any(t.lower() == tag_lower for t in st.get("tags", []))
-            ]
-        
-        # Extract relevant information
-        result = [
-            {
-                "type": st.get("type"),
-                "bundle": st.get("bundle", {}),
-                "display_name": st.get("typeDescription", ""),
-                "tags": st.get("tags", []),
-                "restricted": st.get("restricted", False)
-            }
-            for st in service_types
-        ]
+            service_types = tag_index.get(tag.lower(), [])
         
-        # Sort by display name
-        result.sort(key=lambda x: x.get("display_name", ""))
+        # Already sorted by display name; copy the shared catalog list
+        result = list(service_types)
         
         return {
             "status": "success",
@@ -240,7 +357,7 @@ async def get_reporting_task_docs(nifi_client: NiFiAPIClient, task_type: str) ->
         Dictionary with reporting task documentation
     """
     try:
-        response = nifi_client.get(f"/flow/reporting-task-types/{task_type}")
+        response = await _cached_get(nifi_client, f"/flow/reporting-task-types/{task_type}")
         task_types = response.get("reportingTaskTypes", [])
         
         if not task_types:
@@ -255,20 +372,7 @@ async def get_reporting_task_docs(nifi_client: NiFiAPIClient, task_type: str) ->
         docs = {
             "description": task_info.get("description", ""),
             "tags": task_info.get("tags", []),
-            "properties": [
-                {
-                    "name": prop.get("name"),
-                    "display_name": prop.get("displayName"),
-                    "description": prop.get("description"),
-                    "default_value": prop.get("defaultValue"),
-                    "required": prop.get("required", False),
-                    "sensitive": prop.get("sensitive", False),
-                    "dynamic": prop.get("dynamic", False),
-                    "supported_values": prop.get("allowableValues", {}).get("allowableValues", []),
-                    "expression_language_scope": prop.get("expressionLanguageScope")
-                }
-                for prop in task_info.get("propertyDescriptors", {}).values()
-            ],
+            "properties": _extract_properties(task_info.get("propertyDescriptors", {})),
             "dynamic_properties_allowed": task_info.get("supportsDynamicProperties", False),
             "restricted": task_info.get("restricted", False),
             "bundle": task_info.get("bundle", {})
@@ -286,6 +390,112 @@ async def get_reporting_task_docs(nifi_client: NiFiAPIClient, task_type: str) ->
             "message": str(e)
         }
 
+# Expression Language functions data is not available through the API,
+# so a static list of common functions is provided, grouped by category once at import
+_EL_FUNCTIONS = (
+    {
+        "name": "equals",
+        "description": "Checks if one value equals another",
+        "example": "${filename:equals('test.txt')}",
+        "category": "Boolean Logic"
+    },
+    {
+        "name": "toUpper",
+        "description": "Converts the subject value to uppercase",
+        "example": "${filename:toUpper()}",
+        "category": "String Manipulation"
+    },
+    {
+        "name": "toLower",
+        "description": "Converts the subject value to lowercase",
+        "example": "${filename:toLower()}",
+        "category": "String Manipulation"
+    },
+    {
+        "name": "substring",
+        "description": "Returns a substring from the subject",
+        "example": "${filename:substring(0, 5)}",
+        "category": "String Manipulation"
+    },
+    {
+        "name": "contains",
+        "description": "Checks if the subject contains the given value",
+        "example": "${filename:contains('txt')}",
+        "category": "Searching"
+    },
+    {
+        "name": "startsWith",
+        "description": "Checks if the subject starts with the given value",
+        "example": "${filename:startsWith('test')}",
+        "category": "Searching"
+    },
+    {
+        "name": "endsWith",
+        "description": "Checks if the subject ends with the given value",
+        "example": "${filename:endsWith('.txt')}",
+        "category": "Searching"
+    },
+    {
+        "name": "plus",
+        "description": "Adds numbers or concatenates strings",
+        "example": "${literal(1):plus(2)}",
+        "category": "Mathematical Operations"
+    },
+    {
+        "name": "minus",
+        "description": "Subtracts one number from another",
+        "example": "${literal(5):minus(2)}",
+        "category": "Mathematical Operations"
+    },
+    {
+        "name": "multiply",
+        "description": "Multiplies two numbers",
+        "example": "${literal(2):multiply(3)}",
+        "category": "Mathematical Operations"
+    },
+    {
+        "name": "divide",
+        "description": "Divides one number by another",
+        "example": "${literal(10):divide(2)}",
+        "category": "Mathematical Operations"
+    },
+    {
+        "name": "format",
+        "description": "Formats dates",
+        "example": "${now():format('yyyy-MM-dd')}",
+        "category": "Date Manipulation"
+    },
+    {
+        "name": "now",
+        "description": "Returns the current date/time",
+        "example": "${now()}",
+        "category": "Date Manipulation"
+    },
+    {
+        "name": "trim",
+        "description": "Removes leading and trailing whitespace",
+        "example": "${filename:trim()}",
+        "category": "String Manipulation"
+    },
+    {
+        "name": "replace",
+        "description": "Replaces all occurrences of a string with another",
+        "example": "${filename:replace('.txt', '.csv')}",
+        "category": "String Manipulation"
+    },
+    {
+        "name": "UUID",
+        "description": "Generates a random UUID",
+        "example": "${UUID()}",
+        "category": "Subjectless Functions"
+    }
+)
+
+_EL_CATEGORIES: Dict[str, List[Dict[str, str]]] = {}
+for _func in _EL_FUNCTIONS:
+    _EL_CATEGORIES.setdefault(_func["category"], []).append(_func)
+del _func
+
 async def list_expression_language_functions(nifi_client: NiFiAPIClient) -> Dict[str, Any]:
     """List available Expression Language functions.
     
@@ -295,128 +505,12 @@ async def list_expression_language_functions(nifi_client: NiFiAPIClient) -> Dict
     Returns:
         Dictionary with Expression Language function information
     """
-    try:
-        # Expression Language functions data is not available through the API
-        # We provide a static list of common functions
-        
-        el_functions = [
-            {
-                "name": "equals",
-                "description": "Checks if one value equals another",
-                "example": "${filename:equals('test.txt')}",
-                "category": "Boolean Logic"
-            },
-            {
-                "name": "toUpper",
-                "description": "Converts the subject value to uppercase",
-                "example": "${filename:toUpper()}",
-                "category": "String Manipulation"
-            },
-            {
-                "name": "toLower",
-                "description": "Converts the subject value to lowercase",
-                "example": "${filename:toLower()}",
-                "category": "String Manipulation"
-            },
-            {
-                "name": "substring",
-                "description": "Returns a substring from the subject",
-                "example": "${filename:substring(0, 5)}",
-                "category": "String Manipulation"
-            },
-            {
-                "name": "contains",
-                "description": "Checks if the subject contains the given value",
-                "example": "${filename:contains('txt')}",
-                "category": "Searching"
-            },
-            {
-                "name": "startsWith",
-                "description": "Checks if the subject starts with the given value",
-                "example": "${filename:startsWith('test')}",
-                "category": "Searching"
-            },
-            {
-                "name": "endsWith",
-                "description": "Checks if the subject ends with the given value",
-                "example": "${filename:endsWith('.txt')}",
-                "category": "Searching"
-            },
-            {
-                "name": "plus",
-                "description": "Adds numbers or concatenates strings",
-                "example": "${literal(1):plus(2)}",
-                "category": "Mathematical Operations"
-            },
-            {
-                "name": "minus",
-                "description": "Subtracts one number from another",
-                "example": "${literal(5):minus(2)}",
-                "category": "Mathematical Operations"
-            },
-            {
-                "name": "multiply",
-                "description": "Multiplies two numbers",
-                "example": "${literal(2):multiply(3)}",
-                "category": "Mathematical Operations"
-            },
-            {
-                "name": "divide",
-                "description": "Divides one number by another",
-                "example": "${literal(10):divide(2)}",
-                "category": "Mathematical Operations"
-            },
-            {
-                "name": "format",
-                "description": "Formats dates",
-                "example": "${now():format('yyyy-MM-dd')}",
-                "category": "Date Manipulation"
-            },
-            {
-                "name": "now",
-                "description": "Returns the current date/time",
-                "example": "${now()}",
-                "category": "Date Manipulation"
-            },
-            {
-                "name": "trim",
-                "description": "Removes leading and trailing whitespace",
-                "example": "${filename:trim()}",
-                "category": "String Manipulation"
-            },
-            {
-                "name": "replace",
-                "description": "Replaces all occurrences of a string with another",
-                "example": "${filename:replace('.txt', '.csv')}",
-                "category": "String Manipulation"
-            },
-            {
-                "name": "UUID",
-                "description": "Generates a random UUID",
-                "example": "${UUID()}",
-                "category": "Subjectless Functions"
-            }
-        ]
-        
-        # Group by category
-        categories = {}
-        for func in el_functions:
-            category = func["category"]
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(func)
-        
-        return {
-            "status": "success",
-            "categories": categories,
-            "functions": el_functions,
-            "count": len(el_functions)
-        }
-    except Exception as e:
-        logger.error(f"Error listing Expression Language functions: {str(e)}")
-        return {
-            "status": "error",
-            "message": str(e)
-        }
+    # The function data is static and shared between calls; callers must not mutate it
+    return {
+        "status": "success",
+        "categories": _EL_CATEGORIES,
+        "functions": _EL_FUNCTIONS,
+        "count": len(_EL_FUNCTIONS)
+    }
 
 # Additional documentation operations can be added here
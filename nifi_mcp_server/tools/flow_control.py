@@ -1,9 +1,119 @@
-from typing import Dict, Any, List, Optional
-from ..nifi_api import NiFiAPIClient
+import asyncio
+import httpx
+from typing import Dict, Any, List, Optional, Tuple
+from ..nifi_api import NiFiAPIClient, is_transient_error
+from ..cache import TTLCache
+from ..revisions import STALE_REVISION_STATUSES, forget_revision, forget_revisions, get_revision, send_with_revision
+from .process_groups import summarize_component_counts
+from .processors import invalidate_processor_cache
 from loguru import logger
 
 # Flow Control Tools
 
+# Endpoint prefix for each component type whose run state is set through its own entity
+_ENDPOINT_MAP = {
+    "processor": "/processors/",
+    "input-port": "/input-ports/",
+    "output-port": "/output-ports/"
+}
+
+# Last successful cluster info (per NiFi URL) and component statuses (per NiFi URL, type
+# and ID), served marked as stale for up to 10 minutes when NiFi fails transiently
+STALE_TTL = 600.0
+_last_cluster = TTLCache(maxsize=64, ttl=STALE_TTL)
+_last_component_status = TTLCache(maxsize=1024, ttl=STALE_TTL)
+
+# Cap on concurrent status requests one batch may have in flight against NiFi
+STATUS_CONCURRENCY = 16
+
+async def _put_state(nifi_client: NiFiAPIClient, endpoint: str, component_id: str, state: str) -> Dict[str, Any]:
+    """Set a component's run state with its current revision.
+    
+    Args:
+        nifi_client: NiFi API client instance
+        endpoint: Endpoint prefix for the component type (e.g., /processors/)
+        component_id: ID of the component
+        state: Target state (RUNNING or STOPPED)
+        
+    Returns:
+        The updated component entity
+    """
+    path = f"{endpoint}{component_id}"
+    revision, cached = await get_revision(nifi_client, path, component_id)
+    response = await send_with_revision(
+        nifi_client, path, component_id, revision, cached,
+        lambda revision: nifi_client.put(path, {"component": {"id": component_id, "state": state}, "revision": revision})
+    )
+    invalidate_processor_cache()
+    return response
+
+async def bulk_set_state(nifi_client: NiFiAPIClient, pg_id: str, components: List[Tuple[str, str]],
+                         state: str) -> Dict[str, Any]:
+    """Set the run state of several components of a process group in one request.
+    
+    Args:
+        nifi_client: NiFi API client instance
+        pg_id: ID of the process group containing the components
+        components: (component ID, component type) pairs; types as in _ENDPOINT_MAP
+        state: Target state (RUNNING or STOPPED)
+        
+    Returns:
+        Dictionary with operation status
+    """
+    try:
+        unsupported = [component_type for _, component_type in components if component_type not in _ENDPOINT_MAP]
+        if unsupported:
+            return {
+                "status": "error",
+                "message": f"Unsupported component type: {unsupported[0]}"
+            }
+        
+        async def send() -> None:
+            # Resolve the revisions not already cached concurrently
+            revisions = await asyncio.gather(*(
+                get_revision(nifi_client, f"{_ENDPOINT_MAP[component_type]}{component_id}", component_id)
+                for component_id, component_type in components
+            ))
+            await nifi_client.put(f"/flow/process-groups/{pg_id}", {
+                "id": pg_id,
+                "state": state,
+                "components": {
+                    component_id: revision
+                    for (component_id, _), (revision, _) in zip(components, revisions)
+                },
+                "disconnectedNodeAcknowledged": False
+            })
+        
+        try:
+            await send()
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in STALE_REVISION_STATUSES:
+                raise
+            # Some cached revision was out of date; refetch them all and retry once
+            logger.debug("Bulk state change in {} sent a stale revision, refetching", pg_id)
+            for component_id, _ in components:
+                forget_revision(nifi_client, component_id)
+            await send()
+        
+        # The bulk response does not carry the new revisions, so forget the old ones
+        for component_id, _ in components:
+            forget_revision(nifi_client, component_id)
+        invalidate_processor_cache()
+        
+        return {
+            "status": "success",
+            "id": pg_id,
+            "state": state,
+            "count": len(components),
+            "message": f"Set {len(components)} components to {state}"
+        }
+    except Exception as e:
+        logger.error(f"Error setting component states: {str(e)}")
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
 async def get_flow_status(nifi_client: NiFiAPIClient, pg_id: str = "root") -> Dict[str, Any]:
     """Get the status of a flow or process group.
     
@@ -15,35 +125,39 @@ async def get_flow_status(nifi_client: NiFiAPIClient, pg_id: str = "root") -> Di
         Dictionary with flow status information
     """
     try:
-        # Get the process group status
-        response = nifi_client.get(f"/flow/process-groups/{pg_id}/status")
+        # Get the process group status and cluster information concurrently;
+        # only a failed status request is an error
+        response, cluster_response = await asyncio.gather(
+            nifi_client.get(f"/flow/process-groups/{pg_id}/status"),
+            nifi_client.get("/controller/cluster"),
+            return_exceptions=True
+        )
+        if isinstance(response, BaseException):
+            raise response
         status = response.get("processGroupStatus", {})
         
-        # Get cluster information
-        cluster_info = {}
-        try:
-            cluster_response = nifi_client.get("/controller/cluster")
+        if isinstance(cluster_response, BaseException):
+            last_cluster = _last_cluster.get(nifi_client.base_url)
+            if last_cluster is not None and is_transient_error(cluster_response):
+                # A cluster we saw recently is briefly unreachable; report it rather than "standalone"
+                logger.debug("Could not get cluster info, serving last known: {}", cluster_response)
+                cluster_info = {**last_cluster, "stale": True}
+            else:
+                logger.debug("Could not get cluster info, might be standalone: {}", cluster_response)
+                cluster_info = {"connected_nodes": 1, "cluster_coordinator": True}
+        else:
             cluster_info = {
                 "connected_nodes": len(cluster_response.get("cluster", {}).get("nodes", [])),
                 "cluster_coordinator": any(node.get("roles", {}).get("isCoordinator", False) 
                                         for node in cluster_response.get("cluster", {}).get("nodes", []))
             }
-        except Exception as e:
-            logger.debug(f"Could not get cluster info, might be standalone: {str(e)}")
-            cluster_info = {"connected_nodes": 1, "cluster_coordinator": True}
+            _last_cluster.put(nifi_client.base_url, cluster_info)
         
         return {
             "status": "success",
             "id": pg_id,
             "name": status.get("name"),
-            "component_status": {
-                "running": status.get("runningCount", 0),
-                "stopped": status.get("stoppedCount", 0),
-                "invalid": status.get("invalidCount", 0),
-                "disabled": status.get("disabledCount", 0),
-                "total": (status.get("runningCount", 0) + status.get("stoppedCount", 0) + 
-                         status.get("invalidCount", 0) + status.get("disabledCount", 0))
-            },
+            "component_status": summarize_component_counts(status),
             "flow_status": {
                 "bytes_in": status.get("bytesIn", 0),
                 "bytes_out": status.get("bytesOut", 0),
@@ -62,99 +176,82 @@ async def get_flow_status(nifi_client: NiFiAPIClient, pg_id: str = "root") -> Di
             "message": str(e)
         }
 
-async def start_component(nifi_client: NiFiAPIClient, component_id: str, component_type: str) -> Dict[str, Any]:
-    """Start a component (processor, process group, port, etc.).
+# Target state -> (verb, past tense) used in results and log messages
+_STATE_WORDS = {
+    "RUNNING": ("starting", "started"),
+    "STOPPED": ("stopping", "stopped")
+}
+
+async def _set_state(nifi_client: NiFiAPIClient, component_id: str, component_type: str, state: str) -> Dict[str, Any]:
+    """Set the run state of a component (processor, process group, port, etc.).
     
     Args:
         nifi_client: NiFi API client instance
-        component_id: ID of the component to start
+        component_id: ID of the component
         component_type: Type of component (processor, process-group, port, etc.)
+        state: Target state (RUNNING or STOPPED)
         
     Returns:
         Dictionary with operation status
     """
+    verb, past = _STATE_WORDS[state]
     try:
-        # Route based on component type
-        if component_type == "processor":
-            # Get current processor info
-            current_info = nifi_client.get(f"/processors/{component_id}")
-            
-            # Prepare the request body
-            request_body = {
-                "component": {
-                    "id": component_id,
-                    "state": "RUNNING"
-                },
-                "revision": current_info.get("revision")
-            }
-            
-            # Make the API call
-            response = nifi_client.put(f"/processors/{component_id}", request_body)
+        endpoint = _ENDPOINT_MAP.get(component_type)
+        if endpoint is not None:
+            response = await _put_state(nifi_client, endpoint, component_id, state)
+            component = response.get("component", {})
             
             return {
                 "status": "success",
                 "id": component_id,
-                "type": "processor",
-                "name": response.get("component", {}).get("name"),
-                "state": response.get("component", {}).get("state"),
-                "message": "Processor started successfully"
+                "type": component_type,
+                "name": component.get("name"),
+                "state": component.get("state"),
+                "message": f"{component_type.replace('-', ' ').title()} {past} successfully"
             }
-            
-        elif component_type == "process-group":
-            # Start all components in process group
-            nifi_client.put(f"/flow/process-groups/{component_id}", {
+        
+        if component_type == "process-group":
+            # Set the state of all components in the process group
+            await nifi_client.put(f"/flow/process-groups/{component_id}", {
                 "id": component_id,
-                "state": "RUNNING",
+                "state": state,
                 "disconnectedNodeAcknowledged": False
             })
+            # Every component below the group got a new revision, at any depth
+            forget_revisions(nifi_client)
+            invalidate_processor_cache()
             
             return {
                 "status": "success",
                 "id": component_id,
                 "type": "process-group",
-                "message": "Process group started successfully"
-            }
-            
-        elif component_type in ["input-port", "output-port"]:
-            # Determine the endpoint
-            endpoint = "/input-ports/" if component_type == "input-port" else "/output-ports/"
-            
-            # Get current port info
-            current_info = nifi_client.get(f"{endpoint}{component_id}")
-            
-            # Prepare the request body
-            request_body = {
-                "component": {
-                    "id": component_id,
-                    "state": "RUNNING"
-                },
-                "revision": current_info.get("revision")
-            }
-            
-            # Make the API call
-            response = nifi_client.put(f"{endpoint}{component_id}", request_body)
-            
-            return {
-                "status": "success",
-                "id": component_id,
-                "type": component_type,
-                "name": response.get("component", {}).get("name"),
-                "state": response.get("component", {}).get("state"),
-                "message": f"{component_type.replace('-', ' ').title()} started successfully"
-            }
-            
-        else:
-            return {
-                "status": "error",
-                "message": f"Unsupported component type: {component_type}"
+                "message": f"Process group {past} successfully"
             }
+        
+        return {
+            "status": "error",
+            "message": f"Unsupported component type: {component_type}"
+        }
     except Exception as e:
-        logger.error(f"Error starting component: {str(e)}")
+        logger.error(f"Error {verb} component: {str(e)}")
         return {
             "status": "error",
             "message": str(e)
         }
 
+async def start_component(nifi_client: NiFiAPIClient, component_id: str, component_type: str) -> Dict[str, Any]:
+    """Start a component (processor, process group, port, etc.).
+    
+    Args:
+        nifi_client: NiFi API client instance
+        component_id: ID of the component to start
+        component_type: Type of component (processor, process-group, port, etc.)
+        
+    Returns:
+        Dictionary with operation status
+    """
+    return await _set_state(nifi_client, component_id, component_type, "RUNNING")
+
 async def stop_component(nifi_client: NiFiAPIClient, component_id: str, component_type: str) -> Dict[str, Any]:
     """Stop a component (processor, process group, port, etc.).
     
@@ -166,86 +263,80 @@ async def stop_component(nifi_client: NiFiAPIClient, component_id: str, componen
     Returns:
         Dictionary with operation status
     """
-    try:
-        # Route based on component type
-        if component_type == "processor":
-            # Get current processor info
-            current_info = nifi_client.get(f"/processors/{component_id}")
-            
-            # Prepare the request body
-            request_body = {
-                "component": {
-                    "id": component_id,
-                    "state": "STOPPED"
-                },
-                "revision": current_info.get("revision")
-            }
-            
-            # Make the API call
-            response = nifi_client.put(f"/processors/{component_id}", request_body)
-            
-            return {
-                "status": "success",
-                "id": component_id,
-                "type": "processor",
-                "name": response.get("component", {}).get("name"),
-                "state": response.get("component", {}).get("state"),
-                "message": "Processor stopped successfully"
-            }
-            
-        elif component_type == "process-group":
-            # Stop all components in process group
-            nifi_client.put(f"/flow/process-groups/{component_id}", {
-                "id": component_id,
-                "state": "STOPPED",
-                "disconnectedNodeAcknowledged": False
-            })
-            
-            return {
-                "status": "success",
-                "id": component_id,
-                "type": "process-group",
-                "message": "Process group stopped successfully"
-            }
-            
-        elif component_type in ["input-port", "output-port"]:
-            # Determine the endpoint
-            endpoint = "/input-ports/" if component_type == "input-port" else "/output-ports/"
-            
-            # Get current port info
-            current_info = nifi_client.get(f"{endpoint}{component_id}")
-            
-            # Prepare the request body
-            request_body = {
-                "component": {
-                    "id": component_id,
-                    "state": "STOPPED"
-                },
-                "revision": current_info.get("revision")
+    return await _set_state(nifi_client, component_id, component_type, "STOPPED")
+
+async def _fetch_component_status(nifi_client: NiFiAPIClient, component_id: str, component_type: str) -> Dict[str, Any]:
+    """Fetch and summarize a component's status, raising on NiFi errors."""
+    # Route based on component type
+    if component_type == "processor":
+        response = await nifi_client.get(f"/processors/{component_id}/status")
+        status = response.get("processorStatus", {})
+        
+        return {
+            "status": "success",
+            "id": component_id,
+            "type": "processor",
+            "name": status.get("name"),
+            "state": status.get("runStatus"),
+            "stats": {
+                "input": status.get("input", "0"),
+                "output": status.get("output", "0"),
+                "bytes_read": status.get("bytesRead", 0),
+                "bytes_written": status.get("bytesWritten", 0),
+                "tasks_completed": status.get("taskCount", 0),
+                "tasks_duration_ns": status.get("taskNanoseconds", 0),
+                "active_threads": status.get("activeThreadCount", 0)
             }
-            
-            # Make the API call
-            response = nifi_client.put(f"{endpoint}{component_id}", request_body)
-            
-            return {
-                "status": "success",
-                "id": component_id,
-                "type": component_type,
-                "name": response.get("component", {}).get("name"),
-                "state": response.get("component", {}).get("state"),
-                "message": f"{component_type.replace('-', ' ').title()} stopped successfully"
+        }
+        
+    elif component_type == "process-group":
+        response = await nifi_client.get(f"/flow/process-groups/{component_id}/status")
+        status = response.get("processGroupStatus", {})
+        
+        return {
+            "status": "success",
+            "id": component_id,
+            "type": "process-group",
+            "name": status.get("name"),
+            "components": {
+                "running": status.get("runningCount", 0),
+                "stopped": status.get("stoppedCount", 0),
+                "invalid": status.get("invalidCount", 0),
+                "disabled": status.get("disabledCount", 0)
+            },
+            "stats": {
+                "input": status.get("input", "0"),
+                "output": status.get("output", "0"),
+                "queued": status.get("queued", "0"),
+                "flowfiles_queued": status.get("flowFilesQueued", 0),
+                "bytes_in": status.get("bytesIn", 0),
+                "bytes_out": status.get("bytesOut", 0),
+                "bytes_queued": status.get("bytesQueued", 0)
             }
-            
-        else:
-            return {
-                "status": "error",
-                "message": f"Unsupported component type: {component_type}"
+        }
+        
+    elif component_type == "connection":
+        response = await nifi_client.get(f"/connections/{component_id}/status")
+        status = response.get("connectionStatus", {})
+        
+        return {
+            "status": "success",
+            "id": component_id,
+            "type": "connection",
+            "name": status.get("name"),
+            "queue_stats": {
+                "flowfiles_count": status.get("flowFilesCount", 0),
+                "bytes_queued": status.get("bytesQueued", 0),
+                "queued": status.get("queued", "0"),
+                "input": status.get("input", "0"),
+                "output": status.get("output", "0")
             }
-    except Exception as e:
-        logger.error(f"Error stopping component: {str(e)}")
+        }
+        
+    else:
         return {
             "status": "error",
-            "message": str(e)
+            "message": f"Unsupported component type for status: {component_type}"
         }
 
 async def get_component_status(nifi_client: NiFiAPIClient, component_id: str, component_type: str) -> Dict[str, Any]:
@@ -259,81 +350,40 @@ async def get_component_status(nifi_client: NiFiAPIClient, component_id: str, co
     Returns:
         Dictionary with component status
     """
+    key = (nifi_client.base_url, component_type, component_id)
     try:
-        # Route based on component type
-        if component_type == "processor":
-            response = nifi_client.get(f"/processors/{component_id}/status")
-            status = response.get("processorStatus", {})
-            
-            return {
-                "status": "success",
-                "id": component_id,
-                "type": "processor",
-                "name": status.get("name"),
-                "state": status.get("runStatus"),
-                "stats": {
-                    "input": status.get("input", "0"),
-                    "output": status.get("output", "0"),
-                    "bytes_read": status.get("bytesRead", 0),
-                    "bytes_written": status.get("bytesWritten", 0),
-                    "tasks_completed": status.get("taskCount", 0),
-                    "tasks_duration_ns": status.get("taskNanoseconds", 0),
-                    "active_threads": status.get("activeThreadCount", 0)
-                }
-            }
-            
-        elif component_type == "process-group":
-            response = nifi_client.get(f"/flow/process-groups/{component_id}/status")
-            status = response.get("processGroupStatus", {})
-            
-            return {
-                "status": "success",
-                "id": component_id,
-                "type": "process-group",
-                "name": status.get("name"),
-                "components": {
-                    "running": status.get("runningCount", 0),
-                    "stopped": status.get("stoppedCount", 0),
-                    "invalid": status.get("invalidCount", 0),
-                    "disabled": status.get("disabledCount", 0)
-                },
-                "stats": {
-                    "input": status.get("input", "0"),
-                    "output": status.get("output", "0"),
-                    "queued": status.get("queued", "0"),
-                    "flowfiles_queued": status.get("flowFilesQueued", 0),
-                    "bytes_in": status.get("bytesIn", 0),
-                    "bytes_out": status.get("bytesOut", 0),
-                    "bytes_queued": status.get("bytesQueued", 0)
-                }
-            }
-            
-        elif component_type == "connection":
-            response = nifi_client.get(f"/connections/{component_id}/status")
-            status = response.get("connectionStatus", {})
-            
-            return {
-                "status": "success",
-                "id": component_id,
-                "type": "connection",
-                "name": status.get("name"),
-                "queue_stats": {
-                    "flowfiles_count": status.get("flowFilesCount", 0),
-                    "bytes_queued": status.get("bytesQueued", 0),
-                    "queued": status.get("queued", "0"),
-                    "input": status.get("input", "0"),
-                    "output": status.get("output", "0")
-                }
-            }
-            
-        else:
-            return {
-                "status": "error",
-                "message": f"Unsupported component type for status: {component_type}"
-            }
+        result = await _fetch_component_status(nifi_client, component_id, component_type)
+        if result["status"] == "success":
+            _last_component_status.put(key, result)
+        return result
     except Exception as e:
+        last_status = _last_component_status.get(key)
+        if last_status is not None and is_transient_error(e):
+            logger.debug("NiFi unavailable, serving last known status for {}: {}", component_id, e)
+            return {**last_status, "stale": True}
         logger.error(f"Error getting component status: {str(e)}")
         return {
             "status": "error",
             "message": str(e)
-        } 
\ No newline at end of file
+        }
+
+async def get_component_statuses(nifi_client: NiFiAPIClient,
+                                 components: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Get the status of several components concurrently.
+    
+    Args:
+        nifi_client: NiFi API client instance
+        components: (component ID, component type) pairs
+        
+    Returns:
+        List of component status dictionaries, in the order of components
+    """
+    semaphore = asyncio.Semaphore(STATUS_CONCURRENCY)
+    
+    async def fetch_one(component_id: str, component_type: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await get_component_status(nifi_client, component_id, component_type)
+    
+    return await asyncio.gather(*(
+        fetch_one(component_id, component_type) for component_id, component_type in components
+    ))
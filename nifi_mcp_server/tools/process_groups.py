@@ -1,23 +1,89 @@
-from typing import Dict, Any, List, Optional
+import asyncio
+from typing import Dict, Any, List, Optional, Set
 from ..nifi_api import NiFiAPIClient
+from ..cache import TTLCache
+from ..revisions import forget_revision, get_revision, remember_revision, send_with_revision
+from .search import invalidate_flow_cache
 from loguru import logger
 
 # Process Group Tools
 
-async def list_process_groups(nifi_client: NiFiAPIClient, parent_id: str = "root") -> Dict[str, Any]:
+# Shared read-only default for missing nested objects
+_EMPTY: Dict[str, Any] = {}
+
+# Summary name -> NiFi process group status field for component counts
+_COUNT_KEYS = (
+    ("running", "runningCount"),
+    ("stopped", "stoppedCount"),
+    ("invalid", "invalidCount"),
+    ("disabled", "disabledCount"),
+)
+
+def summarize_component_counts(status: Dict[str, Any]) -> Dict[str, int]:
+    """Summarize the component counts of a process group status, with their total."""
+    counts = {name: status.get(key, 0) for name, key in _COUNT_KEYS}
+    counts["total"] = sum(counts.values())
+    return counts
+
+# Short-lived caches of process group listings, keyed on (NiFi URL, parent ID), and
+# details, keyed on (NiFi URL, ID). Process group changes here and state changes in
+# the flow control tools invalidate them; connection changes invalidate the details.
+PROCESS_GROUP_CACHE = TTLCache(maxsize=256, ttl=3.0)
+PROCESS_GROUP_DETAILS_CACHE = TTLCache(maxsize=256, ttl=5.0)
+
+# Background detail prefetches, referenced until done so they are not garbage collected
+_prefetch_tasks: Set[asyncio.Task] = set()
+
+# Bumped on every details invalidation, so fetches started before it are not cached
+_details_generation = 0
+
+def invalidate_process_group_details() -> None:
+    """Drop all cached process group details, including those still being fetched."""
+    global _details_generation
+    _details_generation += 1
+    PROCESS_GROUP_DETAILS_CACHE.clear()
+
+def invalidate_process_group_cache() -> None:
+    """Drop all cached process group listings, details and flows."""
+    # All carry component counts, so a change can show up in any of them
+    PROCESS_GROUP_CACHE.clear()
+    invalidate_process_group_details()
+    invalidate_flow_cache()
+
+def _prefetch_details(nifi_client: NiFiAPIClient, pg_ids: List[str]) -> None:
+    """Warm the details cache for process groups in the background."""
+    task = asyncio.ensure_future(asyncio.gather(*(
+        get_process_group_details(nifi_client, pg_id) for pg_id in pg_ids
+    )))
+    _prefetch_tasks.add(task)
+    task.add_done_callback(_prefetch_tasks.discard)
+
+async def list_process_groups(nifi_client: NiFiAPIClient, parent_id: str = "root",
+                              prefetch_details: bool = False) -> Dict[str, Any]:
     """List process groups in a parent group.
     
     Args:
         nifi_client: NiFi API client instance
         parent_id: ID of the parent process group (default: root)
+        prefetch_details: Whether to fetch each child's details in the background,
+            so follow-up get_process_group_details calls are served from cache
         
     Returns:
         Dictionary with process group information
     """
+    cache_key = (nifi_client.base_url, parent_id)
+    cached = PROCESS_GROUP_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        response = nifi_client.get(f"/flow/process-groups/{parent_id}")
+        response = await nifi_client.get(f"/flow/process-groups/{parent_id}")
         process_groups = response.get("processGroupFlow", {}).get("flow", {}).get("processGroups", [])
         
+        # Flow listings carry each process group's revision, which primes the revision cache
+        for pg in process_groups:
+            remember_revision(nifi_client, pg.get("id"), pg)
+        
         # Extract relevant information
         result = [
             {
@@ -32,14 +98,18 @@ async def list_process_groups(nifi_client: NiFiAPIClient, parent_id: str = "root
             for pg in process_groups
         ]
         
-        return {
+        result = {
             "status": "success",
             "parent_id": parent_id,
             "process_groups": result,
             "count": len(result)
         }
+        PROCESS_GROUP_CACHE.put(cache_key, result)
+        if prefetch_details and process_groups:
+            _prefetch_details(nifi_client, [pg["id"] for pg in result["process_groups"]])
+        return result
     except Exception as e:
-        logger.error(f"Error listing process groups: {str(e)}")
+        logger.opt(exception=True).error("Error listing process groups: {}", e)
         return {
             "status": "error",
             "message": str(e)
@@ -55,24 +125,32 @@ async def get_process_group_details(nifi_client: NiFiAPIClient, pg_id: str) -> D
     Returns:
         Dictionary with detailed process group information
     """
+    cache_key = (nifi_client.base_url, pg_id)
+    cached = PROCESS_GROUP_DETAILS_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    generation = _details_generation
     try:
-        response = nifi_client.get(f"/flow/process-groups/{pg_id}")
-        pg_flow = response.get("processGroupFlow", {})
-        
-        # Get status information
-        status_response = nifi_client.get(f"/flow/process-groups/{pg_id}/status")
-        status = status_response.get("processGroupStatus", {})
+        # Fetch the flow and its status concurrently
+        response, status_response = await asyncio.gather(
+            nifi_client.get(f"/flow/process-groups/{pg_id}"),
+            nifi_client.get(f"/flow/process-groups/{pg_id}/status")
+        )
+        pg_flow = response.get("processGroupFlow") or _EMPTY
+        flow = pg_flow.get("flow") or _EMPTY
+        status = status_response.get("processGroupStatus") or _EMPTY
         
-        return {
+        result = {
             "status": "success",
             "id": pg_id,
-            "name": pg_flow.get("breadcrumb", {}).get("breadcrumb", {}).get("name"),
-            "comments": pg_flow.get("component", {}).get("comments"),
-            "processors": len(pg_flow.get("flow", {}).get("processors", [])),
-            "connections": len(pg_flow.get("flow", {}).get("connections", [])),
-            "input_ports": len(pg_flow.get("flow", {}).get("inputPorts", [])),
-            "output_ports": len(pg_flow.get("flow", {}).get("outputPorts", [])),
-            "process_groups": len(pg_flow.get("flow", {}).get("processGroups", [])),
+            "name": ((pg_flow.get("breadcrumb") or _EMPTY).get("breadcrumb") or _EMPTY).get("name"),
+            "comments": (pg_flow.get("component") or _EMPTY).get("comments"),
+            "processors": len(flow.get("processors", ())),
+            "connections": len(flow.get("connections", ())),
+            "input_ports": len(flow.get("inputPorts", ())),
+            "output_ports": len(flow.get("outputPorts", ())),
+            "process_groups": len(flow.get("processGroups", ())),
             "running_components": status.get("runningCount", 0),
             "stopped_components": status.get("stoppedCount", 0),
             "invalid_components": status.get("invalidCount", 0),
@@ -82,8 +160,11 @@ async def get_process_group_details(nifi_client: NiFiAPIClient, pg_id: str) -> D
             "queued_bytes": status.get("bytesQueued", 0),
             "queued_count": status.get("flowFilesQueued", 0),
         }
+        if generation == _details_generation:
+            PROCESS_GROUP_DETAILS_CACHE.put(cache_key, result)
+        return result
     except Exception as e:
-        logger.error(f"Error getting process group details: {str(e)}")
+        logger.opt(exception=True).error("Error getting process group details: {}", e)
         return {
             "status": "error",
             "message": str(e)
@@ -123,7 +204,9 @@ async def create_process_group(nifi_client: NiFiAPIClient, parent_id: str, name:
             request_body["component"]["comments"] = comments
         
         # Make the API call
-        response = nifi_client.post(f"/process-groups/{parent_id}/process-groups", request_body)
+        response = await nifi_client.post(f"/process-groups/{parent_id}/process-groups", request_body)
+        remember_revision(nifi_client, response.get("id"), response)
+        invalidate_process_group_cache()
         
         return {
             "status": "success",
@@ -132,7 +215,7 @@ async def create_process_group(nifi_client: NiFiAPIClient, parent_id: str, name:
             "uri": response.get("uri")
         }
     except Exception as e:
-        logger.error(f"Error creating process group: {str(e)}")
+        logger.opt(exception=True).error("Error creating process group: {}", e)
         return {
             "status": "error",
             "message": str(e)
@@ -149,19 +232,22 @@ async def delete_process_group(nifi_client: NiFiAPIClient, pg_id: str) -> Dict[s
         Dictionary with deletion status
     """
     try:
-        # Get the current revision
-        pg_info = nifi_client.get(f"/process-groups/{pg_id}")
-        revision = pg_info.get("revision", {})
-        
-        # Make the API call with the correct revision
-        nifi_client.delete(f"/process-groups/{pg_id}?version={revision.get('version', 0)}")
+        # Make the API call with the current revision
+        path = f"/process-groups/{pg_id}"
+        revision, cached = await get_revision(nifi_client, path, pg_id)
+        await send_with_revision(
+            nifi_client, path, pg_id, revision, cached,
+            lambda revision: nifi_client.delete(f"{path}?version={revision.get('version', 0)}")
+        )
+        forget_revision(nifi_client, pg_id)
+        invalidate_process_group_cache()
         
         return {
             "status": "success",
             "message": f"Process group {pg_id} deleted successfully"
         }
     except Exception as e:
-        logger.error(f"Error deleting process group: {str(e)}")
+        logger.opt(exception=True).error("Error deleting process group: {}", e)
         return {
             "status": "error",
             "message": str(e)
@@ -181,25 +267,22 @@ async def update_process_group(nifi_client: NiFiAPIClient, pg_id: str, name: str
         Dictionary with update status
     """
     try:
-        # Get current process group info
-        current_info = nifi_client.get(f"/process-groups/{pg_id}")
-        component = current_info.get("component", {}).copy()
-        
-        # Update with new values if provided
+        # NiFi accepts partial component updates, so only send the fields being changed
+        component = {"id": pg_id}
         if name is not None:
             component["name"] = name
         
         if comments is not None:
             component["comments"] = comments
         
-        # Prepare the request body
-        request_body = {
-            "component": component,
-            "revision": current_info.get("revision")
-        }
-        
-        # Make the API call
-        response = nifi_client.put(f"/process-groups/{pg_id}", request_body)
+        # Make the API call with the current revision
+        path = f"/process-groups/{pg_id}"
+        revision, cached = await get_revision(nifi_client, path, pg_id)
+        response = await send_with_revision(
+            nifi_client, path, pg_id, revision, cached,
+            lambda revision: nifi_client.put(path, {"component": component, "revision": revision})
+        )
+        invalidate_process_group_cache()
         
         return {
             "status": "success",
@@ -208,7 +291,7 @@ async def update_process_group(nifi_client: NiFiAPIClient, pg_id: str, name: str
             "message": "Process group updated successfully"
         }
     except Exception as e:
-        logger.error(f"Error updating process group: {str(e)}")
+        logger.opt(exception=True).error("Error updating process group: {}", e)
         return {
             "status": "error",
             "message": str(e)
@@ -233,7 +316,7 @@ async def get_process_group_status(nifi_client: NiFiAPIClient, pg_id: str,
             url += "?recursive=true"
         
         # Get the status information
-        response = nifi_client.get(url)
+        response = await nifi_client.get(url)
         status = response.get("processGroupStatus", {})
         
         # Extract and format the relevant information
@@ -249,14 +332,7 @@ async def get_process_group_status(nifi_client: NiFiAPIClient, pg_id: str,
                 "queued_count": status.get("flowFilesQueued", 0),
                 "queued_bytes": status.get("bytesQueued", 0),
             },
-            "component_counts": {
-                "running": status.get("runningCount", 0),
-                "stopped": status.get("stoppedCount", 0),
-                "invalid": status.get("invalidCount", 0),
-                "disabled": status.get("disabledCount", 0),
-                "total": status.get("runningCount", 0) + status.get("stoppedCount", 0) + 
-                        status.get("invalidCount", 0) + status.get("disabledCount", 0)
-            }
+            "component_counts": summarize_component_counts(status)
         }
         
         return {
@@ -265,7 +341,7 @@ async def get_process_group_status(nifi_client: NiFiAPIClient, pg_id: str,
             "process_group_status": result
         }
     except Exception as e:
-        logger.error(f"Error getting process group status: {str(e)}")
+        logger.opt(exception=True).error("Error getting process group status: {}", e)
         return {
             "status": "error",
             "message": str(e)
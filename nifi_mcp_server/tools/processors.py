@@ -1,9 +1,46 @@
+import asyncio
 from typing import Dict, Any, List, Optional
 from ..nifi_api import NiFiAPIClient
+from ..cache import TTLCache
+from ..revisions import get_revision, remember_revision, send_with_revision
+from .process_groups import invalidate_process_group_cache
 from loguru import logger
 
 # Processor Tools
 
+# Bundle of each processor type, keyed on (NiFi URL, type); the type catalog only
+# changes when extensions are installed, so creating processors can skip the lookup
+BUNDLE_CACHE = TTLCache(maxsize=256, ttl=300.0)
+
+# Short-lived cache of processor listings, keyed on (NiFi URL, process group ID).
+# Processor changes here and in the flow control tools invalidate it.
+PROCESSOR_CACHE = TTLCache(maxsize=256, ttl=3.0)
+
+# Shared read-only default for missing nested objects
+_EMPTY: Dict[str, Any] = {}
+
+def invalidate_processor_cache() -> None:
+    """Drop all cached processor listings, and the process group listings counting them."""
+    PROCESSOR_CACHE.clear()
+    invalidate_process_group_cache()
+
+def _extract_processor(p: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the relevant fields of a processor entity from a process group flow."""
+    # Each nested object is looked up once, falling back to a shared empty dict
+    get = p.get
+    position = get("position") or _EMPTY
+    return {
+        "id": get("id"),
+        "name": get("name"),
+        "type": (get("component") or _EMPTY).get("type"),
+        "state": (get("status") or _EMPTY).get("runStatus"),
+        "input": get("inputRequirement"),
+        "position": {
+            "x": position.get("x"),
+            "y": position.get("y")
+        }
+    }
+
 async def list_processors(nifi_client: NiFiAPIClient, pg_id: str = "root") -> Dict[str, Any]:
     """List processors in a process group.
     
@@ -14,34 +51,32 @@ async def list_processors(nifi_client: NiFiAPIClient, pg_id: str = "root") -> Di
     Returns:
         Dictionary with processor information
     """
+    cache_key = (nifi_client.base_url, pg_id)
+    cached = PROCESSOR_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        response = nifi_client.get(f"/flow/process-groups/{pg_id}")
+        response = await nifi_client.get(f"/flow/process-groups/{pg_id}")
         processors = response.get("processGroupFlow", {}).get("flow", {}).get("processors", [])
         
+        # Flow listings carry each processor's revision, which primes the revision cache
+        for p in processors:
+            remember_revision(nifi_client, p.get("id"), p)
+        
         # Extract relevant information
-        result = [
-            {
-                "id": p.get("id"),
-                "name": p.get("name"),
-                "type": p.get("component", {}).get("type"),
-                "state": p.get("status", {}).get("runStatus"),
-                "input": p.get("inputRequirement"),
-                "position": {
-                    "x": p.get("position", {}).get("x"),
-                    "y": p.get("position", {}).get("y")
-                }
-            }
-            for p in processors
-        ]
+        result = [_extract_processor(p) for p in processors]
         
-        return {
+        result = {
             "status": "success",
             "parent_id": pg_id,
             "processors": result,
             "count": len(result)
         }
+        PROCESSOR_CACHE.put(cache_key, result)
+        return result
     except Exception as e:
-        logger.error(f"Error listing processors: {str(e)}")
+        logger.opt(exception=True).error("Error listing processors: {}", e)
         return {
             "status": "error",
             "message": str(e)
@@ -58,11 +93,13 @@ async def get_processor_details(nifi_client: NiFiAPIClient, processor_id: str) -
         Dictionary with detailed processor information
     """
     try:
-        response = nifi_client.get(f"/processors/{processor_id}")
+        # Fetch the processor and its status concurrently
+        response, status_response = await asyncio.gather(
+            nifi_client.get(f"/processors/{processor_id}"),
+            nifi_client.get(f"/processors/{processor_id}/status")
+        )
+        remember_revision(nifi_client, processor_id, response)
         component = response.get("component", {})
-        
-        # Get status information
-        status_response = nifi_client.get(f"/processors/{processor_id}/status")
         status = status_response.get("processorStatus", {})
         
         return {
@@ -93,12 +130,31 @@ async def get_processor_details(nifi_client: NiFiAPIClient, processor_id: str) -
             }
         }
     except Exception as e:
-        logger.error(f"Error getting processor details: {str(e)}")
+        logger.opt(exception=True).error("Error getting processor details: {}", e)
         return {
             "status": "error",
             "message": str(e)
         }
 
+def _match_processors(processors: List[Dict[str, Any]], search_term_lower: str,
+                      pg_id: str) -> List[Dict[str, Any]]:
+    """Extract the processor entities whose name or type contains a lowercased search term."""
+    matches = []
+    for processor in processors:
+        component = processor.get("component") or _EMPTY
+        name = processor.get("name", "").lower()
+        processor_type = component.get("type", "").lower()
+        
+        if search_term_lower in name or search_term_lower in processor_type:
+            matches.append({
+                "id": processor.get("id"),
+                "name": processor.get("name"),
+                "type": component.get("type"),
+                "pg_id": component.get("parentGroupId") or pg_id,
+                "state": (processor.get("status") or _EMPTY).get("runStatus")
+            })
+    return matches
+
 async def search_processors(nifi_client: NiFiAPIClient, search_term: str, 
                           pg_id: str = "root", recursive: bool = True) -> Dict[str, Any]:
     """Search for processors by name or type.
@@ -113,37 +169,17 @@ async def search_processors(nifi_client: NiFiAPIClient, search_term: str,
         Dictionary with matching processors
     """
     try:
-        search_term_lower = search_term.lower()
-        matches = []
-        
-        # Get processors in the current process group
-        response = nifi_client.get(f"/flow/process-groups/{pg_id}")
-        processors = response.get("processGroupFlow", {}).get("flow", {}).get("processors", [])
-        
-        # Find matches in the current group
-        for processor in processors:
-            name = processor.get("name", "").lower()
-            processor_type = processor.get("component", {}).get("type", "").lower()
-            
-            if search_term_lower in name or search_term_lower in processor_type:
-                matches.append({
-                    "id": processor.get("id"),
-                    "name": processor.get("name"),
-                    "type": processor.get("component", {}).get("type"),
-                    "pg_id": pg_id,
-                    "state": processor.get("status", {}).get("runStatus")
-                })
-        
-        # If recursive, also search in child process groups
         if recursive:
-            child_groups = response.get("processGroupFlow", {}).get("flow", {}).get("processGroups", [])
-            
-            for child_group in child_groups:
-                child_id = child_group.get("id")
-                child_results = await search_processors(nifi_client, search_term, child_id, recursive)
-                
-                if child_results.get("status") == "success":
-                    matches.extend(child_results.get("processors", []))
+            # NiFi lists the processors of the whole subtree in one request, so the
+            # search costs a single round trip however deep the process groups nest
+            response = await nifi_client.get(f"/process-groups/{pg_id}/processors",
+                                             params={"includeDescendantGroups": "true"})
+            processors = response.get("processors", [])
+        else:
+            response = await nifi_client.get(f"/flow/process-groups/{pg_id}")
+            processors = response.get("processGroupFlow", {}).get("flow", {}).get("processors", [])
+        
+        matches = _match_processors(processors, search_term.lower(), pg_id)
         
         return {
             "status": "success",
@@ -152,12 +188,23 @@ async def search_processors(nifi_client: NiFiAPIClient, search_term: str,
             "count": len(matches)
         }
     except Exception as e:
-        logger.error(f"Error searching processors: {str(e)}")
+        logger.opt(exception=True).error("Error searching processors: {}", e)
         return {
             "status": "error",
             "message": str(e)
         }
 
+async def _get_bundle(nifi_client: NiFiAPIClient, processor_type: str) -> Optional[Dict[str, Any]]:
+    """Get the bundle of a processor type, from the cache when known."""
+    bundle_key = (nifi_client.base_url, processor_type)
+    bundle_info = BUNDLE_CACHE.get(bundle_key)
+    if bundle_info is None:
+        bundles_response = await nifi_client.get(f"/flow/processor-types/{processor_type}")
+        bundle_info = bundles_response.get("processorTypes", [])[0].get("bundle")
+        if bundle_info:
+            BUNDLE_CACHE.put(bundle_key, bundle_info)
+    return bundle_info
+
 async def create_processor(nifi_client: NiFiAPIClient, pg_id: str, name: str, processor_type: str,
                          position_x: int = 0, position_y: int = 0) -> Dict[str, Any]:
     """Create a new processor.
@@ -175,8 +222,7 @@ async def create_processor(nifi_client: NiFiAPIClient, pg_id: str, name: str, pr
     """
     try:
         # First, get the bundle info for the processor type
-        bundles_response = nifi_client.get(f"/flow/processor-types/{processor_type}")
-        bundle_info = bundles_response.get("processorTypes", [])[0].get("bundle")
+        bundle_info = await _get_bundle(nifi_client, processor_type)
         
         if not bundle_info:
             return {
@@ -201,7 +247,9 @@ async def create_processor(nifi_client: NiFiAPIClient, pg_id: str, name: str, pr
         }
         
         # Make the API call
-        response = nifi_client.post(f"/process-groups/{pg_id}/processors", request_body)
+        response = await nifi_client.post(f"/process-groups/{pg_id}/processors", request_body)
+        remember_revision(nifi_client, response.get("id"), response)
+        invalidate_processor_cache()
         
         return {
             "status": "success",
@@ -211,7 +259,49 @@ async def create_processor(nifi_client: NiFiAPIClient, pg_id: str, name: str, pr
             "uri": response.get("uri")
         }
     except Exception as e:
-        logger.error(f"Error creating processor: {str(e)}")
+        logger.opt(exception=True).error("Error creating processor: {}", e)
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+async def create_processors(nifi_client: NiFiAPIClient, pg_id: str,
+                            specs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Create several processors in a process group concurrently.
+    
+    Args:
+        nifi_client: NiFi API client instance
+        pg_id: Process group ID to add the processors to
+        specs: Processor specs, each with name and processor_type and optionally
+            position_x and position_y, as for create_processor
+        
+    Returns:
+        Dictionary with the create_processor result of each spec, in order
+    """
+    try:
+        # Resolve each distinct type's bundle once up front, so the creates below
+        # all find it cached; failures surface again in the affected creates
+        processor_types = list(dict.fromkeys(spec["processor_type"] for spec in specs))
+        await asyncio.gather(*(
+            _get_bundle(nifi_client, processor_type) for processor_type in processor_types
+        ), return_exceptions=True)
+        
+        results = await asyncio.gather(*(
+            create_processor(nifi_client, pg_id, spec["name"], spec["processor_type"],
+                             spec.get("position_x", 0), spec.get("position_y", 0))
+            for spec in specs
+        ))
+        failed = sum(1 for result in results if result["status"] != "success")
+        
+        return {
+            "status": "error" if failed else "success",
+            "parent_id": pg_id,
+            "processors": results,
+            "count": len(results) - failed,
+            "message": f"Created {len(results) - failed} of {len(results)} processors"
+        }
+    except Exception as e:
+        logger.opt(exception=True).error("Error creating processors: {}", e)
         return {
             "status": "error",
             "message": str(e)
@@ -229,20 +319,20 @@ async def update_processor_state(nifi_client: NiFiAPIClient, processor_id: str,
         Dictionary with update status
     """
     try:
-        # Get current processor info to get the current revision
-        current_info = nifi_client.get(f"/processors/{processor_id}")
-        
-        # Prepare the request body
-        request_body = {
-            "component": {
-                "id": processor_id,
-                "state": state
-            },
-            "revision": current_info.get("revision")
-        }
-        
-        # Make the API call
-        response = nifi_client.put(f"/processors/{processor_id}", request_body)
+        # Make the API call with the current revision
+        path = f"/processors/{processor_id}"
+        revision, cached = await get_revision(nifi_client, path, processor_id)
+        response = await send_with_revision(
+            nifi_client, path, processor_id, revision, cached,
+            lambda revision: nifi_client.put(path, {
+                "component": {
+                    "id": processor_id,
+                    "state": state
+                },
+                "revision": revision
+            })
+        )
+        invalidate_processor_cache()
         
         return {
             "status": "success",
@@ -252,7 +342,7 @@ async def update_processor_state(nifi_client: NiFiAPIClient, processor_id: str,
             "message": f"Processor state updated to {state}"
         }
     except Exception as e:
-        logger.error(f"Error updating processor state: {str(e)}")
+        logger.opt(exception=True).error("Error updating processor state: {}", e)
         return {
             "status": "error",
             "message": str(e)
@@ -271,24 +361,20 @@ async def update_processor_properties(nifi_client: NiFiAPIClient, processor_id:
         Dictionary with update status
     """
     try:
-        # Get current processor info to get the current revision and properties
-        current_info = nifi_client.get(f"/processors/{processor_id}")
-        current_properties = current_info.get("component", {}).get("properties", {})
-        
-        # Merge the new properties with existing ones
-        updated_properties = {**current_properties, **properties}
-        
-        # Prepare the request body
-        request_body = {
-            "component": {
-                "id": processor_id,
-                "properties": updated_properties
-            },
-            "revision": current_info.get("revision")
-        }
-        
-        # Make the API call
-        response = nifi_client.put(f"/processors/{processor_id}", request_body)
+        # NiFi merges the given properties into the existing ones, so only send the changes
+        path = f"/processors/{processor_id}"
+        revision, cached = await get_revision(nifi_client, path, processor_id)
+        response = await send_with_revision(
+            nifi_client, path, processor_id, revision, cached,
+            lambda revision: nifi_client.put(path, {
+                "component": {
+                    "id": processor_id,
+                    "properties": properties
+                },
+                "revision": revision
+            })
+        )
+        invalidate_processor_cache()
         
         return {
             "status": "success",
@@ -298,7 +384,7 @@ async def update_processor_properties(nifi_client: NiFiAPIClient, processor_id:
             "message": "Processor properties updated successfully"
         }
     except Exception as e:
-        logger.error(f"Error updating processor properties: {str(e)}")
+        logger.opt(exception=True).error("Error updating processor properties: {}", e)
         return {
             "status": "error",
             "message": str(e)
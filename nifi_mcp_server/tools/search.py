@@ -1,13 +1,319 @@
-from typing import Dict, Any, List, Optional, Union
-from ..nifi_api import NiFiAPIClient
+import asyncio
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, FrozenSet, List, Optional, Tuple, TypeVar, Union
+from ..nifi_api import NiFiAPIClient, is_transient_error
+from ..cache import TTLCache
 from loguru import logger
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 # Search Tools
 
+# Workers, and so concurrent process group fetches, of one recursive search
+SEARCH_CONCURRENCY = 16
+
+T = TypeVar("T")
+
+# Component types search_components can match, and searches by default
+_SEARCHABLE_TYPES = ("processors", "process_groups", "connections", "input_ports", "output_ports")
+
+# Short-lived cache of indexed process group flows, keyed on (NiFi URL, process group
+# ID), so back-to-back searches over the same tree share one fetch per group. Component
+# changes in the other tools invalidate it.
+FLOW_CACHE = TTLCache(maxsize=512, ttl=5.0)
+FLOW_PARAMS = {"uiOnly": "true"}
+
+# Last known index of each process group, kept for longer and served when NiFi is
+# briefly unreachable (connection errors, 502/503/504) instead of failing the search
+FLOW_STALE_TTL = 600.0
+_last_flow_index = TTLCache(maxsize=1024, ttl=FLOW_STALE_TTL)
+
+# Shared read-only default for missing nested objects
+_EMPTY: Dict[str, Any] = {}
+
+class FlowIndex:
+    """The searchable parts of a process group flow, with their fields lowercased.
+    
+    Built once per fetch, so searching the same flow again with another term only
+    runs substring checks. Each entry pairs the lowercased fields with a summary of
+    the component in the shape searches return; the full entities, with their config
+    and status sub-objects, are not kept. Summaries are shared, so callers must not
+    modify them.
+    """
+    
+    __slots__ = ("processors", "process_groups", "connections", "input_ports", "output_ports")
+    
+    def __init__(self, pg_id: str, flow: Dict[str, Any]):
+        # (name, type, summary)
+        self.processors = []
+        for p in flow.get("processors", ()):
+            processor_type = (p.get("component") or _EMPTY).get("type")
+            self.processors.append(((p.get("name") or "").lower(), (processor_type or "").lower(), {
+                "id": p.get("id"),
+                "name": p.get("name"),
+                "type": processor_type,
+                "pg_id": pg_id,
+                "state": (p.get("status") or _EMPTY).get("runStatus")
+            }))
+        
+        # (name, comments, summary)
+        self.process_groups = [
+            ((pg.get("name") or "").lower(), (pg.get("comments") or "").lower(), {
+                "id": pg.get("id"),
+                "name": pg.get("name"),
+                "comments": pg.get("comments"),
+                "parent_id": pg_id
+            })
+            for pg in flow.get("processGroups", ())
+        ]
+        
+        # (name, "source group.source", "destination group.destination", summary)
+        self.connections = []
+        for c in flow.get("connections", ()):
+            source = c.get("sourceConnectable") or _EMPTY
+            destination = c.get("destinationConnectable") or _EMPTY
+            self.connections.append((
+                (c.get("name") or "").lower(),
+                f"{c.get('sourceGroupName') or ''}.{source.get('name') or ''}".lower(),
+                f"{c.get('destinationGroupName') or ''}.{destination.get('name') or ''}".lower(),
+                {
+                    "id": c.get("id"),
+                    "name": c.get("name"),
+                    "source": {
+                        "id": c.get("sourceId"),
+                        "name": source.get("name"),
+                        "type": c.get("sourceType"),
+                        "group_name": c.get("sourceGroupName")
+                    },
+                    "destination": {
+                        "id": c.get("destinationId"),
+                        "name": destination.get("name"),
+                        "type": c.get("destinationType"),
+                        "group_name": c.get("destinationGroupName")
+                    },
+                    "pg_id": pg_id
+                }
+            ))
+        
+        # (name, summary)
+        self.input_ports = [self._index_port(pg_id, port) for port in flow.get("inputPorts", ())]
+        self.output_ports = [self._index_port(pg_id, port) for port in flow.get("outputPorts", ())]
+    
+    @staticmethod
+    def _index_port(pg_id: str, port: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        return (port.get("name") or "").lower(), {
+            "id": port.get("id"),
+            "name": port.get("name"),
+            "state": (port.get("status") or _EMPTY).get("runStatus"),
+            "pg_id": pg_id
+        }
+
+def invalidate_flow_cache() -> None:
+    """Drop all cached process group flows, including the last known ones."""
+    FLOW_CACHE.clear()
+    _last_flow_index.clear()
+
+async def get_flow_index(nifi_client: NiFiAPIClient, pg_id: str,
+                         stale_if_error: bool = True) -> Tuple[FlowIndex, bool]:
+    """Get the indexed flow of a process group, from the cache when fresh.
+    
+    Args:
+        nifi_client: NiFi API client instance
+        pg_id: Process group ID
+        stale_if_error: Whether to fall back to the last known index of the group
+            when NiFi is briefly unreachable
+        
+    Returns:
+        Tuple of the index of the process group flow, which callers must not modify,
+        and whether it is the last known index served because NiFi was unreachable
+    """
+    cache_key = (nifi_client.base_url, pg_id)
+    index = FLOW_CACHE.get(cache_key)
+    if index is None:
+        # Concurrent misses for one group share a single request through the
+        # client's GET coalescing; the parsed response is dropped once indexed.
+        # uiOnly leaves out component details like property descriptors that the
+        # index does not use (NiFi versions without it ignore the parameter).
+        try:
+            response = await nifi_client.get(f"/flow/process-groups/{pg_id}", params=FLOW_PARAMS)
+        except Exception as e:
+            last_index = _last_flow_index.get(cache_key) if stale_if_error else None
+            if last_index is None or not is_transient_error(e):
+                raise
+            logger.debug("NiFi unavailable, searching last known flow of {}: {}", pg_id, e)
+            return last_index, True
+        index = FlowIndex(pg_id, response.get("processGroupFlow", {}).get("flow", {}))
+        FLOW_CACHE.put(cache_key, index)
+        _last_flow_index.put(cache_key, index)
+    return index, False
+
+async def _iter_groups(nifi_client: NiFiAPIClient, pg_id: str, recursive: bool,
+                       visit: Callable[[str, FlowIndex], Awaitable[T]],
+                       enough: Optional[Callable[[T], bool]] = None,
+                       stale_if_error: bool = True) -> AsyncIterator[Tuple[Tuple[int, ...], T, bool]]:
+    """Visit a process group and, if recursive, all its descendants, yielding results as they come.
+    
+    Groups are fetched breadth-first from a work queue by SEARCH_CONCURRENCY workers,
+    which bounds a search's concurrent fetches however deep the canvas is. A subtree
+    whose group fails is logged and skipped; a failure of the starting group is raised.
+    When the iterator is closed early no further groups are fetched, though fetches
+    already in flight still complete.
+    
+    Args:
+        enough: Optional check on each visit result; once it returns True the walk
+            stops as if closed, before the group's children are queued
+        stale_if_error: Whether to search the last known flow of a group while NiFi
+            is briefly unreachable
+    
+    Yields:
+        Each visited group's path of child positions from the starting group, which
+        sorts in depth-first pre-order, its visit result and whether its flow was
+        stale, in the order visited
+    """
+    pending: "asyncio.Queue[Tuple[Tuple[int, ...], str]]" = asyncio.Queue()
+    pending.put_nowait(((), pg_id))
+    # (path, result, stale, error) per visited group, then None once the walk is done
+    visited: "asyncio.Queue[Optional[Tuple[Tuple[int, ...], Any, bool, Optional[Exception]]]]" = asyncio.Queue()
+    stopped = False
+    
+    async def worker() -> None:
+        nonlocal stopped
+        while True:
+            path, group_id = await pending.get()
+            try:
+                if stopped:
+                    continue
+                index, stale = await get_flow_index(nifi_client, group_id, stale_if_error)
+                result = await visit(group_id, index)
+                visited.put_nowait((path, result, stale, None))
+                if enough is not None and enough(result):
+                    stopped = True
+                if recursive and not stopped:
+                    for position, (*_, child_group) in enumerate(index.process_groups):
+                        pending.put_nowait((path + (position,), child_group["id"]))
+            except Exception as e:
+                visited.put_nowait((path, None, False, e))
+            finally:
+                pending.task_done()
+    
+    async def finish() -> None:
+        await pending.join()
+        visited.put_nowait(None)
+    
+    workers = [asyncio.ensure_future(worker()) for _ in range(SEARCH_CONCURRENCY)]
+    finisher = asyncio.ensure_future(finish())
+    try:
+        while True:
+            item = await visited.get()
+            if item is None:
+                break
+            path, result, stale, error = item
+            if error is None:
+                yield path, result, stale
+            elif not path:
+                raise error
+            else:
+                logger.error(f"Error searching process group: {str(error)}")
+    finally:
+        # Let in-flight fetches finish rather than cancel requests other callers may
+        # share through GET coalescing, then stop the idle workers
+        stopped = True
+        await asyncio.gather(finisher, return_exceptions=True)
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+async def _walk_groups(nifi_client: NiFiAPIClient, pg_id: str, recursive: bool,
+                       visit: Callable[[str, FlowIndex], Awaitable[T]],
+                       enough: Optional[Callable[[T], bool]] = None,
+                       stale_if_error: bool = True) -> Tuple[List[T], bool]:
+    """Visit a process group and, if recursive, all its descendants.
+    
+    Args:
+        enough: Optional check on each visit result; once it returns True no further
+            groups are fetched, though fetches already in flight still complete
+        stale_if_error: Whether to search the last known flow of a group while NiFi
+            is briefly unreachable
+    
+    Returns:
+        Tuple of the visit result of every visited group, in depth-first pre-order,
+        and whether any group was searched in its last known flow
+    """
+    walk = _iter_groups(nifi_client, pg_id, recursive, visit, enough, stale_if_error)
+    try:
+        visited = [item async for item in walk]
+    finally:
+        await walk.aclose()
+    
+    visited.sort(key=itemgetter(0))
+    return [result for _, result, _ in visited], any(stale for *_, stale in visited)
+
+@lru_cache(maxsize=64)
+def _term_matcher(terms: FrozenSet[str]) -> Callable[[str], bool]:
+    """Build a check for whether a lowercased field contains any of some lowercased terms.
+    
+    Several terms are matched in one pass over the field with an Aho-Corasick automaton
+    when pyahocorasick is installed; a single term uses plain substring search.
+    """
+    if "" in terms:
+        return lambda field: True
+    if len(terms) == 1:
+        (term,) = terms
+        return lambda field: term in field
+    if ahocorasick is None:
+        return lambda field: any(term in field for term in terms)
+    
+    automaton = ahocorasick.Automaton()
+    for term in terms:
+        automaton.add_word(term, term)
+    automaton.make_automaton()
+    return lambda field: next(automaton.iter(field), None) is not None
+
+def _match_components(index: FlowIndex, matches_term: Callable[[str], bool],
+                      component_types: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Find the components of one indexed process group flow with a field matching the search terms."""
+    matches = {comp_type: [] for comp_type in _SEARCHABLE_TYPES}
+    
+    # Search processors
+    if "processors" in component_types:
+        matches["processors"] = [
+            summary for name, processor_type, summary in index.processors
+            if matches_term(name) or matches_term(processor_type)
+        ]
+    
+    # Search process groups
+    if "process_groups" in component_types:
+        matches["process_groups"] = [
+            summary for name, comments, summary in index.process_groups
+            if matches_term(name) or matches_term(comments)
+        ]
+    
+    # Search connections
+    if "connections" in component_types:
+        matches["connections"] = [
+            summary for name, source_name, dest_name, summary in index.connections
+            if matches_term(name) or matches_term(source_name) or matches_term(dest_name)
+        ]
+    
+    # Search input and output ports
+    for comp_type, ports in (("input_ports", index.input_ports), ("output_ports", index.output_ports)):
+        if comp_type in component_types:
+            matches[comp_type] = [summary for name, summary in ports if matches_term(name)]
+    
+    return matches
+
 async def search_components(nifi_client: NiFiAPIClient, search_term: str, 
                          component_types: List[str] = None, 
                          pg_id: str = "root", 
-                         recursive: bool = True) -> Dict[str, Any]:
+                         recursive: bool = True,
+                         search_terms: Optional[List[str]] = None,
+                         max_matches: Optional[int] = None,
+                         stale_if_error: bool = True) -> Dict[str, Any]:
     """Search for components by name or type.
     
     Args:
@@ -16,16 +322,22 @@ async def search_components(nifi_client: NiFiAPIClient, search_term: str,
         component_types: List of component types to search (processors, connections, process_groups)
         pg_id: ID of the parent process group (default: root)
         recursive: Whether to search recursively in child process groups
+        search_terms: Optional further terms; components matching any term are returned
+        max_matches: Optional limit on the matches returned; the search stops fetching
+            process groups once it has found that many
+        stale_if_error: Whether to search the last known flows while NiFi is briefly
+            unreachable; the result is then marked stale
         
     Returns:
         Dictionary with matching components
     """
     try:
-        search_term_lower = search_term.lower()
+        terms = [term.lower() for term in ([search_term] if search_term else []) + list(search_terms or ())]
+        matches_term = _term_matcher(frozenset(terms or [""]))
         
         # Default to all component types if none specified
         if not component_types:
-            component_types = ["processors", "process_groups", "connections", "input_ports", "output_ports"]
+            component_types = list(_SEARCHABLE_TYPES)
         
         # Initialize result structure
         result = {
@@ -43,117 +355,34 @@ async def search_components(nifi_client: NiFiAPIClient, search_term: str,
             },
             "total_matches": 0
         }
+        if search_terms:
+            result["search_terms"] = search_terms
         
-        # Get all components in the current process group
-        response = nifi_client.get(f"/flow/process-groups/{pg_id}")
-        flow = response.get("processGroupFlow", {}).get("flow", {})
-        
-        # Search processors
-        if "processors" in component_types:
-            processors = flow.get("processors", [])
-            for processor in processors:
-                name = processor.get("name", "").lower()
-                processor_type = processor.get("component", {}).get("type", "").lower()
-                
-                if search_term_lower in name or search_term_lower in processor_type:
-                    result["matches"]["processors"].append({
-                        "id": processor.get("id"),
-                        "name": processor.get("name"),
-                        "type": processor.get("component", {}).get("type"),
-                        "pg_id": pg_id,
-                        "state": processor.get("status", {}).get("runStatus")
-                    })
-        
-        # Search process groups
-        if "process_groups" in component_types:
-            process_groups = flow.get("processGroups", [])
-            for pg in process_groups:
-                name = pg.get("name", "").lower()
-                comments = pg.get("comments", "").lower()
-                
-                if search_term_lower in name or search_term_lower in comments:
-                    result["matches"]["process_groups"].append({
-                        "id": pg.get("id"),
-                        "name": pg.get("name"),
-                        "comments": pg.get("comments"),
-                        "parent_id": pg_id
-                    })
+        # Search every process group of the (sub)tree, merging their matches in tree order
+        async def visit(group_id: str, index: FlowIndex) -> Dict[str, List[Dict[str, Any]]]:
+            return _match_components(index, matches_term, component_types)
         
-        # Search connections
-        if "connections" in component_types:
-            connections = flow.get("connections", [])
-            for conn in connections:
-                name = conn.get("name", "").lower()
-                source_name = conn.get("sourceGroupName", "").lower() + "." + conn.get("sourceConnectable", {}).get("name", "").lower()
-                dest_name = conn.get("destinationGroupName", "").lower() + "." + conn.get("destinationConnectable", {}).get("name", "").lower()
-                
-                if (search_term_lower in name or 
-                    search_term_lower in source_name or 
-                    search_term_lower in dest_name):
-                    result["matches"]["connections"].append({
-                        "id": conn.get("id"),
-                        "name": conn.get("name"),
-                        "source": {
-                            "id": conn.get("sourceId"),
-                            "name": conn.get("sourceConnectable", {}).get("name"),
-                            "type": conn.get("sourceType"),
-                            "group_name": conn.get("sourceGroupName")
-                        },
-                        "destination": {
-                            "id": conn.get("destinationId"),
-                            "name": conn.get("destinationConnectable", {}).get("name"),
-                            "type": conn.get("destinationType"),
-                            "group_name": conn.get("destinationGroupName")
-                        },
-                        "pg_id": pg_id
-                    })
-        
-        # Search input ports
-        if "input_ports" in component_types:
-            input_ports = flow.get("inputPorts", [])
-            for port in input_ports:
-                name = port.get("name", "").lower()
-                
-                if search_term_lower in name:
-                    result["matches"]["input_ports"].append({
-                        "id": port.get("id"),
-                        "name": port.get("name"),
-                        "state": port.get("status", {}).get("runStatus"),
-                        "pg_id": pg_id
-                    })
+        found = 0
         
-        # Search output ports
-        if "output_ports" in component_types:
-            output_ports = flow.get("outputPorts", [])
-            for port in output_ports:
-                name = port.get("name", "").lower()
-                
-                if search_term_lower in name:
-                    result["matches"]["output_ports"].append({
-                        "id": port.get("id"),
-                        "name": port.get("name"),
-                        "state": port.get("status", {}).get("runStatus"),
-                        "pg_id": pg_id
-                    })
+        def enough(group_result: Dict[str, List[Dict[str, Any]]]) -> bool:
+            nonlocal found
+            found += sum(map(len, group_result.values()))
+            return found >= max_matches
         
-        # If recursive, also search in child process groups
-        if recursive:
-            process_groups = flow.get("processGroups", [])
-            
-            for child_group in process_groups:
-                child_id = child_group.get("id")
-                child_results = await search_components(
-                    nifi_client, 
-                    search_term, 
-                    component_types, 
-                    child_id, 
-                    recursive
-                )
-                
-                if child_results.get("status") == "success":
-                    # Merge the child results with the parent results
-                    for comp_type, matches in child_results.get("matches", {}).items():
-                        result["matches"][comp_type].extend(matches)
+        group_matches, stale = await _walk_groups(nifi_client, pg_id, recursive, visit,
+                                                  enough if max_matches is not None else None,
+                                                  stale_if_error)
+        if stale:
+            result["stale"] = True
+        remaining = max_matches
+        for comp_type in _SEARCHABLE_TYPES:
+            matches = list(chain.from_iterable(m[comp_type] for m in group_matches))
+            if remaining is not None:
+                if len(matches) > remaining:
+                    del matches[remaining:]
+                    result["truncated"] = True
+                remaining -= len(matches)
+            result["matches"][comp_type] = matches
         
         # Calculate total number of matches
         total = sum(len(matches) for matches in result["matches"].values())
@@ -168,7 +397,8 @@ async def search_components(nifi_client: NiFiAPIClient, search_term: str,
         }
 
 async def search_by_property(nifi_client: NiFiAPIClient, property_name: str, property_value: Optional[str] = None,
-                           pg_id: str = "root", recursive: bool = True) -> Dict[str, Any]:
+                           pg_id: str = "root", recursive: bool = True,
+                           stale_if_error: bool = True) -> Dict[str, Any]:
     """Search for processors by property name and optionally value.
     
     Args:
@@ -177,60 +407,61 @@ async def search_by_property(nifi_client: NiFiAPIClient, property_name: str, pro
         property_value: Optional value of the property to match
         pg_id: ID of the parent process group (default: root)
         recursive: Whether to search recursively in child process groups
+        stale_if_error: Whether to search the last known flows while NiFi is briefly
+            unreachable; the result is then marked stale
         
     Returns:
         Dictionary with matching processors
     """
     try:
-        matches = []
+        semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
         
-        # Get processors in the current process group
-        response = nifi_client.get(f"/flow/process-groups/{pg_id}")
-        processors = response.get("processGroupFlow", {}).get("flow", {}).get("processors", [])
+        async def get_detail(processor_id: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await nifi_client.get(f"/processors/{processor_id}")
         
-        # For each processor, get detailed information to check properties
-        for processor in processors:
-            processor_id = processor.get("id")
-            processor_detail = nifi_client.get(f"/processors/{processor_id}")
-            properties = processor_detail.get("component", {}).get("properties", {})
+        async def visit(group_id: str, index: FlowIndex) -> List[Dict[str, Any]]:
+            matches = []
+            processors = [summary for *_, summary in index.processors]
             
-            # Check if the property exists
-            if property_name in properties:
-                # If property_value is specified, check if it matches
-                if property_value is None or property_value == properties[property_name]:
-                    matches.append({
-                        "id": processor_id,
-                        "name": processor.get("name"),
-                        "type": processor.get("component", {}).get("type"),
-                        "pg_id": pg_id,
-                        "property_value": properties.get(property_name),
-                        "state": processor.get("status", {}).get("runStatus")
-                    })
-        
-        # If recursive, also search in child process groups
-        if recursive:
-            child_groups = response.get("processGroupFlow", {}).get("flow", {}).get("processGroups", [])
+            # Get detailed information of all processors at once to check properties;
+            # they are bounded like the walk's own fetches
+            details = await asyncio.gather(*(
+                get_detail(processor["id"]) for processor in processors
+            ))
             
-            for child_group in child_groups:
-                child_id = child_group.get("id")
-                child_results = await search_by_property(
-                    nifi_client, 
-                    property_name, 
-                    property_value, 
-                    child_id, 
-                    recursive
-                )
+            for processor, processor_detail in zip(processors, details):
+                properties = processor_detail.get("component", {}).get("properties", {})
                 
-                if child_results.get("status") == "success":
-                    matches.extend(child_results.get("processors", []))
+                # Check if the property exists
+                if property_name in properties:
+                    # If property_value is specified, check if it matches
+                    if property_value is None or property_value == properties[property_name]:
+                        matches.append({
+                            "id": processor["id"],
+                            "name": processor["name"],
+                            "type": processor["type"],
+                            "pg_id": group_id,
+                            "property_value": properties.get(property_name),
+                            "state": processor["state"]
+                        })
+            return matches
         
-        return {
+        # Search every process group of the (sub)tree, merging their matches in tree order
+        group_matches, stale = await _walk_groups(nifi_client, pg_id, recursive, visit,
+                                                  stale_if_error=stale_if_error)
+        matches = list(chain.from_iterable(group_matches))
+        
+        result = {
             "status": "success",
             "property_name": property_name,
             "property_value": property_value,
             "processors": matches,
             "count": len(matches)
         }
+        if stale:
+            result["stale"] = True
+        return result
     except Exception as e:
         logger.error(f"Error searching by property: {str(e)}")
         return {
@@ -238,8 +469,71 @@ async def search_by_property(nifi_client: NiFiAPIClient, property_name: str, pro
             "message": str(e)
         }
 
+def _match_by_name(index: FlowIndex, pg_id: str, name_lower: str,
+                   component_type: Optional[str]) -> List[Dict[str, Any]]:
+    """Find the components of one indexed process group flow whose name contains a lowercased name."""
+    matches = []
+    
+    # Check component type and search accordingly; the name is the first indexed field
+    for item_type, entries in (("processor", index.processors),
+                               ("process_group", index.process_groups),
+                               ("connection", index.connections),
+                               ("input_port", index.input_ports),
+                               ("output_port", index.output_ports)):
+        if component_type is not None and component_type != item_type:
+            continue
+        for entry in entries:
+            item_name = entry[0]
+            if name_lower in item_name:
+                item = entry[-1]
+                matches.append({
+                    "type": item_type,
+                    "id": item.get("id"),
+                    "name": item.get("name"),
+                    "pg_id": pg_id,
+                    "exact_match": item_name == name_lower
+                })
+    
+    return matches
+
+async def iter_components_by_name(nifi_client: NiFiAPIClient, name: str, component_type: str = None,
+                                  pg_id: str = "root", recursive: bool = True,
+                                  stale_if_error: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """Yield components whose name contains a name, as each process group is searched.
+    
+    Unlike find_component_by_name nothing is collected or sorted, so a caller after the
+    first exact match can stop there; closing the iterator stops the search.
+    
+    Args:
+        nifi_client: NiFi API client instance
+        name: Name to search for
+        component_type: Type of component to search for (processor, process_group, etc.)
+        pg_id: ID of the parent process group (default: root)
+        recursive: Whether to search recursively in child process groups
+        stale_if_error: Whether to search the last known flows while NiFi is briefly
+            unreachable; matches found in them are marked stale
+        
+    Yields:
+        Matching component information, in the order process groups are searched
+    """
+    name_lower = name.lower()
+    
+    async def visit(group_id: str, index: FlowIndex) -> List[Dict[str, Any]]:
+        return _match_by_name(index, group_id, name_lower, component_type)
+    
+    walk = _iter_groups(nifi_client, pg_id, recursive, visit, stale_if_error=stale_if_error)
+    try:
+        async for _, group_matches, stale in walk:
+            for match in group_matches:
+                if stale:
+                    match["stale"] = True
+                yield match
+    finally:
+        await walk.aclose()
+
 async def find_component_by_name(nifi_client: NiFiAPIClient, name: str, component_type: str = None,
-                               pg_id: str = "root", recursive: bool = True) -> Dict[str, Any]:
+                               pg_id: str = "root", recursive: bool = True,
+                               stale_if_error: bool = True) -> Dict[str, Any]:
     """Find a component by exact name (or close match).
     
     Args:
@@ -248,112 +542,36 @@ async def find_component_by_name(nifi_client: NiFiAPIClient, name: str, componen
         component_type: Type of component to search for (processor, process_group, etc.)
         pg_id: ID of the parent process group (default: root)
         recursive: Whether to search recursively in child process groups
+        stale_if_error: Whether to search the last known flows while NiFi is briefly
+            unreachable; the result is then marked stale
         
     Returns:
         Dictionary with matching component information
     """
     try:
         name_lower = name.lower()
-        matches = []
-        
-        # Get process group contents
-        response = nifi_client.get(f"/flow/process-groups/{pg_id}")
-        flow = response.get("processGroupFlow", {}).get("flow", {})
-        
-        # Check component type and search accordingly
-        if component_type is None or component_type == "processor":
-            processors = flow.get("processors", [])
-            for item in processors:
-                item_name = item.get("name", "").lower()
-                if item_name == name_lower or name_lower in item_name:
-                    matches.append({
-                        "type": "processor",
-                        "id": item.get("id"),
-                        "name": item.get("name"),
-                        "pg_id": pg_id,
-                        "exact_match": item_name == name_lower
-                    })
         
-        if component_type is None or component_type == "process_group":
-            process_groups = flow.get("processGroups", [])
-            for item in process_groups:
-                item_name = item.get("name", "").lower()
-                if item_name == name_lower or name_lower in item_name:
-                    matches.append({
-                        "type": "process_group",
-                        "id": item.get("id"),
-                        "name": item.get("name"),
-                        "pg_id": pg_id,
-                        "exact_match": item_name == name_lower
-                    })
+        # Search every process group of the (sub)tree, merging their matches in tree order
+        async def visit(group_id: str, index: FlowIndex) -> List[Dict[str, Any]]:
+            return _match_by_name(index, group_id, name_lower, component_type)
         
-        if component_type is None or component_type == "connection":
-            connections = flow.get("connections", [])
-            for item in connections:
-                item_name = item.get("name", "").lower()
-                if item_name == name_lower or name_lower in item_name:
-                    matches.append({
-                        "type": "connection",
-                        "id": item.get("id"),
-                        "name": item.get("name"),
-                        "pg_id": pg_id,
-                        "exact_match": item_name == name_lower
-                    })
-        
-        # Search ports if applicable
-        if component_type is None or component_type == "input_port":
-            input_ports = flow.get("inputPorts", [])
-            for item in input_ports:
-                item_name = item.get("name", "").lower()
-                if item_name == name_lower or name_lower in item_name:
-                    matches.append({
-                        "type": "input_port",
-                        "id": item.get("id"),
-                        "name": item.get("name"),
-                        "pg_id": pg_id,
-                        "exact_match": item_name == name_lower
-                    })
-        
-        if component_type is None or component_type == "output_port":
-            output_ports = flow.get("outputPorts", [])
-            for item in output_ports:
-                item_name = item.get("name", "").lower()
-                if item_name == name_lower or name_lower in item_name:
-                    matches.append({
-                        "type": "output_port",
-                        "id": item.get("id"),
-                        "name": item.get("name"),
-                        "pg_id": pg_id,
-                        "exact_match": item_name == name_lower
-                    })
-        
-        # If recursive, also search in child process groups
-        if recursive:
-            process_groups = flow.get("processGroups", [])
-            
-            for child_group in process_groups:
-                child_id = child_group.get("id")
-                child_results = await find_component_by_name(
-                    nifi_client, 
-                    name, 
-                    component_type, 
-                    child_id, 
-                    recursive
-                )
-                
-                if child_results.get("status") == "success":
-                    matches.extend(child_results.get("matches", []))
+        group_matches, stale = await _walk_groups(nifi_client, pg_id, recursive, visit,
+                                                  stale_if_error=stale_if_error)
+        matches = list(chain.from_iterable(group_matches))
         
         # Sort matches - exact matches first, then by name
         matches.sort(key=lambda x: (not x.get("exact_match", False), x.get("name", "")))
         
-        return {
+        result = {
             "status": "success",
             "name": name,
             "component_type": component_type,
             "matches": matches,
             "count": len(matches)
         }
+        if stale:
+            result["stale"] = True
+        return result
     except Exception as e:
         logger.error(f"Error finding component by name: {str(e)}")
         return {
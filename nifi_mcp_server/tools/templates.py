@@ -1,9 +1,16 @@
 from typing import Dict, Any, List, Optional
 from ..nifi_api import NiFiAPIClient
+from ..cache import TTLCache
+from .connections import invalidate_connection_cache
+from .processors import invalidate_processor_cache
 from loguru import logger
 
 # Templates Tools
 
+# Cache of the template listing, keyed on NiFi URL. Templates change far less often
+# than flows, so entries live longer; creating or deleting a template invalidates it.
+TEMPLATE_CACHE = TTLCache(maxsize=64, ttl=60.0)
+
 async def list_templates(nifi_client: NiFiAPIClient) -> Dict[str, Any]:
     """List all available templates.
     
@@ -13,8 +20,12 @@ async def list_templates(nifi_client: NiFiAPIClient) -> Dict[str, Any]:
     Returns:
         Dictionary with template information
     """
+    cached = TEMPLATE_CACHE.get(nifi_client.base_url)
+    if cached is not None:
+        return cached
+    
     try:
-        response = nifi_client.get("/flow/templates")
+        response = await nifi_client.get("/flow/templates")
         templates = response.get("templates", [])
         
         # Extract relevant information
@@ -29,11 +40,13 @@ async def list_templates(nifi_client: NiFiAPIClient) -> Dict[str, Any]:
             for template in templates
         ]
         
-        return {
+        listing = {
             "status": "success",
             "templates": result,
             "count": len(result)
         }
+        TEMPLATE_CACHE.put(nifi_client.base_url, listing)
+        return listing
     except Exception as e:
         logger.error(f"Error listing templates: {str(e)}")
         return {
@@ -52,7 +65,7 @@ async def get_template_details(nifi_client: NiFiAPIClient, template_id: str) ->
         Dictionary with template details
     """
     try:
-        response = nifi_client.get(f"/templates/{template_id}")
+        response = await nifi_client.get(f"/templates/{template_id}")
         template = response.get("template", {})
         
         # Get the snippet information
@@ -79,7 +92,8 @@ async def get_template_details(nifi_client: NiFiAPIClient, template_id: str) ->
                 "input_ports": len(input_ports),
                 "output_ports": len(output_ports),
             },
-            "processor_types": list(set([p.get("type") for p in processors.values()]))
+            # Unique types in first-seen order, so the output is deterministic
+            "processor_types": list(dict.fromkeys(p.get("type") for p in processors.values()))
         }
     except Exception as e:
         logger.error(f"Error getting template details: {str(e)}")
@@ -111,7 +125,11 @@ async def instantiate_template(nifi_client: NiFiAPIClient, template_id: str, pg_
         }
         
         # Make the API call
-        response = nifi_client.post(f"/process-groups/{pg_id}/template-instance", request_body)
+        response = await nifi_client.post(f"/process-groups/{pg_id}/template-instance", request_body)
+        
+        # The new components show up in the process group's listings and flows
+        invalidate_processor_cache()
+        invalidate_connection_cache(nifi_client)
         
         # Extract the created flow from the response
         flow = response.get("flow", {})
@@ -160,7 +178,7 @@ async def create_template(nifi_client: NiFiAPIClient, pg_id: str, name: str,
         # If no snippet ID is provided, we need to create a snippet from the process group
         if not snippet_id:
             # Get the process group info
-            pg_response = nifi_client.get(f"/process-groups/{pg_id}")
+            pg_response = await nifi_client.get(f"/process-groups/{pg_id}")
             
             # Create a snippet that includes the entire process group
             snippet_request = {
@@ -170,7 +188,7 @@ async def create_template(nifi_client: NiFiAPIClient, pg_id: str, name: str,
                 }
             }
             
-            snippet_response = nifi_client.post("/snippets", snippet_request)
+            snippet_response = await nifi_client.post("/snippets", snippet_request)
             snippet_id = snippet_response.get("snippet", {}).get("id")
         
         # Prepare the request body for creating the template
@@ -181,7 +199,8 @@ async def create_template(nifi_client: NiFiAPIClient, pg_id: str, name: str,
         }
         
         # Make the API call
-        response = nifi_client.post(f"/process-groups/{pg_id}/templates", request_body)
+        response = await nifi_client.post(f"/process-groups/{pg_id}/templates", request_body)
+        TEMPLATE_CACHE.pop(nifi_client.base_url)
         
         return {
             "status": "success",
@@ -209,7 +228,8 @@ async def delete_template(nifi_client: NiFiAPIClient, template_id: str) -> Dict[
     """
     try:
         # Make the API call
-        nifi_client.delete(f"/templates/{template_id}")
+        await nifi_client.delete(f"/templates/{template_id}")
+        TEMPLATE_CACHE.pop(nifi_client.base_url)
         
         return {
             "status": "success",
@@ -234,7 +254,7 @@ async def export_template(nifi_client: NiFiAPIClient, template_id: str) -> Dict[
     """
     try:
         # Make the API call - this returns XML directly
-        xml_response = nifi_client._make_request(
+        xml_response = await nifi_client._make_request(
             "GET", 
             f"/templates/{template_id}/download", 
             headers={"Accept": "application/xml"}
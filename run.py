@@ -8,23 +8,39 @@ import os
 import sys
 import argparse
 import subprocess
+import multiprocessing
+import socket
 import time
 import signal
 import yaml
+import importlib.util
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    from yaml import CSafeLoader as YAMLSafeLoader
+except ImportError:
+    from yaml import SafeLoader as YAMLSafeLoader
+
 # Default configuration
 DEFAULT_CONFIG = {
     "server": {
         "host": "0.0.0.0",
         "port": 8000,
-        "log_level": "info"
+        "log_level": "info",
+        "workers": 1
     },
     "ui": {
         "port": 8501
     }
 }
 
+@lru_cache(maxsize=1)
+def _read_config_file(path, mtime_ns):
+    """Parse a config file; memoized on its modification time, so edits are picked up."""
+    with open(path, "r") as f:
+        return yaml.load(f, Loader=YAMLSafeLoader)
+
 def load_config():
     """Load configuration from config.yaml file."""
     config = DEFAULT_CONFIG.copy()
@@ -32,9 +48,8 @@ def load_config():
     
     if config_path.exists():
         try:
-            with open(config_path, "r") as f:
-                yaml_config = yaml.safe_load(f)
-                
+            yaml_config = _read_config_file(str(config_path), config_path.stat().st_mtime_ns)
+            
             # Update with file values
             if yaml_config and "server" in yaml_config:
                 config["server"].update(yaml_config.get("server", {}))
@@ -45,23 +60,95 @@ def load_config():
     
     return config
 
-def run_server(host, port, log_level):
-    """Run the FastAPI server."""
-    cmd = [
-        sys.executable, "-m", "uvicorn", 
-        "nifi_mcp_server.server:app", 
-        "--host", host, 
-        "--port", str(port),
-        "--log-level", log_level
-    ]
-    return subprocess.Popen(cmd)
+def serve(host, port, log_level, workers=1):
+    """Run the FastAPI server in this process until it shuts down."""
+    import uvicorn
+    
+    options = {"host": host, "port": port, "log_level": log_level, "workers": workers}
+    
+    # Use the uvloop event loop and httptools parser when they are installed
+    if importlib.util.find_spec("uvloop"):
+        options["loop"] = "uvloop"
+    if importlib.util.find_spec("httptools"):
+        options["http"] = "httptools"
+    
+    # An import string rather than the app object, so uvicorn can start several workers
+    uvicorn.run("nifi_mcp_server.server:app", **options)
+
+def _serve_in_new_group(host, port, log_level, workers):
+    """Run the server as the leader of a new process group, so its workers can be stopped with it."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if hasattr(os, "setsid"):
+        os.setsid()
+    serve(host, port, log_level, workers)
+
+def run_server(host, port, log_level, workers=1):
+    """Run the FastAPI server in a child process, without starting a new interpreter."""
+    process = multiprocessing.Process(target=_serve_in_new_group, args=(host, port, log_level, workers))
+    process.start()
+    return process
+
+def wait_for_server(host, port, timeout=10.0):
+    """Wait until the server accepts connections; returns whether it did within the timeout."""
+    # A server bound to all interfaces is reached on the loopback one
+    if host in ("0.0.0.0", "::", ""):
+        host = "127.0.0.1"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.1).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+def wait_for_process(process, timeout=None):
+    """Wait for a server (multiprocessing) or UI (subprocess) process to exit; returns whether it did."""
+    if isinstance(process, multiprocessing.Process):
+        process.join(timeout)
+        return not process.is_alive()
+    try:
+        process.wait(timeout)
+        return True
+    except subprocess.TimeoutExpired:
+        return False
+
+def _signal_group(process, sig):
+    """Send a signal to a child's whole process group, or just the child where that is not possible."""
+    try:
+        os.killpg(process.pid, sig)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        # No process groups on this platform, or the child is not a group leader yet
+        try:
+            process.terminate() if sig == signal.SIGTERM else process.kill()
+        except OSError:
+            pass
+
+def stop_processes(processes, timeout=5.0):
+    """Terminate the children with everything they spawned, killing what is left after the timeout."""
+    for process in processes:
+        _signal_group(process, signal.SIGTERM)
+    
+    # One shared deadline, rather than a full timeout per child
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        if not wait_for_process(process, max(deadline - time.monotonic(), 0)):
+            _signal_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+            wait_for_process(process)
+
+def _raise_interrupt(signum, frame):
+    """Treat SIGTERM like Ctrl+C, so `kill` on this script shuts its children down too."""
+    raise KeyboardInterrupt
 
 def run_ui(port):
     """Run the Streamlit UI."""
     env = os.environ.copy()
     env["MCP_SERVER_URL"] = f"http://localhost:{DEFAULT_CONFIG['server']['port']}"
     cmd = [sys.executable, "-m", "streamlit", "run", "nifi_chat_ui/app.py", "--server.port", str(port)]
-    return subprocess.Popen(cmd, env=env)
+    # Its own process group (a new session on POSIX), so its helpers are stopped with it
+    if os.name == "nt":
+        return subprocess.Popen(cmd, env=env, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+    return subprocess.Popen(cmd, env=env, start_new_session=True)
 
 def main():
     parser = argparse.ArgumentParser(description="Run NiFi MCP Server and Chat UI")
@@ -71,6 +158,7 @@ def main():
     parser.add_argument("--server-port", type=int, help="Server port")
     parser.add_argument("--ui-port", type=int, help="UI port")
     parser.add_argument("--log-level", help="Log level", choices=["debug", "info", "warning", "error", "critical"])
+    parser.add_argument("--workers", type=int, help="Number of server worker processes")
     
     args = parser.parse_args()
     config = load_config()
@@ -84,8 +172,26 @@ def main():
         config["ui"]["port"] = args.ui_port
     if args.log_level:
         config["server"]["log_level"] = args.log_level
+    if args.workers:
+        config["server"]["workers"] = args.workers
     
     processes = []
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    
+    # The server alone runs right in this process
+    if args.server_only:
+        print(f"Starting server on {config['server']['host']}:{config['server']['port']}...")
+        try:
+            serve(
+                config["server"]["host"],
+                config["server"]["port"],
+                config["server"]["log_level"],
+                config["server"]["workers"]
+            )
+        except KeyboardInterrupt:
+            pass
+        print("Shutdown complete.")
+        return
     
     try:
         # Start server if requested
@@ -94,31 +200,27 @@ def main():
             server_process = run_server(
                 config["server"]["host"], 
                 config["server"]["port"],
-                config["server"]["log_level"]
+                config["server"]["log_level"],
+                config["server"]["workers"]
             )
             processes.append(server_process)
-            time.sleep(2)  # Give the server time to start
+            if not wait_for_server(config["server"]["host"], config["server"]["port"]):
+                print("Server did not start accepting connections in time; starting the UI anyway")
         
-        # Start UI if requested
-        if not args.server_only:
-            print(f"Starting UI on port {config['ui']['port']}...")
-            ui_process = run_ui(config["ui"]["port"])
-            processes.append(ui_process)
+        # Start UI
+        print(f"Starting UI on port {config['ui']['port']}...")
+        ui_process = run_ui(config["ui"]["port"])
+        processes.append(ui_process)
         
         # Wait for termination
         for process in processes:
-            process.wait()
+            wait_for_process(process)
             
     except KeyboardInterrupt:
         print("\nShutting down...")
     finally:
         # Clean up processes
-        for process in processes:
-            try:
-                process.send_signal(signal.SIGINT)
-                process.wait(timeout=5)
-            except:
-                process.kill()
+        stop_processes(processes)
         
         print("Shutdown complete.")
 
@@ -0,0 +1,888 @@
+import asyncio
+import httpx
+import orjson
+import pytest
+from nifi_mcp_server.nifi_api import NiFiAPIClient
+from nifi_mcp_server.tools.process_groups import (
+    PROCESS_GROUP_CACHE, PROCESS_GROUP_DETAILS_CACHE, create_process_group, get_process_group_details,
+    list_process_groups
+)
+from nifi_mcp_server.tools.connections import (
+    CONNECTION_CACHE, CONNECTION_DETAILS_CACHE, invalidate_connection_cache,
+    delete_connection, empty_connection_queue, iter_connections_json, list_connections, update_connection
+)
+from nifi_mcp_server.tools import documentation
+from nifi_mcp_server.tools.documentation import DOCS_CACHE, get_processor_docs, invalidate_docs_cache, list_processor_types
+from nifi_mcp_server.cache import TTLCache
+from nifi_mcp_server import revisions
+from nifi_mcp_server.tools import flow_control
+from nifi_mcp_server.tools.flow_control import get_flow_status, start_component, stop_component
+from nifi_mcp_server.tools import processors
+from nifi_mcp_server.tools import search
+from nifi_mcp_server.tools.search import find_component_by_name, iter_components_by_name, search_by_property, search_components
+from nifi_mcp_server.tools import templates
+from nifi_mcp_server.tools.processors import create_processor, create_processors, list_processors, search_processors, update_processor_properties
+
+def make_client(handler, **kwargs) -> NiFiAPIClient:
+    """Create a NiFi API client backed by a mock transport."""
+    client = NiFiAPIClient(base_url="http://nifi.test/nifi-api", **kwargs)
+    client._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler),
+        headers=client._get_headers(),
+        auth=client._get_auth()
+    )
+    return client
+
+@pytest.fixture(autouse=True)
+def clear_connection_caches():
+    """Start every test with empty connection and revision caches."""
+    CONNECTION_CACHE.clear()
+    CONNECTION_DETAILS_CACHE.clear()
+    revisions.REVISIONS.clear()
+    DOCS_CACHE.clear()
+    processors.BUNDLE_CACHE.clear()
+    processors.PROCESSOR_CACHE.clear()
+    PROCESS_GROUP_CACHE.clear()
+    PROCESS_GROUP_DETAILS_CACHE.clear()
+    flow_control._last_cluster.clear()
+    flow_control._last_component_status.clear()
+    search.FLOW_CACHE.clear()
+    search._last_flow_index.clear()
+    templates.TEMPLATE_CACHE.clear()
+
+# Test the NiFiAPIClient class
+def test_client_get_returns_json():
+    """Test that GET requests return decoded JSON."""
+    def handler(request):
+        assert request.url.path == "/nifi-api/flow/about"
+        return httpx.Response(200, json={"about": {"version": "1.23.0"}})
+
+    client = make_client(handler)
+    result = asyncio.run(client.test_connection())
+    assert result["connected"] is True
+    assert result["nifi_version"] == "1.23.0"
+
+def test_client_raises_on_http_error():
+    """Test that HTTP errors are raised to the caller."""
+    def handler(request):
+        return httpx.Response(404, json={"message": "not found"})
+
+    client = make_client(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.get("/processors/missing"))
+
+def test_client_post_sends_json_body():
+    """Test that POST bodies are sent as JSON."""
+    def handler(request):
+        assert request.headers["content-type"] == "application/json"
+        return httpx.Response(201, json={"received": orjson.loads(request.content)})
+
+    client = make_client(handler)
+    result = asyncio.run(client.post("/process-groups/root/process-groups", {"component": {"name": "ETL"}}))
+    assert result == {"received": {"component": {"name": "ETL"}}}
+
+def test_client_caps_requests_in_flight():
+    """Test that the client keeps no more than max_concurrency requests in flight."""
+    in_flight = [0, 0]
+    async def handler(request):
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return httpx.Response(200, json={})
+
+    client = make_client(handler, max_concurrency=3)
+
+    async def run():
+        await asyncio.gather(*(client.get(f"/processors/p{i}") for i in range(10)))
+
+    asyncio.run(run())
+    assert in_flight[1] == 3
+
+# Test the process group tools
+def test_list_process_groups_cached_until_change():
+    """Test that repeated listings are served from cache until a process group is created or started."""
+    calls = []
+    def handler(request):
+        calls.append((request.method, request.url.path))
+        if request.method == "GET":
+            return httpx.Response(200, json={"processGroupFlow": {"flow": {"processGroups": [{"id": "pg1"}]}}})
+        return httpx.Response(201, json={"id": "pg2", "component": {"name": "New"}, "revision": {"version": 0}})
+
+    client = make_client(handler)
+
+    async def run():
+        await list_process_groups(client)
+        await list_process_groups(client)
+        await create_process_group(client, "root", "New")
+        await list_process_groups(client)
+        await start_component(client, "pg1", "process-group")
+        await list_process_groups(client)
+
+    asyncio.run(run())
+    assert [method for method, _ in calls] == ["GET", "POST", "GET", "PUT", "GET"]
+
+def test_list_process_groups_prefetches_child_details():
+    """Test that a prefetching listing serves follow-up detail lookups from cache."""
+    calls = []
+    def handler(request):
+        calls.append(request.url.path)
+        if request.url.path.endswith("/status"):
+            return httpx.Response(200, json={"processGroupStatus": {"runningCount": 1}})
+        if request.url.path.endswith("/root"):
+            return httpx.Response(200, json={"processGroupFlow": {"flow": {"processGroups": [{"id": "a"}, {"id": "b"}]}}})
+        return httpx.Response(200, json={"processGroupFlow": {"breadcrumb": {"breadcrumb": {"name": "child"}}}})
+
+    client = make_client(handler)
+
+    async def run():
+        await list_process_groups(client, prefetch_details=True)
+        await asyncio.sleep(0.05)
+        fetched = len(calls)
+        details = [await get_process_group_details(client, pg_id) for pg_id in ("a", "b")]
+        return fetched, details
+
+    fetched, details = asyncio.run(run())
+    assert fetched == 5
+    assert len(calls) == 5
+    assert [d["running_components"] for d in details] == [1, 1]
+
+def test_process_group_details_not_cached_across_invalidation():
+    """Test that connection changes drop details and in-flight fetches cannot repopulate them."""
+    queued = [3]
+    release = []
+    async def handler(request):
+        if release:
+            await release[0].wait()
+        if request.url.path.endswith("/status"):
+            return httpx.Response(200, json={"processGroupStatus": {"flowFilesQueued": queued[0]}})
+        return httpx.Response(200, json={"processGroupFlow": {"flow": {}}})
+
+    client = make_client(handler)
+
+    async def run():
+        first = await get_process_group_details(client, "pg1")
+        queued[0] = 0
+        invalidate_connection_cache(client, "c1")
+        after_change = await get_process_group_details(client, "pg1")
+
+        # A fetch that straddles an invalidation returns its result without caching it
+        release.append(asyncio.Event())
+        PROCESS_GROUP_DETAILS_CACHE.clear()
+        fetch = asyncio.ensure_future(get_process_group_details(client, "pg1"))
+        await asyncio.sleep(0)
+        invalidate_connection_cache(client)
+        release[0].set()
+        await fetch
+        return first, after_change
+
+    first, after_change = asyncio.run(run())
+    assert first["queued_count"] == 3
+    assert after_change["queued_count"] == 0
+    assert PROCESS_GROUP_DETAILS_CACHE.get((client.base_url, "pg1")) is None
+
+def test_get_process_group_details():
+    """Test that process group details combine flow and status responses."""
+    def handler(request):
+        if request.url.path.endswith("/status"):
+            return httpx.Response(200, json={"processGroupStatus": {"runningCount": 2}})
+        return httpx.Response(200, json={"processGroupFlow": {"flow": {"processors": [{}, {}, {}]}}})
+
+    client = make_client(handler)
+    result = asyncio.run(get_process_group_details(client, "root"))
+    assert result["status"] == "success"
+    assert result["processors"] == 3
+    assert result["running_components"] == 2
+
+# Test the connection tools
+def test_delete_connection_refuses_queued_data():
+    """Test that connections with queued FlowFiles are not deleted."""
+    def handler(request):
+        assert request.method == "GET"
+        if request.url.path.endswith("/status"):
+            return httpx.Response(200, json={"connectionStatus": {"aggregateSnapshot": {"flowFilesCount": 5}}})
+        return httpx.Response(200, json={"revision": {"version": 3}})
+
+    client = make_client(handler)
+    result = asyncio.run(delete_connection(client, "conn-1"))
+    assert result["status"] == "error"
+    assert "queued FlowFiles" in result["message"]
+
+def test_list_connections_extracts_fields():
+    """Test that connection listings flatten source, destination and queue status."""
+    def handler(request):
+        return httpx.Response(200, json={"processGroupFlow": {"flow": {"connections": [
+            {"id": "c1", "sourceId": "p1", "sourceConnectable": {"name": "GenerateFlowFile"},
+             "destinationId": "p2", "status": {"flowFilesCount": 7}},
+            {"id": "c2"}
+        ]}}})
+
+    client = make_client(handler)
+    result = asyncio.run(list_connections(client, "root"))
+    assert result["count"] == 2
+    first, second = result["connections"]
+    assert first["source"]["name"] == "GenerateFlowFile"
+    assert first["flow_files_count"] == 7
+    assert first["queued_size"] == "0 B"
+    assert second["destination"]["name"] is None
+
+def test_list_connections_cache_invalidated_by_update():
+    """Test that connection listings are cached until a connection is changed."""
+    calls = []
+    def handler(request):
+        calls.append(request.method)
+        if request.method == "PUT":
+            return httpx.Response(200, json={"component": {"name": "renamed"}})
+        if request.url.path.startswith("/nifi-api/connections/"):
+            return httpx.Response(200, json={"component": {}, "revision": {"version": 1}})
+        return httpx.Response(200, json={"processGroupFlow": {"flow": {"connections": []}}})
+
+    client = make_client(handler)
+
+    async def run():
+        await list_connections(client, "root")
+        await list_connections(client, "root")
+        await update_connection(client, "c1", flow_file_expiration="1 min")
+        await list_connections(client, "root")
+
+    asyncio.run(run())
+    assert calls == ["GET", "GET", "PUT", "GET"]
+
+def test_streamed_connections_match_listing():
+    """Test that the streamed JSON document matches the list_connections result."""
+    connections = [{"id": "c1", "sourceConnectable": {"name": "A"}}, {"id": "c2", "status": {"queued": "1 KB"}}]
+
+    async def collect():
+        return b"".join([chunk async for chunk in iter_connections_json("pg-1", connections)])
+
+    def handler(request):
+        return httpx.Response(200, json={"processGroupFlow": {"flow": {"connections": connections}}})
+
+    listing = asyncio.run(list_connections(make_client(handler), "pg-1"))
+    assert orjson.loads(asyncio.run(collect())) == listing
+
+def test_update_connection_sends_only_changed_fields():
+    """Test that connection updates send a partial component with the current revision."""
+    sent = {}
+    def handler(request):
+        if request.method == "PUT":
+            sent.update(orjson.loads(request.content))
+            return httpx.Response(200, json={"component": {"name": "queue"}})
+        return httpx.Response(200, json={"component": {"id": "c1", "name": "queue", "bends": []},
+                                         "revision": {"version": 4}})
+
+    result = asyncio.run(update_connection(make_client(handler), "c1", backpressure_object_threshold=500))
+    assert result["status"] == "success"
+    assert sent == {"component": {"id": "c1", "backPressureObjectThreshold": 500}, "revision": {"version": 4}}
+
+def test_concurrent_identical_gets_are_coalesced():
+    """Test that concurrent GETs for the same endpoint share one request."""
+    calls = []
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"revision": {"version": 2}})
+
+    client = make_client(handler)
+
+    async def run():
+        return await asyncio.gather(client.get("/connections/c1"), client.get("/connections/c1"))
+
+    first, second = asyncio.run(run())
+    assert first == second == {"revision": {"version": 2}}
+    assert calls == ["/nifi-api/connections/c1"]
+    assert client._inflight == {}
+
+def test_coalesced_get_survives_owner_cancellation():
+    """Test that waiters on a shared GET resend it when the caller that sent it is cancelled."""
+    calls = []
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"revision": {"version": 2}})
+
+    client = make_client(handler)
+
+    async def run():
+        owner = asyncio.ensure_future(client.get("/connections/c1"))
+        await asyncio.sleep(0)
+        waiters = asyncio.gather(client.get("/connections/c1"), client.get("/connections/c1"))
+        await asyncio.sleep(0)
+        owner.cancel()
+        return await waiters
+
+    assert asyncio.run(run()) == [{"revision": {"version": 2}}] * 2
+    assert calls == ["/nifi-api/connections/c1"] * 2
+    assert client._inflight == {}
+
+def test_mutation_uses_cached_revision_and_retries_when_stale():
+    """Test that listed revisions skip the revision GET and stale ones are refetched."""
+    calls = []
+    def handler(request):
+        calls.append((request.method, request.url.path))
+        if request.url.path.endswith("/process-groups/root"):
+            return httpx.Response(200, json={"processGroupFlow": {"flow": {"connections": [
+                {"id": "c1", "revision": {"version": 1}}
+            ]}}})
+        if request.method == "POST":
+            if orjson.loads(request.content)["revision"]["version"] == 1:
+                return httpx.Response(400, text="is not the most up-to-date revision")
+            return httpx.Response(202, json={})
+        return httpx.Response(200, json={"revision": {"version": 2}})
+
+    client = make_client(handler)
+
+    async def run():
+        await list_connections(client, "root")
+        return await empty_connection_queue(client, "c1")
+
+    result = asyncio.run(run())
+    assert result["status"] == "success"
+    assert calls == [
+        ("GET", "/nifi-api/flow/process-groups/root"),
+        ("POST", "/nifi-api/connections/c1/drop-requests"),
+        ("GET", "/nifi-api/connections/c1"),
+        ("POST", "/nifi-api/connections/c1/drop-requests"),
+    ]
+
+# Test the caches
+def test_ttl_cache_expires_and_evicts():
+    """Test that cache entries expire and the least recently used entry is evicted."""
+    cache = TTLCache(maxsize=2, ttl=60.0)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    expired = TTLCache(ttl=-1.0)
+    expired.put("a", 1)
+    assert expired.get("a") is None
+
+# Test the documentation tools
+def test_processor_types_cached_until_invalidated():
+    """Test that the processor type catalog is fetched once until the docs cache is cleared."""
+    calls = []
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"processorTypes": [
+            {"type": "GetFile", "tags": ["files", "Files"]}, {"type": "GenerateFlowFile", "tags": ["test"]}
+        ]})
+
+    client = make_client(handler)
+
+    async def run():
+        await list_processor_types(client)
+        result = await list_processor_types(client, tag="FILES")
+        await invalidate_docs_cache()
+        await list_processor_types(client)
+        return result
+
+    result = asyncio.run(run())
+    assert result["count"] == 1
+    assert calls == ["/nifi-api/flow/processor-types"] * 2
+
+def test_docs_fetch_retries_server_errors(monkeypatch):
+    """Test that documentation fetches retry transient errors but not other server errors."""
+    responses = [httpx.Response(503), httpx.Response(200, json={"processorTypes": []})]
+    def handler(request):
+        return responses.pop(0)
+
+    monkeypatch.setattr(documentation, "FETCH_BACKOFF", 0)
+    result = asyncio.run(list_processor_types(make_client(handler)))
+    assert result["status"] == "success"
+    assert responses == []
+
+    documentation.DOCS_CACHE.clear()
+    responses = [httpx.Response(500), httpx.Response(200, json={"processorTypes": []})]
+    result = asyncio.run(list_processor_types(make_client(handler)))
+    assert result["status"] == "error"
+    assert len(responses) == 1
+
+def test_processor_types_sorted_by_display_name():
+    """Test that processor type listings are sorted by display name."""
+    def handler(request):
+        return httpx.Response(200, json={"processorTypes": [
+            {"type": "PutFile", "typeDescription": "PutFile", "tags": ["files"]},
+            {"type": "GetFile", "typeDescription": "GetFile", "tags": ["files"]},
+            {"type": "ListFile", "typeDescription": "ListFile", "tags": ["listing"]}
+        ]})
+
+    client = make_client(handler)
+    everything = asyncio.run(list_processor_types(client))
+    files = asyncio.run(list_processor_types(client, tag="files"))
+    assert [pt["type"] for pt in everything["processor_types"]] == ["GetFile", "ListFile", "PutFile"]
+    assert [pt["type"] for pt in files["processor_types"]] == ["GetFile", "PutFile"]
+
+def test_get_processor_docs_extracts_properties():
+    """Test that processor docs flatten property descriptors and their allowable values."""
+    def handler(request):
+        return httpx.Response(200, json={"processorTypes": [{
+            "description": "Fetches files",
+            "propertyDescriptors": {
+                "Input Directory": {"name": "Input Directory", "required": True},
+                "Keep Source File": {"name": "Keep Source File", "allowableValues": {"allowableValues": ["true", "false"]}}
+            }
+        }]})
+
+    result = asyncio.run(get_processor_docs(make_client(handler), "GetFile"))
+    input_dir, keep_source = result["documentation"]["properties"]
+    assert input_dir.required is True
+    assert input_dir.supported_values == []
+    assert keep_source.supported_values == ["true", "false"]
+    assert orjson.loads(orjson.dumps(keep_source))["name"] == "Keep Source File"
+
+# Test the flow control tools
+def test_get_flow_status_standalone_cluster():
+    """Test that flow status falls back to standalone cluster info when the cluster call fails."""
+    def handler(request):
+        if request.url.path.endswith("/controller/cluster"):
+            return httpx.Response(409, json={"message": "not clustered"})
+        return httpx.Response(200, json={"processGroupStatus": {"name": "root", "runningCount": 2, "stoppedCount": 1}})
+
+    result = asyncio.run(get_flow_status(make_client(handler), "root"))
+    assert result["status"] == "success"
+    assert result["component_status"]["total"] == 3
+    assert result["cluster"] == {"connected_nodes": 1, "cluster_coordinator": True}
+
+def test_get_flow_status_serves_stale_cluster_info():
+    """Test that a brief cluster outage reports the last known cluster info marked stale."""
+    cluster_up = [True]
+    def handler(request):
+        if request.url.path.endswith("/controller/cluster"):
+            if not cluster_up[0]:
+                return httpx.Response(503, json={"message": "unavailable"})
+            return httpx.Response(200, json={"cluster": {"nodes": [{"roles": {"isCoordinator": True}}, {}, {}]}})
+        return httpx.Response(200, json={"processGroupStatus": {"name": "root"}})
+
+    client = make_client(handler)
+
+    async def run():
+        fresh = await get_flow_status(client, "root")
+        cluster_up[0] = False
+        stale = await get_flow_status(client, "root")
+        return fresh, stale
+
+    fresh, stale = asyncio.run(run())
+    assert fresh["cluster"] == {"connected_nodes": 3, "cluster_coordinator": True}
+    assert stale["cluster"] == {"connected_nodes": 3, "cluster_coordinator": True, "stale": True}
+
+def test_get_component_status_serves_stale_on_503():
+    """Test that a transient 503 returns the last known component status marked stale."""
+    responses = [httpx.Response(200, json={"processorStatus": {"name": "Fetch", "runStatus": "Running"}}),
+                 httpx.Response(503, json={"message": "unavailable"}),
+                 httpx.Response(404, json={"message": "not found"})]
+    def handler(request):
+        return responses.pop(0)
+
+    client = make_client(handler)
+
+    async def run():
+        return [await flow_control.get_component_status(client, "p1", "processor") for _ in range(3)]
+
+    fresh, stale, missing = asyncio.run(run())
+    assert fresh["state"] == "Running" and "stale" not in fresh
+    assert stale == {**fresh, "stale": True}
+    assert missing["status"] == "error"
+
+def test_get_component_statuses_bounds_concurrency(monkeypatch):
+    """Test that batch status keeps input order and caps in-flight requests."""
+    monkeypatch.setattr(flow_control, "STATUS_CONCURRENCY", 2)
+    in_flight = [0, 0]
+    async def fake_status(nifi_client, component_id, component_type):
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return {"id": component_id, "type": component_type}
+    monkeypatch.setattr(flow_control, "get_component_status", fake_status)
+
+    components = [(f"p{i}", "processor") for i in range(5)]
+    results = asyncio.run(flow_control.get_component_statuses(None, components))
+    assert [result["id"] for result in results] == [f"p{i}" for i in range(5)]
+    assert in_flight[1] == 2
+
+def test_start_stop_cycle_reuses_revision():
+    """Test that stopping a just-started processor reuses the revision NiFi returned."""
+    calls = []
+    def handler(request):
+        calls.append(request.method)
+        if request.method == "GET":
+            return httpx.Response(200, json={"revision": {"version": 1}})
+        body = orjson.loads(request.content)
+        version = body["revision"]["version"]
+        return httpx.Response(200, json={"component": {"state": body["component"]["state"]},
+                                         "revision": {"version": version + 1}})
+
+    client = make_client(handler)
+
+    async def run():
+        await start_component(client, "p1", "processor")
+        return await stop_component(client, "p1", "processor")
+
+    result = asyncio.run(run())
+    assert result["state"] == "STOPPED"
+    assert calls == ["GET", "PUT", "PUT"]
+
+def test_unsupported_component_type_is_rejected():
+    """Test that state changes for unknown component types return an error without calling NiFi."""
+    def handler(request):
+        raise AssertionError("NiFi should not be called")
+
+    result = asyncio.run(start_component(make_client(handler), "x1", "funnel"))
+    assert result == {"status": "error", "message": "Unsupported component type: funnel"}
+
+def test_process_group_state_change_forgets_child_revisions():
+    """Test that starting a process group drops the cached revisions of its components."""
+    def handler(request):
+        return httpx.Response(200, json={})
+
+    client = make_client(handler)
+    revisions.remember_revision(client, "p1", {"revision": {"version": 3}})
+    result = asyncio.run(start_component(client, "pg1", "process-group"))
+    assert result["status"] == "success"
+    assert revisions.REVISIONS.get((client.base_url, "p1")) is None
+
+def test_bulk_set_state_sends_component_revisions():
+    """Test that a bulk state change sends each component's revision once and forgets them."""
+    requests = []
+    def handler(request):
+        requests.append(request)
+        if request.method == "GET":
+            return httpx.Response(200, json={"revision": {"version": 7}})
+        return httpx.Response(200, json={})
+
+    client = make_client(handler)
+    revisions.remember_revision(client, "p1", {"revision": {"version": 2}})
+    components = [("p1", "processor"), ("in1", "input-port")]
+    result = asyncio.run(flow_control.bulk_set_state(client, "pg1", components, "RUNNING"))
+    assert result["status"] == "success"
+    assert result["count"] == 2
+    assert [(request.method, request.url.path) for request in requests] == [
+        ("GET", "/nifi-api/input-ports/in1"),
+        ("PUT", "/nifi-api/flow/process-groups/pg1"),
+    ]
+    assert orjson.loads(requests[-1].content) == {
+        "id": "pg1",
+        "state": "RUNNING",
+        "components": {"p1": {"version": 2}, "in1": {"version": 7}},
+        "disconnectedNodeAcknowledged": False
+    }
+    assert revisions.REVISIONS.get((client.base_url, "p1")) is None
+    assert revisions.REVISIONS.get((client.base_url, "in1")) is None
+
+    unsupported = asyncio.run(flow_control.bulk_set_state(client, "pg1", [("f1", "funnel")], "RUNNING"))
+    assert unsupported == {"status": "error", "message": "Unsupported component type: funnel"}
+    assert len(requests) == 2
+
+def test_bulk_set_state_refetches_stale_revisions():
+    """Test that a bulk state change rejected for a stale cached revision is retried once."""
+    calls = []
+    def handler(request):
+        calls.append(request.method)
+        if request.method == "GET":
+            return httpx.Response(200, json={"revision": {"version": 5}})
+        if orjson.loads(request.content)["components"]["p1"]["version"] == 2:
+            return httpx.Response(400, text="is not the most up-to-date revision")
+        return httpx.Response(200, json={})
+
+    client = make_client(handler)
+    revisions.remember_revision(client, "p1", {"revision": {"version": 2}})
+    result = asyncio.run(flow_control.bulk_set_state(client, "pg1", [("p1", "processor")], "STOPPED"))
+    assert result["status"] == "success"
+    assert calls == ["PUT", "GET", "PUT"]
+
+# Test the processor tools
+def test_search_processors_fetches_subtree_once():
+    """Test that a recursive search lists the whole subtree in one request and matches locally."""
+    requests = []
+    def handler(request):
+        requests.append(request.url)
+        processors = [
+            {"id": "p1", "component": {"type": "org.apache.nifi.processors.standard.LogAttribute", "parentGroupId": "a"},
+             "status": {"runStatus": "Running"}},
+            {"id": "p2", "component": {"type": "org.apache.nifi.processors.standard.PutFile", "parentGroupId": "b"}},
+            {"id": "p3", "name": "Log errors", "component": {"type": "PutEmail", "parentGroupId": "a1"}}
+        ]
+        return httpx.Response(200, json={"processors": processors})
+
+    result = asyncio.run(search_processors(make_client(handler), "log"))
+    assert result["status"] == "success"
+    assert [(match["id"], match["pg_id"]) for match in result["processors"]] == [("p1", "a"), ("p3", "a1")]
+    assert result["processors"][0]["state"] == "Running"
+    assert len(requests) == 1
+    assert requests[0].path == "/nifi-api/process-groups/root/processors"
+    assert requests[0].params["includeDescendantGroups"] == "true"
+
+def test_update_processor_properties_uses_listed_revision():
+    """Test that a processor update after a listing sends only the changes with the listed revision."""
+    calls = []
+    def handler(request):
+        calls.append(request.method)
+        if request.method == "GET":
+            return httpx.Response(200, json={"processGroupFlow": {"flow": {"processors": [
+                {"id": "p1", "revision": {"version": 4}, "component": {"type": "LogAttribute"}}
+            ]}}})
+        body = orjson.loads(request.content)
+        assert body == {"component": {"id": "p1", "properties": {"Log Level": "warn"}}, "revision": {"version": 4}}
+        return httpx.Response(200, json={"component": {"name": "Log"}, "revision": {"version": 5}})
+
+    client = make_client(handler)
+
+    async def run():
+        await list_processors(client, "root")
+        return await update_processor_properties(client, "p1", {"Log Level": "warn"})
+
+    result = asyncio.run(run())
+    assert result["status"] == "success"
+    assert calls == ["GET", "PUT"]
+    assert revisions.REVISIONS.get((client.base_url, "p1")) == {"version": 5}
+
+def test_create_processor_caches_bundle_lookup():
+    """Test that creating several processors of one type looks its bundle up once."""
+    bundle = {"group": "org.apache.nifi", "artifact": "nifi-standard-nar", "version": "1.23.0"}
+    calls = []
+    def handler(request):
+        calls.append(request.method)
+        if request.method == "GET":
+            return httpx.Response(200, json={"processorTypes": [{"bundle": bundle}]})
+        body = orjson.loads(request.content)
+        assert body["component"]["bundle"] == bundle
+        return httpx.Response(201, json={"id": body["component"]["name"], "component": body["component"],
+                                         "revision": {"version": 1}})
+
+    client = make_client(handler)
+
+    async def run():
+        return [await create_processor(client, "root", f"Log {i}", "org.apache.nifi.processors.standard.LogAttribute")
+                for i in range(3)]
+
+    results = asyncio.run(run())
+    assert [result["status"] for result in results] == ["success"] * 3
+    assert calls == ["GET", "POST", "POST", "POST"]
+
+def test_create_processors_resolves_each_bundle_once():
+    """Test that a bulk create looks up each distinct type once and reports failures per spec."""
+    lookups = []
+    def handler(request):
+        if request.method == "GET":
+            processor_type = request.url.path.rsplit("/", 1)[-1]
+            lookups.append(processor_type)
+            bundle = {"artifact": "nifi-standard-nar"} if processor_type != "Missing" else None
+            return httpx.Response(200, json={"processorTypes": [{"bundle": bundle}]})
+        body = orjson.loads(request.content)
+        return httpx.Response(201, json={"id": body["component"]["name"], "component": body["component"]})
+
+    specs = [{"name": "a", "processor_type": "LogAttribute"},
+             {"name": "b", "processor_type": "PutFile", "position_x": 100},
+             {"name": "c", "processor_type": "LogAttribute"},
+             {"name": "d", "processor_type": "Missing"}]
+    result = asyncio.run(create_processors(make_client(handler), "root", specs))
+    assert result["status"] == "error"
+    assert result["count"] == 3
+    assert [r["status"] for r in result["processors"]] == ["success", "success", "success", "error"]
+    assert lookups.count("LogAttribute") == 1 and lookups.count("PutFile") == 1
+
+# Test the search tools
+def flow_tree_handler(tree):
+    """Serve a mock process group tree; groups missing from the tree fail with a 500."""
+    def handler(request):
+        pg_id = request.url.path.rsplit("/", 1)[-1]
+        if pg_id not in tree:
+            return httpx.Response(500, json={"message": "boom"})
+        return httpx.Response(200, json={"processGroupFlow": {"flow": {
+            "processors": [{"id": f"{pg_id}-log", "name": f"Log {pg_id}", "component": {"type": "LogAttribute"}},
+                           {"id": f"{pg_id}-put", "name": "Put", "component": {"type": "PutFile"}}],
+            "processGroups": [{"id": child, "name": f"Group {child}"} for child in tree[pg_id]]
+        }}})
+    return handler
+
+def test_search_components_walks_tree_in_order():
+    """Test that a recursive component search merges every subtree in tree order, skipping failed ones."""
+    tree = {"root": ["a", "b", "broken"], "a": ["a1"], "b": [], "a1": []}
+    result = asyncio.run(search_components(make_client(flow_tree_handler(tree)), "log"))
+    assert result["status"] == "success"
+    assert [m["id"] for m in result["matches"]["processors"]] == ["root-log", "a-log", "a1-log", "b-log"]
+    assert result["matches"]["processors"][2]["pg_id"] == "a1"
+    assert result["total_matches"] == 4
+
+def test_find_component_by_name_ranks_exact_matches_first():
+    """Test that name lookups search the whole tree and list exact matches first."""
+    tree = {"root": ["a"], "a": ["b"], "b": []}
+    result = asyncio.run(find_component_by_name(make_client(flow_tree_handler(tree)), "group b"))
+    assert [(m["type"], m["id"], m["exact_match"]) for m in result["matches"]] == [("process_group", "b", True)]
+
+    result = asyncio.run(find_component_by_name(make_client(flow_tree_handler(tree)), "log", "processor"))
+    assert [m["id"] for m in result["matches"]] == ["a-log", "b-log", "root-log"]
+
+def test_searches_share_cached_flows_until_change():
+    """Test that back-to-back searches fetch each process group once until a change invalidates them."""
+    tree = {"root": ["a"], "a": []}
+    serve = flow_tree_handler(tree)
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.raw_path.decode())
+        return serve(request)
+
+    client = make_client(handler)
+    asyncio.run(search_components(client, "log"))
+    asyncio.run(find_component_by_name(client, "put"))
+    assert sorted(paths) == ["/nifi-api/flow/process-groups/a?uiOnly=true", "/nifi-api/flow/process-groups/root?uiOnly=true"]
+
+    processors.invalidate_processor_cache()
+    asyncio.run(search_components(client, "log"))
+    assert len(paths) == 4
+
+def test_template_listing_cached_until_created():
+    """Test that the template listing is cached and dropped when a template is created."""
+    calls = []
+
+    def handler(request):
+        calls.append((request.method, request.url.path))
+        if request.method == "POST":
+            return httpx.Response(201, json={"id": "t2", "name": "New"})
+        return httpx.Response(200, json={"templates": [{"id": "t1", "name": "Old"}]})
+
+    client = make_client(handler)
+    assert asyncio.run(templates.list_templates(client))["count"] == 1
+    assert asyncio.run(templates.list_templates(client))["count"] == 1
+    assert calls.count(("GET", "/nifi-api/flow/templates")) == 1
+
+    asyncio.run(templates.create_template(client, "pg", "New", snippet_id="s1"))
+    asyncio.run(templates.list_templates(client))
+    assert calls.count(("GET", "/nifi-api/flow/templates")) == 2
+
+def test_search_by_property_fetches_details_concurrently(monkeypatch):
+    """Test that processor details are fetched concurrently, within the search bound, and matched in order."""
+    monkeypatch.setattr(search, "SEARCH_CONCURRENCY", 3)
+    in_flight = peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        path = request.url.path
+        if path.endswith("/flow/process-groups/root"):
+            return httpx.Response(200, json={"processGroupFlow": {"flow": {"processors": [
+                {"id": f"p{i}", "name": f"P{i}", "component": {"type": "LogAttribute"}} for i in range(8)
+            ]}}})
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        index = int(path.rsplit("p", 1)[-1])
+        return httpx.Response(200, json={"component": {"properties": {"Log Level": "warn" if index % 2 else "info"}}})
+
+    result = asyncio.run(search_by_property(make_client(handler), "Log Level", "warn"))
+    assert [p["id"] for p in result["processors"]] == ["p1", "p3", "p5", "p7"]
+    assert 1 < peak <= 3
+
+def test_flow_index_lowercases_fields_once():
+    """Test that a fetched flow is indexed as lowercased fields plus slim component summaries."""
+    index = search.FlowIndex("root", {
+        "processors": [{"id": "p1", "name": "Fetch S3", "component": {"type": "org.FetchS3Object"}}],
+        "connections": [{"id": "c1", "name": None, "sourceGroupName": "Ingest",
+                         "sourceConnectable": {"name": "Fetch S3"}, "destinationConnectable": {}}],
+        "processGroups": [{"id": "g1", "name": "Ingest"}]
+    })
+    assert index.processors[0] == ("fetch s3", "org.fetchs3object",
+                                   {"id": "p1", "name": "Fetch S3", "type": "org.FetchS3Object", "pg_id": "root", "state": None})
+    assert index.connections[0][:3] == ("", "ingest.fetch s3", ".")
+    assert search._match_components(index, search._term_matcher(frozenset(["s3object"])), ["processors"])["processors"][0]["id"] == "p1"
+    assert [m["id"] for m in search._match_by_name(index, "root", "ingest", None)] == ["g1"]
+
+def test_search_components_matches_any_term(monkeypatch):
+    """Test that a multi-term search returns components matching any term, with or without pyahocorasick."""
+    tree = {"root": ["a"], "a": []}
+    for automaton in (search.ahocorasick, None):
+        monkeypatch.setattr(search, "ahocorasick", automaton)
+        search._term_matcher.cache_clear()
+        result = asyncio.run(search_components(make_client(flow_tree_handler(tree)), "putfile",
+                                               ["processors"], search_terms=["LOG A"]))
+        assert [m["id"] for m in result["matches"]["processors"]] == ["root-put", "a-log", "a-put"]
+        assert result["search_terms"] == ["LOG A"]
+
+def test_search_walks_deep_trees_and_reports_root_failure():
+    """Test that the work-queue walk covers a deep chain of groups and fails when the start group does."""
+    tree = {"root": ["g0"], **{f"g{i}": [f"g{i + 1}"] for i in range(39)}, "g39": []}
+    result = asyncio.run(find_component_by_name(make_client(flow_tree_handler(tree)), "group", "process_group"))
+    assert result["count"] == 40
+
+    result = asyncio.run(search_components(make_client(flow_tree_handler(tree)), "log", pg_id="missing"))
+    assert result["status"] == "error"
+
+def test_search_components_stops_at_max_matches():
+    """Test that a search with a match limit stops fetching groups and trims the matches to it."""
+    tree = {"root": ["a", "b"], "a": ["a1"], "b": ["b1"], "a1": [], "b1": []}
+    serve = flow_tree_handler(tree)
+    fetched = []
+
+    def handler(request):
+        fetched.append(request.url.path)
+        return serve(request)
+
+    result = asyncio.run(search_components(make_client(handler), "log", ["processors"], max_matches=2))
+    assert [m["id"] for m in result["matches"]["processors"]] == ["root-log", "a-log"]
+    assert result["total_matches"] == 2
+    assert len(fetched) < len(tree)
+
+    result = asyncio.run(search_components(make_client(handler), "", ["processors"], max_matches=3))
+    assert [m["id"] for m in result["matches"]["processors"]] == ["root-log", "root-put", "a-log"]
+    assert result["truncated"]
+
+def test_iter_components_by_name_stops_when_closed():
+    """Test that name matches are yielded as groups are searched and stopping early skips the rest."""
+    tree = {"root": ["a"], "a": ["b"], "b": ["c"], "c": []}
+    serve = flow_tree_handler(tree)
+    fetched = []
+
+    async def handler(request):
+        fetched.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return serve(request)
+
+    async def first_exact():
+        async for match in iter_components_by_name(make_client(handler), "group a", "process_group"):
+            if match["exact_match"]:
+                return match
+
+    assert asyncio.run(first_exact())["id"] == "a"
+    assert len(fetched) < len(tree)
+
+def test_template_details_lists_processor_types_in_order():
+    """Test that a template's processor types are listed once each, in first-seen order."""
+    def handler(request):
+        return httpx.Response(200, json={"template": {"name": "T", "snippet": {"processors": {
+            "p1": {"type": "PutFile"}, "p2": {"type": "GetFile"}, "p3": {"type": "PutFile"}
+        }}}})
+
+    result = asyncio.run(templates.get_template_details(make_client(handler), "t1"))
+    assert result["processor_types"] == ["PutFile", "GetFile"]
+    assert result["component_counts"]["processors"] == 3
+
+def test_search_serves_last_known_flow_when_nifi_unavailable():
+    """Test that a search falls back to the last known flow, marked stale, on a 503 once the fresh cache has expired."""
+    tree = {"root": []}
+    serve = flow_tree_handler(tree)
+    available = True
+
+    def handler(request):
+        if not available:
+            return httpx.Response(503, json={"message": "unavailable"})
+        return serve(request)
+
+    client = make_client(handler)
+    fresh = asyncio.run(search_components(client, "log"))
+    assert fresh["total_matches"] == 1
+    assert "stale" not in fresh
+
+    available = False
+    search.FLOW_CACHE.clear()
+    stale = asyncio.run(search_components(client, "log"))
+    assert stale["total_matches"] == 1
+    assert stale["stale"] is True
+    assert asyncio.run(find_component_by_name(client, "log"))["stale"] is True
+    assert asyncio.run(search_components(client, "log", stale_if_error=False))["status"] == "error"
+
+    search.invalidate_flow_cache()
+    assert asyncio.run(search_components(client, "log"))["status"] == "error"
@@ -0,0 +1,29 @@
+import pytest
+from nifi_mcp_server.nlp_processor import NLProcessor
+
+# Microbenchmarks of intent detection; run with pytest-benchmark installed, e.g.
+# `pytest tests/test_nlp_benchmark.py --benchmark-autosave` once, then
+# `--benchmark-compare --benchmark-compare-fail=mean:10%` to fail on a regression
+pytest.importorskip("pytest_benchmark")
+
+QUERIES = [
+    "list all process groups",
+    "show me processor details for GetFile",
+    "create a new process group called Data Processing",
+    "please start processor Ingest when you have a moment",
+    "hello world",
+] * 100
+
+@pytest.fixture(scope="module")
+def processor():
+    return NLProcessor(api_key=None)
+
+def test_detect_intent_keywords_benchmark(processor, benchmark):
+    """Benchmark uncached keyword detection, the cost of every first-seen query."""
+    intents = benchmark(lambda: [processor._detect_intent_keywords(query) for query in QUERIES])
+    assert intents[1].intent_type == "get_processor_details"
+
+def test_detect_intent_simple_cached_benchmark(processor, benchmark):
+    """Benchmark keyword detection of repeated queries, served from the cache."""
+    intents = benchmark(lambda: [processor._detect_intent_simple(query) for query in QUERIES])
+    assert intents[-1].intent_type == "unknown"
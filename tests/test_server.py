@@ -0,0 +1,120 @@
+import asyncio
+import orjson
+from nifi_mcp_server import server
+
+# Test the tool dispatch
+def test_unknown_tool_returns_error():
+    """Test that unregistered tools return an error response."""
+    response = orjson.loads(asyncio.run(server.handle_tool_call(server.ToolRequest(name="missing_tool", parameters={}))).body)
+    assert response == {"status": "error", "tool": "missing_tool", "result": "Unknown tool: missing_tool"}
+
+def test_tool_validation_error_is_reported():
+    """Test that handler validation errors are returned as error responses."""
+    response = orjson.loads(asyncio.run(server.handle_tool_call(server.ToolRequest(name="process_group_details", parameters={}))).body)
+    assert response["status"] == "error"
+    assert response["result"] == "Process group ID is required"
+
+def test_nifi_query_tool_rejects_non_string_query():
+    """Test that the query tool validates its untyped query parameter."""
+    response = orjson.loads(asyncio.run(server.handle_tool_call(server.ToolRequest(name="nifi_query", parameters={"query": 42}))).body)
+    assert response == {"status": "error", "tool": "nifi_query", "result": "Query must be a string"}
+
+def test_bulk_set_state_tool_requires_state():
+    """Test that the bulk state tool rejects calls without a valid target state."""
+    parameters = {"pg_id": "pg1", "components": [{"component_id": "p1", "component_type": "processor"}]}
+    response = orjson.loads(asyncio.run(server.handle_tool_call(server.ToolRequest(name="bulk_set_state", parameters=parameters))).body)
+    assert response["status"] == "error"
+    assert "RUNNING or STOPPED" in response["result"]
+
+# Test the intent dispatch
+def test_intent_without_component_name_reports_error(monkeypatch):
+    """Test that start requests without a component name explain what is missing."""
+    async def process_query(context):
+        return server.QueryResult(
+            original_query=context.query,
+            detected_intent=server.QueryIntent(intent_type="start_component", confidence=1.0),
+            response="Starting the component"
+        )
+
+    monkeypatch.setattr(server.nlp_processor, "process_query", process_query)
+    result = asyncio.run(server.process_natural_language_query("start it"))
+    assert result.error == "No component name provided to start"
+    assert result.response.startswith("I need to know which component to start")
+    assert "action" in result.context_updates["latency_ms"]
+
+def test_chat_stream_sends_intent_before_action(monkeypatch):
+    """Test that the chat stream sends the detected intent before running the NiFi action."""
+    calls = []
+
+    async def process_query(context):
+        return server.QueryResult(
+            original_query=context.query,
+            detected_intent=server.QueryIntent(intent_type="get_flow_status", confidence=1.0),
+            response="Checking the flow"
+        )
+
+    async def handler(intent, client):
+        calls.append("action")
+        return "Checked", None, "All good"
+
+    monkeypatch.setattr(server.nlp_processor, "process_query", process_query)
+    monkeypatch.setitem(server.INTENT_HANDLERS, "get_flow_status", handler)
+
+    async def run():
+        stream = server.stream_chat_response(server.ChatRequest(query="how is my flow"))
+        first = await stream.__anext__()
+        assert calls == []
+        return [orjson.loads(first)] + [orjson.loads(line) async for line in stream]
+
+    lines = asyncio.run(run())
+    assert lines[0]["intent"]["intent_type"] == "get_flow_status"
+    assert "".join(line["delta"] for line in lines if "delta" in line) == "All good"
+    assert lines[-1]["result"]["action_taken"] == "Checked"
+
+# Test the sessions
+def test_unknown_session_is_rejected():
+    """Test that chat requests for an unregistered session get a 404 instead of the default client."""
+    request = server.ChatRequest(query="how is my flow", session_id="lost-session")
+    for endpoint in (server.chat_endpoint, server.chat_stream_endpoint):
+        response = asyncio.run(endpoint(request))
+        assert response.status_code == 404
+        assert orjson.loads(response.body)["error"] == "unknown_session"
+
+def test_replaced_session_client_closes_after_grace(monkeypatch):
+    """Test that re-registering a session leaves the old client open for requests already using it."""
+    monkeypatch.setattr(server, "SESSION_CLOSE_GRACE", 0.05)
+    request = server.SessionRequest(session_id="replaced-session", nifi_url="http://nifi.test/nifi-api")
+
+    async def run():
+        await server.session_endpoint(request)
+        old_client = await server.get_nifi_client("replaced-session")
+        await server.session_endpoint(request)
+        assert not old_client._client.is_closed
+        await asyncio.sleep(0.1)
+        assert old_client._client.is_closed
+        assert not server.retired_clients
+        await server.session_clients.pop("replaced-session").aclose()
+
+    asyncio.run(run())
+
+# Test the app lifetime
+def test_lifespan_warms_up_nifi_connection(monkeypatch):
+    """Test that startup opens a NiFi connection in the background and shutdown closes the pool."""
+    calls = []
+
+    async def test_connection(self):
+        calls.append("warmup")
+        return {"status": "success", "connected": True}
+
+    async def aclose(self):
+        calls.append("close")
+
+    monkeypatch.setattr(server.NiFiAPIClient, "test_connection", test_connection)
+    monkeypatch.setattr(server.NiFiAPIClient, "aclose", aclose)
+
+    async def run():
+        async with server.lifespan(server.app):
+            await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert calls == ["warmup", "close"]